@@ -1,6 +1,6 @@
 from app import create_app
 from app.models import db, Course, CourseApproval, User, UserRole, ApprovalStatus
-from app.password_utils import generate_access_code
+from app.access_codes import allocate_access_code
 from datetime import datetime
 
 def add_sample_approvals():
@@ -19,7 +19,7 @@ def add_sample_approvals():
                 first_name="Faculty",
                 last_name="Member",
                 role=UserRole.FACULTY,
-                access_code=generate_access_code("faculty@example.com", 3)  # 3 for FACULTY
+                access_code=allocate_access_code("faculty@example.com")
             )
             db.session.add(faculty)
             db.session.commit()
@@ -32,7 +32,7 @@ def add_sample_approvals():
                 first_name="Department",
                 last_name="Head",
                 role=UserRole.DEPARTMENT_HEAD,
-                access_code=generate_access_code("depthead@example.com", 2)  # 2 for DEPARTMENT_HEAD
+                access_code=allocate_access_code("depthead@example.com")
             )
             db.session.add(dept_head)
             db.session.commit()
@@ -7,6 +7,8 @@ from app.routes.users import users_bp
 from app.routes.courses import courses_bp
 from app.routes.department_head import department_head_bp
 from app.routes.enrollments import enrollments_bp
+from app.rate_limit import init_login_guard
+from app.token_blocklist import token_blocklist
 from config import Config
 import logging
 import os
@@ -43,7 +45,7 @@ def missing_token_callback(error_string):
 
 @jwt.token_in_blocklist_loader
 def token_in_blocklist_callback(jwt_header, jwt_payload):
-    return False  # We don't have a blocklist yet
+    return token_blocklist.is_revoked(jwt_payload['jti'], jwt_payload.get('family'))
 
 @jwt.needs_fresh_token_loader
 def needs_fresh_token_callback(jwt_header, jwt_payload):
@@ -76,6 +78,12 @@ logger = logging.getLogger(__name__)
 # Initialize database
 db.init_app(app)
 
+# Revoked tokens are checked against the in-memory blocklist, not the database
+token_blocklist.init_app(app)
+
+# Login rate limiting
+init_login_guard(app)
+
 # Register blueprints with URL prefix
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(users_bp, url_prefix='/api/users')
@@ -17,7 +17,8 @@ def create_app():
          resources={r"/*": {"origins": "*"}}, 
          supports_credentials=True,
          methods=["GET", "HEAD", "POST", "OPTIONS", "PUT", "PATCH", "DELETE"],
-         allow_headers=["Content-Type", "Authorization", "X-Requested-With"])
+         allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
+         expose_headers=["X-Users-Created", "X-Users-Skipped", "X-Users-Failed"])
     
     # Add CORS headers to all responses
     @app.after_request
@@ -73,6 +74,33 @@ def create_app():
             'message': f'Missing or invalid authorization header: {error_string}'
         }, 401
     
+    # Revoked tokens are checked against the in-memory blocklist, not the database
+    from app.token_blocklist import token_blocklist
+    token_blocklist.init_app(app)
+    
+    # Per-user cache of /api/users/me
+    from app.profile_cache import profile_cache
+    profile_cache.init_app(app)
+    
+    # Per-worker cache of ended enrollment trend buckets
+    from app.enrollment_trends import trend_cache
+    trend_cache.init_app(app)
+    
+    @jwt.token_in_blocklist_loader
+    def token_in_blocklist_callback(jwt_header, jwt_payload):
+        return token_blocklist.is_revoked(jwt_payload['jti'], jwt_payload.get('family'))
+    
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return {
+            'status': 'error',
+            'message': 'Token has been revoked'
+        }, 401
+    
+    # Login rate limiting
+    from app.rate_limit import init_login_guard
+    init_login_guard(app)
+    
     # Import and register blueprints
     from app.routes.auth import auth_bp
     from app.routes.users import users_bp
@@ -96,4 +124,18 @@ def create_app():
     with app.app_context():
         db.create_all()
     
+    # Live notification stream
+    from app.notification_stream import broadcaster
+    broadcaster.init_app(app)
+    
+    # Start assignment deadline reminders
+    if app.config.get('REMINDER_SCHEDULER_ENABLED'):
+        from app.reminders import start_reminder_scheduler
+        start_reminder_scheduler(app)
+    
+    # Start the notification email dispatcher
+    if app.config.get('EMAIL_DISPATCHER_ENABLED'):
+        from app.email_outbox import start_email_dispatcher
+        start_email_dispatcher(app)
+    
     return app 
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Access code allocation.
+
+An access code is the cleaned local part of the user's email, a dash and a
+number that is never handed out twice. The dash keeps codes of different
+emails apart ("user1" with 10 and "user" with 110), and the cleaned part
+never contains one, so codes can't collide with the older undashed ones. Numbers come from the
+``allocation_counters`` table in blocks: a process reserves
+ACCESS_CODE_BLOCK_SIZE numbers with one UPDATE in its own short transaction
+and then hands them out from memory, so registrations need no COUNT and
+concurrent sign-ups never collide on the unique constraint. Numbers of a
+block that is not used up (e.g. on restart) are simply skipped.
+
+The reservation uses its own connection and commits on its own, so that a
+rolled back registration can never give a number back to another process.
+On SQLite that connection needs the write lock, so allocate codes before
+writing anything in the current transaction.
+"""
+import re
+import threading
+
+from flask import current_app, has_app_context
+from sqlalchemy import select, update, insert, func
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, AllocationCounter, User
+
+ACCESS_CODE_COUNTER = 'access_code'
+DEFAULT_BLOCK_SIZE = 100
+
+_blocks = {}  # counter name -> [next number, end of block]
+_lock = threading.Lock()
+
+
+def generate_access_code(email, number):
+    """Format an access code from an email and an allocated number"""
+    # Clean email to make it usable as part of an access code
+    clean_email = re.sub(r'[^a-zA-Z0-9]', '', email.split('@')[0])
+    # Limit to 10 characters and add the number after a separator
+    clean_email = clean_email[:10]
+    return f"{clean_email}-{number}"
+
+
+def _reserve_block(name, size):
+    """Reserve `size` numbers in the counter table; returns the first one"""
+    while True:
+        with db.engine.begin() as connection:
+            reserved = connection.execute(
+                update(AllocationCounter)
+                .where(AllocationCounter.name == name)
+                .values(next_value=AllocationCounter.next_value + size)
+            ).rowcount
+            if reserved:
+                end = connection.execute(
+                    select(AllocationCounter.next_value).where(AllocationCounter.name == name)
+                ).scalar()
+                return end - size
+
+        # First use: start above every number the old COUNT-based codes could have used. Read
+        # on the reservation's own connection: a session query would autoflush the caller's
+        # pending changes and take the SQLite write lock this connection then waits for.
+        try:
+            with db.engine.begin() as connection:
+                start = (connection.execute(select(func.max(User.id))).scalar() or 0) + 1
+                connection.execute(insert(AllocationCounter).values(name=name, next_value=start + size))
+            return start
+        except IntegrityError:
+            # Another process created the counter first; reserve from it
+            continue
+
+
+def allocate_numbers(count, name=ACCESS_CODE_COUNTER):
+    """Allocate `count` unique numbers, reserving more blocks as needed"""
+    block_size = current_app.config.get('ACCESS_CODE_BLOCK_SIZE', DEFAULT_BLOCK_SIZE) \
+        if has_app_context() else DEFAULT_BLOCK_SIZE
+    numbers = []
+    with _lock:
+        while len(numbers) < count:
+            block = _blocks.get(name)
+            if block is None or block[0] >= block[1]:
+                size = max(block_size, count - len(numbers))
+                start = _reserve_block(name, size)
+                block = _blocks[name] = [start, start + size]
+            take = min(count - len(numbers), block[1] - block[0])
+            numbers.extend(range(block[0], block[0] + take))
+            block[0] += take
+    return numbers
+
+
+def allocate_access_code(email):
+    """Allocate a unique access code for an email"""
+    return generate_access_code(email, allocate_numbers(1)[0])
+
+
+def allocate_access_codes(emails):
+    """Allocate unique access codes for many emails at once"""
+    emails = list(emails)
+    return [generate_access_code(email, number) for email, number in zip(emails, allocate_numbers(len(emails)))]
@@ -1,36 +1,268 @@
 import bcrypt
-from datetime import datetime
-import re
-from app.models import db, User, UserRole
+import threading
+import time
+import uuid
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+from functools import lru_cache
+from flask import g, current_app, has_app_context
+from app.models import db, User, UserRole, Student, Faculty, Admin, DepartmentHead, RefreshToken, RevokedToken
+from app.token_blocklist import token_blocklist
+from app.access_codes import generate_access_code, allocate_access_code, allocate_numbers
 from email_validator import validate_email, EmailNotValidError
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, create_access_token, create_refresh_token
 
-def hash_password(password):
+logger = logging.getLogger(__name__)
+
+EMAIL_VALIDATION_CACHE_SIZE = 4096
+DEFAULT_DELIVERABILITY_CACHE_SECONDS = 3600
+
+# Role-specific profile model for each role
+PROFILE_MODELS = {
+    UserRole.STUDENT: Student,
+    UserRole.FACULTY: Faculty,
+    UserRole.ADMIN: Admin,
+    UserRole.DEPARTMENT_HEAD: DepartmentHead
+}
+
+# Who is making the request, as carried by the access token
+TokenIdentity = namedtuple('TokenIdentity', ['id', 'role', 'profile_id'])
+
+DEFAULT_BCRYPT_ROUNDS = 12
+DEFAULT_PASSWORD_HASH_WORKERS = 4
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+def _config(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+def _get_hash_executor():
+    """Bounded pool that runs bcrypt off the request thread.
+
+    bcrypt releases the GIL, so with at most PASSWORD_HASH_WORKERS hashes
+    running at once a login storm uses a fixed number of cores and the other
+    request threads keep serving I/O-bound requests.
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(
+                    max_workers=_config('PASSWORD_HASH_WORKERS', DEFAULT_PASSWORD_HASH_WORKERS),
+                    thread_name_prefix='password-hash'
+                )
+    return _hash_executor
+
+def shutdown_hash_executor():
+    """Stop the hashing pool; the next hash starts a new one with the current config"""
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is not None:
+            _hash_executor.shutdown(wait=True)
+            _hash_executor = None
+
+def _run_hash(fn, *args):
+    return _get_hash_executor().submit(fn, *args).result()
+
+def get_bcrypt_rounds():
+    """Configured bcrypt work factor"""
+    return _config('BCRYPT_ROUNDS', DEFAULT_BCRYPT_ROUNDS)
+
+def hash_password(password, rounds=None):
     """Hash a password for storing."""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    salt = bcrypt.gensalt(rounds=rounds or get_bcrypt_rounds())
+    return _run_hash(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(stored_password, provided_password):
     """Verify a stored password against one provided by user"""
-    return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password.encode('utf-8'))
+    return _run_hash(bcrypt.checkpw, provided_password.encode('utf-8'), stored_password.encode('utf-8'))
+
+def password_needs_rehash(stored_password):
+    """Check whether a bcrypt hash was made with a different work factor than the configured one"""
+    # bcrypt hashes look like $2b$12$<salt+hash>; the second field is the cost
+    parts = stored_password.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return False
+    return int(parts[2]) != get_bcrypt_rounds()
+
+def _validate_email(email, check_deliverability):
+    """Returns (normalized, error message)"""
+    try:
+        return validate_email(email, check_deliverability=check_deliverability).normalized, None
+    except EmailNotValidError as e:
+        return None, str(e)
+
+@lru_cache(maxsize=EMAIL_VALIDATION_CACHE_SIZE)
+def _validate_email_cached(email):
+    """Syntax-check once per address; the result never changes"""
+    return _validate_email(email, False)
+
+_deliverability_cache = OrderedDict()  # email -> (expires_at, (normalized, error message))
+_deliverability_pending = set()
+_deliverability_lock = threading.Lock()
+_deliverability_executor = None
+
+def _cached_deliverability(email):
+    with _deliverability_lock:
+        entry = _deliverability_cache.get(email)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+def _validate_email_deliverable(email, ttl_seconds):
+    """Check syntax and DNS; results are kept for ttl_seconds since DNS records change"""
+    result = _cached_deliverability(email)
+    if result is None:
+        result = _validate_email(email, True)
+        with _deliverability_lock:
+            _deliverability_cache[email] = (time.monotonic() + ttl_seconds, result)
+            _deliverability_cache.move_to_end(email)
+            while len(_deliverability_cache) > EMAIL_VALIDATION_CACHE_SIZE:
+                _deliverability_cache.popitem(last=False)
+    return result
+
+def _check_deliverability_later(email, ttl_seconds):
+    """Run the DNS deliverability check off the request and log addresses that fail it.
+
+    Addresses with a fresh result or a check already queued are skipped.
+    """
+    global _deliverability_executor
+    if _cached_deliverability(email) is not None:
+        return
+    with _deliverability_lock:
+        if email in _deliverability_pending:
+            return
+        _deliverability_pending.add(email)
+        if _deliverability_executor is None:
+            _deliverability_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-deliverability')
+        executor = _deliverability_executor
+    
+    def check():
+        try:
+            _, error = _validate_email_deliverable(email, ttl_seconds)
+            if error:
+                logger.warning(f"Email address {email} may not be deliverable: {error}")
+        finally:
+            with _deliverability_lock:
+                _deliverability_pending.discard(email)
+    
+    executor.submit(check)
+
+def normalize_email(email):
+    """Validate an email address and return its normalized form.
+
+    With EMAIL_VALIDATION_MODE "syntax" (the default) only the syntax is
+    checked, so no DNS lookup happens on the request; EMAIL_ASYNC_DELIVERABILITY
+    then runs the deliverability check in the background and only logs the
+    result. Mode "deliverability" checks DNS inline. Syntax results are
+    cached for good, DNS results for EMAIL_DELIVERABILITY_CACHE_SECONDS.
+    Raises EmailNotValidError.
+    """
+    check_deliverability = _config('EMAIL_VALIDATION_MODE', 'syntax') == 'deliverability'
+    ttl_seconds = _config('EMAIL_DELIVERABILITY_CACHE_SECONDS', DEFAULT_DELIVERABILITY_CACHE_SECONDS)
+    if check_deliverability:
+        normalized, error = _validate_email_deliverable(email.strip(), ttl_seconds)
+    else:
+        normalized, error = _validate_email_cached(email.strip())
+    if error:
+        raise EmailNotValidError(error)
+    
+    if not check_deliverability and _config('EMAIL_ASYNC_DELIVERABILITY', False):
+        _check_deliverability_later(normalized, ttl_seconds)
+    return normalized
+
+def get_profile(user):
+    """Get the role-specific profile (Student, Faculty, ...) of a user"""
+    model = PROFILE_MODELS.get(user.role)
+    if model is None:
+        return None
+    return model.query.filter_by(user_id=user.id).first()
+
+def get_identity_claims(user, profile=None):
+    """Additional access token claims that let routes authorize without loading the user"""
+    return {
+        "role": user.role.value,
+        "profile_id": profile.id if profile else None
+    }
+
+def _token_claims():
+    """Claims of the current access token, or {} if none was verified"""
+    try:
+        return get_jwt()
+    except RuntimeError:
+        return {}
+
+def _request_cache():
+    """Per-request memo for the loaders below, keyed by the token identity"""
+    user_id = get_jwt_identity()
+    cache = g.get('_auth_cache')
+    if cache is None or cache['user_id'] != user_id:
+        cache = g._auth_cache = {'user_id': user_id}
+    return cache
+
+def current_user():
+    """The User making the request, loaded at most once per request"""
+    cache = _request_cache()
+    if 'user' not in cache:
+        user_id = cache['user_id']
+        cache['user'] = db.session.get(User, user_id) if user_id is not None else None
+    return cache['user']
 
-def generate_access_code(email, count):
-    """Generate an access code based on email and registration count"""
-    # Clean email to make it usable as part of an access code
-    clean_email = re.sub(r'[^a-zA-Z0-9]', '', email.split('@')[0])
-    # Limit to 10 characters and add the count
-    clean_email = clean_email[:10]
-    return f"{clean_email}{count}"
+def current_profile():
+    """The role profile of the user making the request, loaded at most once per request.
+
+    Uses the profile_id claim for a primary key lookup when the token has one.
+    """
+    cache = _request_cache()
+    if 'profile' not in cache:
+        claims = _token_claims()
+        if claims.get('role') and claims.get('profile_id') is not None:
+            model = PROFILE_MODELS[UserRole(claims['role'])]
+            cache['profile'] = db.session.get(model, claims['profile_id'])
+        else:
+            user = current_user()
+            cache['profile'] = get_profile(user) if user else None
+    return cache['profile']
+
+def current_identity():
+    """Id, role and profile id of the user making the request.
+
+    Comes straight from the token claims, so authorization checks need no
+    query. Tokens issued without the claims fall back to loading the user.
+    Returns None if the user doesn't exist.
+    """
+    cache = _request_cache()
+    if 'identity' not in cache:
+        claims = _token_claims()
+        if claims.get('role'):
+            identity = TokenIdentity(cache['user_id'], UserRole(claims['role']), claims.get('profile_id'))
+        else:
+            user = current_user()
+            profile = current_profile() if user else None
+            identity = TokenIdentity(user.id, user.role, profile.id if profile else None) if user else None
+        cache['identity'] = identity
+    return cache['identity']
 
 def check_user_exists(email):
     """Check if a user with the given email exists in the database"""
     try:
         # Validate email
-        valid_email = validate_email(email)
-        email = valid_email.normalized
+        email = normalize_email(email)
         
-        # Check if user already exists
-        existing_user = User.query.filter_by(email=email).first()
+        # Check if user already exists; soft-deleted users still hold their email
+        existing_user = User.query.filter_by(email=email).execution_options(include_deleted=True).first()
+        
+        if existing_user and existing_user.deleted_at is not None:
+            return {
+                "success": True,
+                "exists": True,
+                "deleted": True,
+                "needs_setup": False,
+                "message": "This account has been deleted"
+            }
         
         if existing_user:
             # Check if the user has a password set
@@ -63,23 +295,25 @@ def setup_user_password(email, password):
     """Set up password for a user during first-time registration"""
     try:
         # Validate email
-        valid_email = validate_email(email)
-        email = valid_email.normalized
+        email = normalize_email(email)
         
         # Find the user
-        user = User.query.filter_by(email=email).first()
+        user = User.query.filter_by(email=email).execution_options(include_deleted=True).first()
+        
+        if user and user.deleted_at is not None:
+            return {"success": False, "message": "This account has been deleted"}
         
         if not user:
             # Create a new user instead of returning an error
-            count = User.query.count() + 1
-            access_code = generate_access_code(email, count)
+            number = allocate_numbers(1)[0]
+            access_code = generate_access_code(email, number)
             
             # Create new user with default values
             user = User(
                 email=email,
                 password_hash="NEEDS_SETUP",  # Will be updated below
                 first_name="User",
-                last_name=str(count),
+                last_name=str(number),
                 role=UserRole.ADMIN,  # Default role
                 access_code=access_code
             )
@@ -88,6 +322,8 @@ def setup_user_password(email, password):
         
         # Update the password
         user.password_hash = hash_password(password)
+        if user.status == 'pending':
+            user.status = 'active'
         db.session.commit()
         
         return {"success": True, "user": user.to_dict()}
@@ -102,18 +338,16 @@ def register_user(email, password, first_name, last_name, role):
     """Register a new user"""
     try:
         # Validate email
-        valid_email = validate_email(email)
-        email = valid_email.normalized
+        email = normalize_email(email)
         
         # Check if user already exists
-        existing_user = User.query.filter_by(email=email).first()
+        # Deleted accounts keep their email until they are purged
+        existing_user = User.query.filter_by(email=email).execution_options(include_deleted=True).first()
         if existing_user:
             return {"success": False, "message": "Email already registered"}
         
         # Generate access code
-        # Count existing users to determine number suffix
-        count = User.query.count() + 1
-        access_code = generate_access_code(email, count)
+        access_code = allocate_access_code(email)
         
         # Create new user
         new_user = User(
@@ -147,20 +381,165 @@ def login_user(email, password):
         # Uncomment password verification
         if not verify_password(user.password_hash, password):
             return {"success": False, "message": "Invalid email or password"}
+        
+        # Deactivated, e.g. dropped from the registrar's roster
+        if user.status == 'inactive':
+            return {"success": False, "message": "Account is inactive"}
+        
+        # Upgrade the stored hash when the configured work factor has changed
+        if password_needs_rehash(user.password_hash):
+            user.password_hash = hash_password(password)
             
         # Update last login time
         user.last_login = datetime.utcnow()
-        db.session.commit()
         
-        # Create access token with the user's ID as the identity
-        access_token = create_access_token(identity=user.id)
+        # Create access token with the user's ID as the identity, plus role claims
+        # The refresh token family doubles as the login session id, so logout can end both
+        claims = get_identity_claims(user, get_profile(user))
+        family_id = str(uuid.uuid4())
+        access_token = create_access_token(identity=user.id, additional_claims={**claims, "family": family_id})
+        refresh_token = issue_refresh_token(user.id, claims, family_id=family_id)
+        db.session.commit()
         
         return {
             "success": True, 
             "user": user.to_dict(),
-            "access_token": access_token
+            "access_token": access_token,
+            "refresh_token": refresh_token
         }
         
     except Exception as e:
         db.session.rollback()
-        return {"success": False, "message": f"Login failed: {str(e)}"} 
\ No newline at end of file
+        return {"success": False, "message": f"Login failed: {str(e)}"} 
+
+def _refresh_token_lifetime():
+    expires = current_app.config.get('JWT_REFRESH_TOKEN_EXPIRES', timedelta(days=30))
+    return expires if isinstance(expires, timedelta) else timedelta(seconds=expires)
+
+def _access_token_lifetime():
+    expires = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(hours=1))
+    return expires if isinstance(expires, timedelta) else timedelta(seconds=expires)
+
+def issue_refresh_token(user_id, claims, family_id=None):
+    """Create a refresh token and record it; the caller commits.
+
+    Tokens from one login share a family id, so reuse of any of them can
+    revoke the whole chain.
+    """
+    jti = str(uuid.uuid4())
+    family_id = family_id or jti
+    token = create_refresh_token(
+        identity=user_id,
+        additional_claims={**claims, "jti": jti, "family": family_id}
+    )
+    db.session.add(RefreshToken(
+        jti=jti,
+        user_id=user_id,
+        family_id=family_id,
+        expires_at=datetime.utcnow() + _refresh_token_lifetime()
+    ))
+    return token
+
+def rotate_refresh_token(claims):
+    """Exchange a verified refresh token (its decoded claims) for a new access and refresh token.
+
+    Needs no password hash, but the user is loaded by primary key: deleted
+    and inactive users are refused (and their session's refresh tokens
+    revoked), and the role claims are rebuilt from the current row so a role
+    change takes effect on the next refresh. Each refresh token works once;
+    presenting a used one again means it was leaked, so its whole family is
+    revoked.
+    """
+    now = datetime.utcnow()
+    jti = claims.get("jti")
+    
+    # Conditional update: only one request can consume a refresh token
+    consumed = RefreshToken.query.filter(
+        RefreshToken.jti == jti,
+        RefreshToken.used_at.is_(None),
+        RefreshToken.revoked_at.is_(None),
+        RefreshToken.expires_at > now
+    ).update({"used_at": now}, synchronize_session=False)
+    
+    if consumed != 1:
+        record = db.session.get(RefreshToken, jti) if jti else None
+        if record and record.used_at is not None and record.revoked_at is None:
+            RefreshToken.query.filter(
+                RefreshToken.family_id == record.family_id,
+                RefreshToken.revoked_at.is_(None)
+            ).update({"revoked_at": now}, synchronize_session=False)
+            db.session.commit()
+            return {"success": False, "message": "Refresh token has already been used"}
+        db.session.rollback()
+        return {"success": False, "message": "Invalid or expired refresh token"}
+    
+    user_id = claims["sub"]
+    family_id = claims.get("family")
+    user = db.session.get(User, int(user_id), execution_options={"include_deleted": True})
+    if user is None or user.deleted_at is not None or user.status == 'inactive':
+        RefreshToken.query.filter(
+            RefreshToken.family_id == family_id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({"revoked_at": now}, synchronize_session=False)
+        db.session.commit()
+        if user is None or user.deleted_at is not None:
+            return {"success": False, "message": "User not found"}
+        return {"success": False, "message": "Account is inactive"}
+    
+    identity_claims = get_identity_claims(user, get_profile(user))
+    access_token = create_access_token(identity=user_id, additional_claims={**identity_claims, "family": family_id})
+    refresh_token = issue_refresh_token(user_id, identity_claims, family_id=family_id)
+    db.session.commit()
+    
+    return {
+        "success": True,
+        "access_token": access_token,
+        "refresh_token": refresh_token
+    }
+
+def revoke_session(claims):
+    """Log out: revoke the presented token and every refresh token from the same login"""
+    token_blocklist.revoke(
+        claims["jti"],
+        datetime.utcfromtimestamp(claims["exp"]),
+        user_id=claims.get("sub")
+    )
+    if claims.get("family"):
+        RefreshToken.query.filter(
+            RefreshToken.family_id == claims["family"],
+            RefreshToken.revoked_at.is_(None)
+        ).update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+    return {"success": True, "message": "Logged out"}
+
+def revoke_user_sessions(user_ids, now=None):
+    """End every login session of the given users, access tokens included; the caller commits.
+
+    Access tokens aren't recorded, but each one carries its login's family
+    id, so the families of the users' live refresh tokens go into the
+    blocklist until any access token issued from them has expired. Used when
+    a user's role or status changes or the user is deleted, since access
+    tokens carry the role. Returns the number of sessions revoked.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    if now is None:
+        now = datetime.utcnow()
+
+    # An access token is only issued together with a refresh token, so its family still has a live one
+    families = db.session.query(RefreshToken.family_id, RefreshToken.user_id)\
+        .filter(RefreshToken.user_id.in_(user_ids), RefreshToken.expires_at > now)\
+        .distinct()\
+        .all()
+    revoked = {jti for (jti,) in db.session.query(RevokedToken.jti)
+               .filter(RevokedToken.jti.in_([family_id for family_id, _ in families]))}
+    expires_at = now + _access_token_lifetime()
+    db.session.add_all([RevokedToken(jti=family_id, user_id=user_id, expires_at=expires_at)
+                        for family_id, user_id in dict(families).items() if family_id not in revoked])
+
+    RefreshToken.query.filter(
+        RefreshToken.user_id.in_(user_ids),
+        RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": now}, synchronize_session=False)
+    return len(families)
@@ -0,0 +1,215 @@
+"""
+Precomputed department dashboard numbers.
+
+Each department's course, enrollment, faculty and approval counts and its
+most popular courses are kept in one department_analytics row, so the
+dashboard is a primary key read. The row is kept current in two ways:
+
+* flush hooks mark it stale whenever a course, enrollment, course approval
+  or faculty member of the department is added, changed or removed through
+  the ORM (looking up the department before and after the flush, so moves
+  mark both sides), and the next read recomputes it,
+* rows older than DEPARTMENT_ANALYTICS_MAX_AGE_SECONDS are recomputed on
+  read as well, and refresh_department_analytics.py recomputes them from
+  cron. This picks up bulk and raw SQL writes, which the hook doesn't see.
+
+Every mark also bumps the row's version. A refresh only clears the stale
+flag if the version is still the one it read before computing, so a change
+committed while it was computing keeps the row stale.
+
+Any number of departments is recomputed in the same handful of grouped
+queries, so the all-departments view costs no more than one department.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from itertools import chain
+
+from sqlalchemy import event, inspect, update, select, or_, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import (db, Course, CourseApproval, Enrollment, Faculty, DepartmentAnalytics)
+
+logger = logging.getLogger(__name__)
+
+POPULAR_COURSES = 5
+
+# Models whose changes affect a department's numbers -> the department of a row, in SQL
+_WATCHED = {
+    Course: lambda ids: select(Course.department).where(Course.id.in_(ids)),
+    Faculty: lambda ids: select(Faculty.department).where(Faculty.id.in_(ids)),
+    Enrollment: lambda ids: select(Course.department).join(Enrollment, Enrollment.course_id == Course.id)
+                                                    .where(Enrollment.id.in_(ids)),
+    CourseApproval: lambda ids: select(Course.department).join(CourseApproval, CourseApproval.course_id == Course.id)
+                                                        .where(CourseApproval.id.in_(ids)),
+}
+
+
+def _mark_stale(session, objects):
+    """Mark the snapshots of the departments the watched objects' rows currently belong to stale"""
+    ids = {}
+    for obj in objects:
+        if type(obj) in _WATCHED:
+            # The identity key needs no load of expired rows; rows inserted by this flush only have the id
+            identity = inspect(obj).identity
+            pk = identity[0] if identity else obj.id
+            if pk is not None:
+                ids.setdefault(type(obj), set()).add(pk)
+    if ids:
+        departments = [_WATCHED[model](model_ids) for model, model_ids in ids.items()]
+        session.connection().execute(
+            update(DepartmentAnalytics)
+            .where(or_(*(DepartmentAnalytics.department.in_(d) for d in departments)))
+            .values(stale=True, version=DepartmentAnalytics.version + 1)
+        )
+
+
+@event.listens_for(Session, 'before_flush')
+def _mark_departments_before_flush(session, flush_context, instances):
+    """Rows about to change or go still point at their old department"""
+    _mark_stale(session, chain(session.dirty, session.deleted))
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_departments_after_flush(session, flush_context):
+    """New and changed rows point at their new department"""
+    _mark_stale(session, chain(session.new, session.dirty))
+
+
+def _compute(departments):
+    """{department: numbers} for the given departments, straight from the source tables.
+
+    One grouped query per kind of number, whatever the number of departments;
+    the top courses of each department come from a ROW_NUMBER() window.
+    """
+    stats = {d: {'total_courses': 0, 'active_courses': 0, 'total_enrollments': 0, 'total_faculty': 0,
+                 'approvals_pending': 0, 'approvals_approved': 0, 'approvals_rejected': 0, 'popular_courses': []}
+             for d in departments}
+    in_departments = Course.department.in_(departments)
+
+    for department, total, active in db.session.query(
+            Course.department,
+            func.count(Course.id),
+            func.coalesce(func.sum(case((Course.is_active == True, 1), else_=0)), 0))\
+            .filter(in_departments).group_by(Course.department):
+        stats[department].update(total_courses=total, active_courses=active)
+
+    for department, count in db.session.query(Course.department, func.count(Enrollment.id))\
+            .join(Enrollment, Enrollment.course_id == Course.id)\
+            .filter(in_departments).group_by(Course.department):
+        stats[department]['total_enrollments'] = count
+
+    for department, count in db.session.query(Faculty.department, func.count(Faculty.id))\
+            .filter(Faculty.department.in_(departments)).group_by(Faculty.department):
+        stats[department]['total_faculty'] = count
+
+    for department, status, count in db.session.query(Course.department, CourseApproval.status,
+                                                      func.count(CourseApproval.id))\
+            .join(CourseApproval, CourseApproval.course_id == Course.id)\
+            .filter(in_departments).group_by(Course.department, CourseApproval.status):
+        stats[department][f'approvals_{status.value}'] = count
+
+    enrollment_count = func.count(Enrollment.id)
+    ranked = db.session.query(
+        Course.id.label('course_id'),
+        enrollment_count.label('enrollment_count'),
+        func.row_number().over(partition_by=Course.department,
+                               order_by=(enrollment_count.desc(), Course.id)).label('rank'))\
+        .outerjoin(Enrollment, Enrollment.course_id == Course.id)\
+        .filter(in_departments)\
+        .group_by(Course.id)\
+        .subquery()
+    for course, count in db.session.query(Course, ranked.c.enrollment_count)\
+            .join(ranked, ranked.c.course_id == Course.id)\
+            .filter(ranked.c.rank <= POPULAR_COURSES)\
+            .order_by(Course.department, ranked.c.rank):
+        stats[course.department]['popular_courses'].append({'course': course.to_dict(), 'enrollment_count': count})
+
+    for values in stats.values():
+        values['popular_courses'] = json.dumps(values['popular_courses'])
+    return stats
+
+
+def refresh_snapshots(departments, now=None):
+    """Recompute and store the snapshots of the given departments; returns them by department"""
+    departments = sorted(set(departments))
+    if not departments:
+        return {}
+    if now is None:
+        now = datetime.utcnow()
+
+    # Versions as of before computing; a mark after this point must leave the row stale
+    snapshots = {s.department: s for s in DepartmentAnalytics.query
+                 .filter(DepartmentAnalytics.department.in_(departments))
+                 .populate_existing()}
+    seen = {department: snapshot.version for department, snapshot in snapshots.items()}
+    stats = _compute(departments)
+
+    for department, values in stats.items():
+        snapshot = snapshots.get(department)
+        if snapshot is None:
+            snapshot = snapshots[department] = DepartmentAnalytics(department=department, stale=False)
+            db.session.add(snapshot)
+        else:
+            snapshot.stale = case((DepartmentAnalytics.version == seen[department], False),
+                                  else_=DepartmentAnalytics.stale)
+        for key, value in values.items():
+            setattr(snapshot, key, value)
+        snapshot.refreshed_at = now
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created some of the rows first; theirs are just as fresh
+        db.session.rollback()
+        snapshots = {s.department: s for s in DepartmentAnalytics.query
+                     .filter(DepartmentAnalytics.department.in_(departments))}
+    return snapshots
+
+
+def refresh_department(department, now=None):
+    """Recompute and store a department's snapshot; returns it"""
+    return refresh_snapshots([department], now)[department]
+
+
+def _needs_refresh(snapshot, max_age_seconds, now):
+    return snapshot.stale or snapshot.refreshed_at < now - timedelta(seconds=max_age_seconds)
+
+
+def get_department_snapshot(department, max_age_seconds=3600, now=None):
+    """A department's snapshot, recomputed first if it is missing, stale or too old"""
+    if now is None:
+        now = datetime.utcnow()
+    snapshot = db.session.get(DepartmentAnalytics, department, populate_existing=True)
+    if snapshot is None or _needs_refresh(snapshot, max_age_seconds, now):
+        snapshot = refresh_department(department, now)
+    return snapshot
+
+
+def _known_departments():
+    """Every department that has courses or faculty"""
+    return {d for (d,) in db.session.execute(
+        select(Course.department).union(select(Faculty.department).where(Faculty.department.isnot(None))))}
+
+
+def get_all_department_snapshots(max_age_seconds=3600, now=None):
+    """Snapshots of every department, sorted by name; missing, stale and old ones are recomputed in one pass"""
+    if now is None:
+        now = datetime.utcnow()
+    snapshots = {s.department: s for s in DepartmentAnalytics.query.populate_existing()}
+    outdated = [d for d in _known_departments() if d not in snapshots]
+    outdated += [d for d, s in snapshots.items() if _needs_refresh(s, max_age_seconds, now)]
+    snapshots.update(refresh_snapshots(outdated, now))
+    return [snapshots[d] for d in sorted(snapshots)]
+
+
+def refresh_departments(stale_only=False):
+    """Recompute the snapshots of every department (or only the stale ones); returns how many"""
+    if stale_only:
+        departments = [d for (d,) in db.session.query(DepartmentAnalytics.department)
+                       .filter(DepartmentAnalytics.stale == True)]
+    else:
+        departments = _known_departments() | {d for (d,) in db.session.query(DepartmentAnalytics.department)}
+    refresh_snapshots(departments)
+    logger.info(f"Refreshed analytics of {len(departments)} department(s)")
+    return len(departments)
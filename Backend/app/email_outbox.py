@@ -0,0 +1,270 @@
+"""
+Email delivery of notifications through a transactional outbox.
+
+When EMAIL_NOTIFICATIONS_ENABLED is set, every new notification row also
+gets an ``email_outbox`` row, written in the same transaction, so an email
+is queued if and only if the notification is committed. Requests never talk
+to the mail server.
+
+A background dispatcher (EMAIL_DISPATCHER_ENABLED) drains the outbox in
+batches through a transport. The SMTP transport keeps one connection open
+across messages and batches and reconnects when the server drops it. Failed
+messages are retried with exponential backoff until EMAIL_MAX_ATTEMPTS, then
+marked failed. Rows are claimed with a token before sending, so several
+dispatchers can share one outbox.
+"""
+import json
+import logging
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from flask import current_app
+from sqlalchemy import insert, select, literal
+
+from app.models import db, EmailOutbox, User
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+CLAIM_SECONDS = 300  # A claimed batch that is never finished (crashed worker) is retried after this
+
+_dispatcher_thread = None
+_stop_event = threading.Event()
+
+
+class SMTPTransport:
+    """Sends messages over a single, reused SMTP connection"""
+
+    def __init__(self, host, port=25, username=None, password=None, use_tls=False, sender=None, timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        self._connection = connection
+
+    def send(self, to_address, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = to_address
+        message['Subject'] = subject
+        message.set_content(body)
+
+        if self._connection is None:
+            self._connect()
+        try:
+            self._connection.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Idle connection was closed by the server; reconnect once and retry
+            self._connect()
+            self._connection.send_message(message)
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except smtplib.SMTPException:
+                pass
+            self._connection = None
+
+
+class FileTransport:
+    """Appends messages as JSON lines to a file, for development"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, to_address, subject, body):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'to': to_address, 'subject': subject, 'body': body}) + '\n')
+
+    def close(self):
+        pass
+
+
+class MemoryTransport:
+    """Keeps messages in a list, for tests"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, to_address, subject, body):
+        self.sent.append({'to': to_address, 'subject': subject, 'body': body})
+
+    def close(self):
+        pass
+
+
+def create_transport(config):
+    """Build the transport named by EMAIL_TRANSPORT"""
+    name = config.get('EMAIL_TRANSPORT', 'smtp')
+    if name == 'smtp':
+        return SMTPTransport(
+            config.get('MAIL_SERVER', 'localhost'),
+            port=config.get('MAIL_PORT', 25),
+            username=config.get('MAIL_USERNAME'),
+            password=config.get('MAIL_PASSWORD'),
+            use_tls=config.get('MAIL_USE_TLS', False),
+            sender=config.get('MAIL_DEFAULT_SENDER'),
+            timeout=config.get('MAIL_TIMEOUT_SECONDS', 10)
+        )
+    if name == 'file':
+        return FileTransport(config.get('EMAIL_FILE_PATH', 'outbox.jsonl'))
+    if name == 'memory':
+        return MemoryTransport()
+    raise ValueError(f'Unknown email transport: {name}')
+
+
+def email_notifications_enabled():
+    return current_app.config.get('EMAIL_NOTIFICATIONS_ENABLED', False)
+
+
+def enqueue_notification_emails(user_ids, title, message, link=None, now=None):
+    """Queue one email per user for a notification; the caller commits with the notification.
+
+    Addresses are copied from the users table with INSERT ... SELECT, so no
+    rows are loaded into Python.
+    """
+    if now is None:
+        now = datetime.utcnow()
+    body = f"{message}\n\n{link}" if link else message
+    user_ids = sorted(set(user_ids))
+
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        chunk = user_ids[start:start + BATCH_SIZE]
+        db.session.execute(
+            insert(EmailOutbox).from_select(
+                ['user_id', 'to_address', 'subject', 'body', 'status', 'attempts', 'next_attempt_at', 'created_at'],
+                select(
+                    User.id, User.email, literal(title), literal(body), literal('pending'),
+                    literal(0), literal(now), literal(now)
+                ).where(User.id.in_(chunk))
+            )
+        )
+
+
+def _claim_batch(batch_size, now):
+    """Claim up to batch_size due messages for this dispatcher; returns the claimed rows"""
+    token = uuid.uuid4().hex
+    ids = [row[0] for row in db.session.query(EmailOutbox.id)
+           .filter(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now)
+           .order_by(EmailOutbox.id)
+           .limit(batch_size)]
+    if not ids:
+        return []
+
+    # Conditional update: rows another dispatcher claimed in the meantime are skipped
+    EmailOutbox.query.filter(
+        EmailOutbox.id.in_(ids),
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).update({
+        'claim_token': token,
+        'next_attempt_at': now + timedelta(seconds=CLAIM_SECONDS)
+    }, synchronize_session=False)
+    db.session.commit()
+
+    return EmailOutbox.query.filter_by(claim_token=token).order_by(EmailOutbox.id).all()
+
+
+def dispatch_pending(transport, batch_size=None, now=None):
+    """Send one batch of due messages; returns (sent, failed) counts"""
+    config = current_app.config
+    if batch_size is None:
+        batch_size = config.get('EMAIL_DISPATCH_BATCH_SIZE', 100)
+    if now is None:
+        now = datetime.utcnow()
+    max_attempts = config.get('EMAIL_MAX_ATTEMPTS', 5)
+    retry_base = config.get('EMAIL_RETRY_BASE_SECONDS', 30)
+
+    sent = failed = 0
+    for item in _claim_batch(batch_size, now):
+        item.claim_token = None
+        try:
+            transport.send(item.to_address, item.subject, item.body)
+        except Exception as e:
+            item.attempts += 1
+            item.last_error = str(e)
+            if item.attempts >= max_attempts:
+                item.status = 'failed'
+                logger.error(f"Giving up on email {item.id} to {item.to_address}: {str(e)}")
+            else:
+                item.next_attempt_at = now + timedelta(seconds=retry_base * 2 ** (item.attempts - 1))
+            failed += 1
+        else:
+            item.attempts += 1
+            item.status = 'sent'
+            item.sent_at = now
+            sent += 1
+
+    db.session.commit()
+    return sent, failed
+
+
+def dispatch_all(transport, batch_size=None):
+    """Drain every due message; returns (sent, failed) counts"""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = dispatch_pending(transport, batch_size=batch_size)
+        if not sent and not failed:
+            return total_sent, total_failed
+        total_sent += sent
+        total_failed += failed
+
+
+def _run_dispatcher(app, interval):
+    transport = create_transport(app.config)
+    try:
+        while not _stop_event.wait(interval):
+            with app.app_context():
+                try:
+                    dispatch_all(transport)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error dispatching notification emails: {str(e)}")
+                finally:
+                    db.session.remove()
+    finally:
+        transport.close()
+
+
+def start_email_dispatcher(app):
+    """Start the in-process email dispatcher thread (once per process)"""
+    global _dispatcher_thread
+
+    if _dispatcher_thread is not None and _dispatcher_thread.is_alive():
+        return _dispatcher_thread
+
+    interval = app.config.get('EMAIL_DISPATCH_INTERVAL_SECONDS', 10)
+    _stop_event.clear()
+    _dispatcher_thread = threading.Thread(
+        target=_run_dispatcher,
+        args=(app, interval),
+        name='email-dispatcher',
+        daemon=True
+    )
+    _dispatcher_thread.start()
+    return _dispatcher_thread
+
+
+def stop_email_dispatcher():
+    """Stop the email dispatcher thread"""
+    global _dispatcher_thread
+
+    _stop_event.set()
+    if _dispatcher_thread is not None:
+        _dispatcher_thread.join(timeout=5)
+    _dispatcher_thread = None
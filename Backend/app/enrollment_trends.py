@@ -0,0 +1,176 @@
+"""
+Enrollments over time, bucketed by hour, day or week.
+
+Counts are grouped in SQL, for one course or for all courses of a
+department. Buckets that have ended can no longer gain enrollments, so each
+worker caches them per (scope, interval) and a later request only queries
+the buckets outside the cached range: the current one and anything newer,
+or older than what was asked before. Dropped enrollments change ended
+buckets too; those show up when the entry expires after
+ENROLLMENT_TRENDS_CACHE_SECONDS and is rebuilt.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+
+from app.models import db, Course, Enrollment
+
+INTERVALS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+# Buckets shown when the request gives no start
+DEFAULT_BUCKETS = {'hour': 48, 'day': 30, 'week': 26}
+
+LABEL_FORMATS = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d', 'week': '%Y-%m-%d'}
+
+
+class TrendCache:
+    """(scope, interval) -> ended bucket counts, oldest entries dropped beyond max_entries"""
+
+    def __init__(self, ttl_seconds=3600, max_entries=1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, covered_from, closed_until, {bucket: count})
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl_seconds = app.config.get('ENROLLMENT_TRENDS_CACHE_SECONDS', self.ttl_seconds)
+        self.max_entries = app.config.get('ENROLLMENT_TRENDS_CACHE_MAX_ENTRIES', self.max_entries)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key):
+        """(expires_at, covered_from, closed_until, counts), or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry
+
+    def put(self, key, covered_from, closed_until, counts, expires_at=None):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at or time.monotonic() + self.ttl_seconds, covered_from, closed_until,
+                                  counts)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+trend_cache = TrendCache()
+
+
+def bucket_start(moment, interval):
+    """Start of the bucket a moment falls in; weeks start on Monday"""
+    if interval == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _bucket_expression(column, interval):
+    """SQL expression for the start of the bucket of a timestamp column, matching bucket_start()"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.date_trunc(interval, column)
+    if interval == 'hour':
+        return func.strftime('%Y-%m-%d %H:00:00', column)
+    if interval == 'week':
+        # Forward to Sunday, back to that week's Monday
+        return func.date(column, 'weekday 0', '-6 days')
+    return func.date(column)
+
+
+def _count_buckets(interval, start, end, course_id=None, department=None):
+    """{bucket start: enrollments} for the non-empty buckets in [start, end)"""
+    bucket = _bucket_expression(Enrollment.enrollment_date, interval)
+    query = db.session.query(bucket, func.count(Enrollment.id))\
+        .filter(Enrollment.enrollment_date >= start, Enrollment.enrollment_date < end)
+    if course_id is not None:
+        query = query.filter(Enrollment.course_id == course_id)
+    else:
+        query = query.join(Course, Course.id == Enrollment.course_id).filter(Course.department == department)
+    counts = {}
+    for value, count in query.group_by(bucket):
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        counts[value] = count
+    return counts
+
+
+def enrollment_trend(interval, start=None, end=None, course_id=None, department=None, max_buckets=None, now=None):
+    """Enrollments per bucket from the bucket of `start` through the bucket of `end`.
+
+    Scoped to one course, or to all courses of a department. Returns
+    (bucket starts, counts), with empty buckets as 0. End defaults to now,
+    start to DEFAULT_BUCKETS buckets before the end.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Interval must be one of: {', '.join(INTERVALS)}")
+    if course_id is None and department is None:
+        raise ValueError("Give a course_id or a department")
+    if now is None:
+        now = datetime.utcnow()
+    step = INTERVALS[interval]
+
+    # Nothing can be enrolled after now, so the open bucket is the last one worth asking for
+    open_from = bucket_start(now, interval)
+    end = min(bucket_start(end or now, interval), open_from) + step
+    start = bucket_start(start, interval) if start else end - DEFAULT_BUCKETS[interval] * step
+    if start >= end:
+        return [], []
+    if max_buckets and (end - start) / step > max_buckets:
+        raise ValueError(f"At most {max_buckets} {interval} buckets can be requested at once")
+
+    key = (course_id, department, interval)
+    cached = trend_cache.get(key)
+    if cached is None:
+        expires_at, covered_from, closed_until, counts = None, start, start, {}
+        missing = [(start, end)]
+    else:
+        expires_at, covered_from, closed_until, counts = cached
+        counts = dict(counts)
+        missing = []
+        if start < covered_from:
+            missing.append((start, covered_from))
+        if end > closed_until:
+            missing.append((closed_until, end))
+
+    for low, high in missing:
+        counts.update(_count_buckets(interval, low, high, course_id=course_id, department=department))
+
+    # Only buckets that have ended are kept; the open one is queried again next time
+    covered_from = min(covered_from, start)
+    closed_until = max(closed_until, min(end, open_from))
+    trend_cache.put(key, covered_from, closed_until,
+                    {b: c for b, c in counts.items() if b < closed_until}, expires_at=expires_at)
+
+    buckets = []
+    moment = start
+    while moment < end:
+        buckets.append(moment)
+        moment += step
+    return buckets, [counts.get(b, 0) for b in buckets]
+
+
+def parse_timestamp(value):
+    """A naive UTC datetime from an ISO date or timestamp; ones with an offset are converted to UTC"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def format_bucket(moment, interval):
+    return moment.strftime(LABEL_FORMATS[interval])
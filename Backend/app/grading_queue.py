@@ -0,0 +1,170 @@
+"""
+Grading queue for assignment submissions.
+
+Graders claim the next ungraded submission of an assignment with a lease, so
+several graders working on the same assignment never open the same
+submission. A lease that is not completed in time expires and the submission
+goes back into the queue.
+
+On PostgreSQL the claim uses SELECT ... FOR UPDATE SKIP LOCKED; on SQLite,
+which serializes writers, it is a conditional UPDATE that only succeeds if
+the submission is still available.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_, func, case
+
+from app.models import db, AssignmentSubmission
+
+GRADED_STATUS = 'graded'
+MAX_CLAIM_ATTEMPTS = 10
+GRADE_BATCH_SIZE = 500
+
+
+def _available_filter(assignment_id, now):
+    """Submissions that are ungraded and not leased by anyone else"""
+    return and_(
+        AssignmentSubmission.assignment_id == assignment_id,
+        AssignmentSubmission.status != GRADED_STATUS,
+        or_(
+            AssignmentSubmission.claimed_by.is_(None),
+            AssignmentSubmission.claim_expires_at <= now
+        )
+    )
+
+
+def get_lease_seconds(requested=None):
+    """Lease length for a claim: the configured default, or the requested one capped at the maximum.
+
+    Raises ValueError unless the requested length is a positive integer.
+    """
+    if requested is None:
+        return current_app.config.get('GRADING_LEASE_SECONDS', 900)
+    if isinstance(requested, bool) or not isinstance(requested, int) or requested <= 0:
+        raise ValueError('lease_seconds must be a positive integer')
+    return min(requested, current_app.config.get('GRADING_MAX_LEASE_SECONDS', 3600))
+
+
+def claim_next_submission(assignment_id, grader_id, lease_seconds=None, now=None):
+    """Claim the next ungraded submission for a grader; returns None if the queue is empty"""
+    if lease_seconds is None:
+        lease_seconds = get_lease_seconds()
+    if now is None:
+        now = datetime.utcnow()
+
+    use_skip_locked = db.session.get_bind().dialect.name == 'postgresql'
+    lease = {
+        'claimed_by': grader_id,
+        'claim_expires_at': now + timedelta(seconds=lease_seconds)
+    }
+
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        query = db.session.query(AssignmentSubmission.id)\
+            .filter(_available_filter(assignment_id, now))\
+            .order_by(AssignmentSubmission.submission_date, AssignmentSubmission.id)\
+            .limit(1)
+        if use_skip_locked:
+            query = query.with_for_update(skip_locked=True)
+
+        submission_id = query.scalar()
+        if submission_id is None:
+            db.session.rollback()
+            return None
+
+        # Conditional update: only wins if nobody claimed it since we looked
+        updated = AssignmentSubmission.query.filter(
+            AssignmentSubmission.id == submission_id,
+            _available_filter(assignment_id, now)
+        ).update(lease, synchronize_session=False)
+
+        if updated == 1:
+            db.session.commit()
+            return db.session.get(AssignmentSubmission, submission_id)
+
+        # Lost the race to another grader, try the next submission
+        db.session.rollback()
+
+    return None
+
+
+def release_submission(submission_id, grader_id):
+    """Give a claimed submission back to the queue; returns True if the grader held it"""
+    released = AssignmentSubmission.query.filter(
+        AssignmentSubmission.id == submission_id,
+        AssignmentSubmission.claimed_by == grader_id
+    ).update({'claimed_by': None, 'claim_expires_at': None}, synchronize_session=False)
+    db.session.commit()
+    return released == 1
+
+
+def grade_submissions(assignment_id, grader_id, grades, now=None):
+    """Record grades for several submissions in one transaction.
+
+    Each item of ``grades`` has ``submission_id``, ``grade`` and optional
+    ``feedback``. A submission can be graded if it is not leased by another
+    grader. Returns (graded_ids, rejected_ids).
+    """
+    if now is None:
+        now = datetime.utcnow()
+
+    # One UPDATE per batch, the grade and feedback picked per row with CASE; a later item for the same id wins
+    items = {item['submission_id']: item for item in grades}
+    submission_ids = list(items)
+    graded = set()
+
+    for start in range(0, len(submission_ids), GRADE_BATCH_SIZE):
+        batch = submission_ids[start:start + GRADE_BATCH_SIZE]
+        AssignmentSubmission.query.filter(
+            AssignmentSubmission.id.in_(batch),
+            AssignmentSubmission.assignment_id == assignment_id,
+            or_(
+                AssignmentSubmission.claimed_by.is_(None),
+                AssignmentSubmission.claimed_by == grader_id,
+                AssignmentSubmission.claim_expires_at <= now
+            )
+        ).update({
+            'grade': case({i: items[i]['grade'] for i in batch}, value=AssignmentSubmission.id),
+            'feedback': case({i: items[i].get('feedback') for i in batch}, value=AssignmentSubmission.id),
+            'status': GRADED_STATUS,
+            'graded_by': grader_id,
+            'graded_at': now,
+            'claimed_by': None,
+            'claim_expires_at': None
+        }, synchronize_session=False)
+
+        # Rows the update just wrote, read back in the same transaction
+        graded.update(submission_id for (submission_id,) in db.session.query(AssignmentSubmission.id).filter(
+            AssignmentSubmission.id.in_(batch),
+            AssignmentSubmission.graded_by == grader_id,
+            AssignmentSubmission.graded_at == now
+        ))
+
+    db.session.commit()
+    return ([i for i in submission_ids if i in graded],
+            [i for i in submission_ids if i not in graded])
+
+
+def get_queue_status(assignment_id, now=None):
+    """Count graded, claimed and available submissions for an assignment"""
+    if now is None:
+        now = datetime.utcnow()
+
+    is_graded = AssignmentSubmission.status == GRADED_STATUS
+    is_claimed = and_(
+        ~is_graded,
+        AssignmentSubmission.claimed_by.isnot(None),
+        AssignmentSubmission.claim_expires_at > now
+    )
+    total, graded, claimed = db.session.query(
+        func.count(AssignmentSubmission.id),
+        func.count(AssignmentSubmission.id).filter(is_graded),
+        func.count(AssignmentSubmission.id).filter(is_claimed)
+    ).filter(AssignmentSubmission.assignment_id == assignment_id).one()
+
+    return {
+        'total': total,
+        'graded': graded,
+        'claimed': claimed,
+        'available': total - graded - claimed
+    }
@@ -1,5 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
 from datetime import datetime
+import json
 import enum
 
 db = SQLAlchemy()
@@ -36,6 +39,14 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login = db.Column(db.DateTime, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='active', server_default='active')  # active, inactive, pending
+    deleted_at = db.Column(db.DateTime, nullable=True)  # Soft-deleted; hidden from queries, see below
+
+    __table_args__ = (
+        db.Index('ix_users_role_id', 'role', 'id'),
+        db.Index('ix_users_status_id', 'status', 'id'),
+        db.Index('ix_users_deleted_at', 'deleted_at'),
+    )
 
     def __repr__(self):
         return f'<User {self.email}>'
@@ -48,10 +59,33 @@ class User(db.Model):
             'last_name': self.last_name,
             'role': self.role.value,
             'access_code': self.access_code,
+            'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_login': self.last_login.isoformat() if self.last_login else None
         }
 
+# Case-insensitive prefix search on the user directory (see app/user_directory.py)
+db.Index('ix_users_email_lower', db.func.lower(User.email))
+db.Index('ix_users_first_name_lower', db.func.lower(User.first_name))
+db.Index('ix_users_last_name_lower', db.func.lower(User.last_name))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_deleted_users(execute_state):
+    """Leave soft-deleted users out of every ORM query.
+
+    Pass execution_options(include_deleted=True) to see them, e.g. for
+    uniqueness checks and the purge job. Lazy loads through relationships
+    (enrollment.student.user, ...) still return the row.
+    """
+    if (execute_state.is_select
+            and not execute_state.is_column_load
+            and not execute_state.is_relationship_load
+            and not execute_state.execution_options.get('include_deleted', False)):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(User, User.deleted_at.is_(None), include_aliases=True,
+                                 propagate_to_loaders=False)
+        )
+
 # Student-specific model
 class Student(db.Model):
     __tablename__ = 'students'
@@ -149,6 +183,8 @@ class Course(db.Model):
     
     creator = db.relationship('User', backref='created_courses')
     
+    __table_args__ = (db.Index('ix_courses_department', 'department'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -208,6 +244,12 @@ class Enrollment(db.Model):
     student = db.relationship('Student', backref='enrollments')
     course = db.relationship('Course', backref='enrollments')
     
+    __table_args__ = (
+        # Indexes used to bucket enrollments over time, for all courses or per course
+        db.Index('ix_enrollments_date', 'enrollment_date'),
+        db.Index('ix_enrollments_course_date', 'course_id', 'enrollment_date'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -236,9 +278,16 @@ class Notification(db.Model):
     read = db.Column(db.Boolean, nullable=False, default=False)
     type = db.Column(db.Enum(NotificationType), nullable=False)
     link = db.Column(db.String(200))  # Optional link to related content
+    count = db.Column(db.Integer, nullable=False, default=1)  # Events folded into this row by digesting
+    updated_at = db.Column(db.DateTime)  # Time of the latest event folded into this row
     
     user = db.relationship('User', backref=db.backref('notifications', lazy=True))
     
+    __table_args__ = (
+        db.Index('ix_notifications_user_read', 'user_id', 'read'),
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -247,7 +296,40 @@ class Notification(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'read': self.read,
             'type': self.type.value,
-            'link': self.link
+            'link': self.link,
+            'count': self.count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+# Archived notification model - read notifications moved out of the live table by the retention job
+class NotificationArchive(db.Model):
+    __tablename__ = 'notification_archive'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Same id as the original notification
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    title = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    read = db.Column(db.Boolean, nullable=False, default=True)
+    type = db.Column(db.Enum(NotificationType), nullable=False)
+    link = db.Column(db.String(200))
+    count = db.Column(db.Integer, nullable=False, default=1)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Per-user unread notification counter, kept in step with the notifications
+# table by the helpers in app/notifications.py
+class NotificationCounter(db.Model):
+    __tablename__ = 'notification_counters'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'unread_count': self.unread_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 # Assignment model
@@ -294,11 +376,21 @@ class AssignmentSubmission(db.Model):
     feedback = db.Column(db.Text, nullable=True)
     graded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     graded_at = db.Column(db.DateTime, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the submitted file
+    claimed_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Grader holding the lease
+    claim_expires_at = db.Column(db.DateTime, nullable=True)
     
     assignment = db.relationship('Assignment', backref=db.backref('submissions', lazy=True))
     student = db.relationship('Student', backref=db.backref('assignment_submissions', lazy=True))
     grader = db.relationship('User', foreign_keys=[graded_by], backref='graded_submissions')
     
+    __table_args__ = (
+        # Index used to find identical files submitted for the same assignment
+        db.Index('ix_submission_assignment_hash', 'assignment_id', 'content_hash'),
+        # Index used by the grading queue to find the next ungraded submission
+        db.Index('ix_submission_assignment_status', 'assignment_id', 'status'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -315,7 +407,35 @@ class AssignmentSubmission(db.Model):
             'grade': self.grade,
             'feedback': self.feedback,
             'graded_by': self.graded_by,
-            'graded_at': self.graded_at.isoformat() if self.graded_at else None
+            'graded_at': self.graded_at.isoformat() if self.graded_at else None,
+            'content_hash': self.content_hash,
+            'claimed_by': self.claimed_by,
+            'claim_expires_at': self.claim_expires_at.isoformat() if self.claim_expires_at else None
+        }
+
+# Assignment reminder model - one row per (assignment, offset) that has been sent.
+# The unique constraint is what makes a reminder fire only once, even when several
+# worker processes run the scheduler at the same time.
+class AssignmentReminder(db.Model):
+    __tablename__ = 'assignment_reminders'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignments.id'), nullable=False)
+    offset_hours = db.Column(db.Integer, nullable=False)
+    recipient_count = db.Column(db.Integer, nullable=False, default=0)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    assignment = db.relationship('Assignment', backref=db.backref('reminders', lazy=True))
+    
+    __table_args__ = (db.UniqueConstraint('assignment_id', 'offset_hours', name='uq_assignment_reminder'),)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'assignment_id': self.assignment_id,
+            'offset_hours': self.offset_hours,
+            'recipient_count': self.recipient_count,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
         }
 
 # Policy model
@@ -385,7 +505,8 @@ class FacultyCourse(db.Model):
     __tablename__ = 'faculty_courses'
     
     id = db.Column(db.Integer, primary_key=True)
-    faculty_id = db.Column(db.Integer, db.ForeignKey('faculty.id'), nullable=False)
+    # Null once the faculty member has been purged; the assignment stays for its attendance history
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculty.id'), nullable=True)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
     semester = db.Column(db.String(50), nullable=False)  # e.g., "Spring 2024"
     schedule = db.Column(db.String(100), nullable=True)  # e.g., "Mon, Wed 9:00-10:30 AM"
@@ -504,4 +625,132 @@ class CourseMaterial(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'downloads': self.downloads,
             'views': self.views
-        } 
\ No newline at end of file
+        } 
+
+# Email outbox model - one row per notification email, written in the same transaction
+# as the notification and delivered later by the dispatcher in app/email_outbox.py
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    to_address = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32))  # Set by the dispatcher that is currently sending the row
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'to_address': self.to_address,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+# Refresh token model - one row per issued refresh token. Each token can be used once;
+# using it issues a new token in the same family, and reusing an old one revokes the family.
+class RefreshToken(db.Model):
+    __tablename__ = 'refresh_tokens'
+    
+    jti = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    family_id = db.Column(db.String(36), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    used_at = db.Column(db.DateTime)
+    revoked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Revoked token model - jtis of access/refresh tokens revoked before they expire.
+# Workers mirror this table in memory (app/token_blocklist.py), reading only rows
+# with an id above the last one they have seen.
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Allocation counter model - next unreserved number of a named counter (e.g. access codes).
+# Processes reserve blocks of numbers from it, see app/access_codes.py.
+class AllocationCounter(db.Model):
+    __tablename__ = 'allocation_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+
+# Roster staging model - one row per person of a registrar (SIS) roster export being synced.
+# Rows of a sync share a sync_id and are deleted once it is applied, see app/roster_sync.py.
+class RosterStaging(db.Model):
+    __tablename__ = 'roster_staging'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sync_id = db.Column(db.String(36), nullable=False)
+    email = db.Column(db.String(120), nullable=False)  # lower-cased, matched against lower(users.email)
+    first_name = db.Column(db.String(50), nullable=False)
+    last_name = db.Column(db.String(50), nullable=False)
+    role = db.Column(db.Enum(UserRole), nullable=False)
+    sis_id = db.Column(db.String(20), nullable=True)  # student_id / faculty_id
+    program = db.Column(db.String(100), nullable=True)
+    year_level = db.Column(db.Integer, nullable=True)
+    department = db.Column(db.String(100), nullable=True)
+    position = db.Column(db.String(100), nullable=True)
+    
+    __table_args__ = (db.UniqueConstraint('sync_id', 'email', name='uq_roster_staging_sync_email'),)
+
+# Department analytics snapshot - the department dashboard numbers, precomputed per department.
+# Marked stale when courses, enrollments, approvals or faculty of the department change and
+# recomputed on the next read or by refresh_department_analytics.py, see app/department_analytics.py.
+class DepartmentAnalytics(db.Model):
+    __tablename__ = 'department_analytics'
+    
+    department = db.Column(db.String(100), primary_key=True)
+    total_courses = db.Column(db.Integer, nullable=False, default=0)
+    active_courses = db.Column(db.Integer, nullable=False, default=0)
+    total_enrollments = db.Column(db.Integer, nullable=False, default=0)
+    total_faculty = db.Column(db.Integer, nullable=False, default=0)
+    approvals_pending = db.Column(db.Integer, nullable=False, default=0)
+    approvals_approved = db.Column(db.Integer, nullable=False, default=0)
+    approvals_rejected = db.Column(db.Integer, nullable=False, default=0)
+    popular_courses = db.Column(db.Text, nullable=False, default='[]')  # JSON list of {course, enrollment_count}
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    version = db.Column(db.Integer, nullable=False, default=0)  # Bumped by every stale mark
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'department': self.department,
+            'course_statistics': {
+                'total_courses': self.total_courses,
+                'active_courses': self.active_courses,
+                'inactive_courses': self.total_courses - self.active_courses
+            },
+            'enrollment_statistics': {
+                'total_enrollments': self.total_enrollments
+            },
+            'faculty_statistics': {
+                'total_faculty': self.total_faculty
+            },
+            'approval_statistics': {
+                'pending': self.approvals_pending,
+                'approved': self.approvals_approved,
+                'rejected': self.approvals_rejected
+            },
+            'popular_courses': json.loads(self.popular_courses),
+            'refreshed_at': self.refreshed_at.isoformat() if self.refreshed_at else None
+        }
@@ -1,29 +0,0 @@
-from app import db
-from datetime import datetime
-
-class Notification(db.Model):
-    __tablename__ = 'notifications'
-    
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    title = db.Column(db.String(100), nullable=False)
-    message = db.Column(db.Text, nullable=False)
-    type = db.Column(db.String(50), nullable=False)  # e.g., 'assignment', 'grade', 'announcement'
-    is_read = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    link = db.Column(db.String(255))  # Optional link to related content
-    
-    # Relationship with User model
-    user = db.relationship('User', backref=db.backref('notifications', lazy=True))
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'title': self.title,
-            'message': self.message,
-            'type': self.type,
-            'is_read': self.is_read,
-            'created_at': self.created_at.isoformat(),
-            'link': self.link
-        } 
\ No newline at end of file
@@ -0,0 +1,243 @@
+"""
+Live notification stream.
+
+Connected clients subscribe to a per-process broadcaster instead of polling
+the notifications endpoints. A single background thread tails the
+notifications table (``id > last seen id``) and fans new rows out to the
+subscribers of each user, so the database sees a couple of cheap queries per
+poll interval no matter how many tabs are open, and none at all while nobody
+is connected. Because it reads from the table, notifications written by other
+worker processes are delivered too.
+
+Ids are handed out when a row is inserted, not when it commits, so on
+Postgres a row can become visible after a higher id was already seen. Ids
+skipped over by the tail are kept as gaps and looked up again on each poll
+until they show up or NOTIFICATION_STREAM_GAP_SECONDS pass (a rolled back
+insert never fills its id).
+
+Unread counts are pushed right away to the tabs connected to the process
+that changed them (publish_unread_count). Tabs connected to other processes
+get the new count from the tail, which compares the counters of subscribed
+users with the last count it sent, one poll interval later.
+"""
+import time
+import json
+import logging
+import queue
+import threading
+
+from sqlalchemy import func, or_
+
+from app.models import db, Notification, NotificationCounter
+from app.notifications import get_unread_count
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+REPLAY_LIMIT = 100
+MAX_GAPS = 1000
+
+
+def format_event(event_type, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class NotificationBroadcaster:
+    """In-process pub/sub for notification events, fed by one shared DB tail."""
+
+    def __init__(self):
+        self.app = None
+        self.poll_interval = 2.0
+        self.gap_seconds = 30.0
+        self._subscribers = {}  # user_id -> set of queues
+        self._lock = threading.Lock()
+        self._last_id = None
+        self._gaps = {}  # skipped notification id -> time it was first missed
+        self._counts = {}  # user_id -> unread count last sent to their tabs
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('NOTIFICATION_STREAM_POLL_SECONDS', 2.0)
+        self.gap_seconds = app.config.get('NOTIFICATION_STREAM_GAP_SECONDS', 30.0)
+
+    def subscribe(self, user_id):
+        """Register a subscriber queue for a user; needs an app context.
+        
+        Queue items are (event_id, message) pairs, where event_id is None for
+        events that are not notifications.
+        """
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            # Only the first subscriber after an idle period seeds the position; the rest keep it
+            if self._last_id is None:
+                self._last_id = db.session.query(func.max(Notification.id)).scalar() or 0
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        self._ensure_thread()
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+                    self._counts.pop(user_id, None)
+
+    def has_subscribers(self, user_id):
+        with self._lock:
+            return user_id in self._subscribers
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, user_id, message, event_id=None):
+        """Push a formatted SSE message to every subscriber of a user in this process"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event_id, message))
+            except queue.Full:
+                # Slow client; it will catch up through Last-Event-ID on reconnect
+                logger.warning(f"Dropping notification event for slow subscriber of user {user_id}")
+
+    def set_unread_count(self, user_id, count):
+        """Record the unread count sent to a user's tabs; returns False if it is the one they already have"""
+        with self._lock:
+            if self._counts.get(user_id) == count:
+                return False
+            self._counts[user_id] = count
+            return True
+
+    def _track_gaps(self, previous_id, found_ids, now):
+        """Forget gaps that filled in, remember ids skipped over and expire old gaps; call with the lock held"""
+        for notification_id in found_ids:
+            self._gaps.pop(notification_id, None)
+        expected = previous_id + 1
+        for notification_id in sorted(i for i in found_ids if i > previous_id):
+            for missing in range(expected, notification_id):
+                self._gaps.setdefault(missing, now)
+            expected = notification_id + 1
+        for notification_id, missed_at in list(self._gaps.items()):
+            if now - missed_at > self.gap_seconds:
+                del self._gaps[notification_id]
+        if len(self._gaps) > MAX_GAPS:
+            for notification_id in sorted(self._gaps)[:len(self._gaps) - MAX_GAPS]:
+                del self._gaps[notification_id]
+
+    def poll_once(self, now=None):
+        """Fetch notifications committed since the last poll and fan them out; needs an app context"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            user_ids = set(self._subscribers)
+            last_id = self._last_id
+            gaps = list(self._gaps)
+        if not user_ids or last_id is None:
+            return 0
+
+        condition = Notification.id > last_id
+        if gaps:
+            condition = or_(condition, Notification.id.in_(gaps))
+        rows = Notification.query\
+            .filter(condition)\
+            .order_by(Notification.id)\
+            .limit(1000)\
+            .all()
+
+        with self._lock:
+            # Unless everyone left meanwhile and the position was reset
+            if self._last_id is not None:
+                self._track_gaps(last_id, [row.id for row in rows], now)
+                if rows:
+                    self._last_id = max(self._last_id, rows[-1].id)
+        for notification in rows:
+            if notification.user_id in user_ids:
+                self.publish(
+                    notification.user_id,
+                    format_event('notification', notification.to_dict(), event_id=notification.id),
+                    event_id=notification.id
+                )
+        self._poll_unread_counts(user_ids)
+        return len(rows)
+
+    def _poll_unread_counts(self, user_ids):
+        """Send the counts that changed since they were last sent, e.g. by another process"""
+        counts = db.session.query(NotificationCounter.user_id, NotificationCounter.unread_count)\
+            .filter(NotificationCounter.user_id.in_(list(user_ids)))\
+            .all()
+        for user_id, count in counts:
+            with self._lock:
+                seen = user_id in self._counts
+            # The tab read its count when it connected, so the first one is only recorded
+            if self.set_unread_count(user_id, count) and seen:
+                self.publish(user_id, format_event('unread-count', {'unread_count': count}))
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='notification-stream', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            with self._lock:
+                if not self._subscribers:
+                    # Nobody is listening; start again from the newest row on the next subscribe
+                    self._last_id = None
+                    self._gaps.clear()
+                    continue
+            with self.app.app_context():
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error polling notifications: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+        with self._lock:
+            self._last_id = None
+            self._gaps.clear()
+            self._counts.clear()
+
+
+broadcaster = NotificationBroadcaster()
+
+
+def get_missed_notifications(user_id, last_event_id):
+    """Notifications a reconnecting client missed since its Last-Event-ID"""
+    return Notification.query\
+        .filter(Notification.user_id == user_id, Notification.id > last_event_id)\
+        .order_by(Notification.id)\
+        .limit(REPLAY_LIMIT)\
+        .all()
+
+
+def publish_unread_count(user_id):
+    """Tell a user's tabs connected to this process their new unread count; skips the query if there are none.
+
+    Tabs on other processes get it from their broadcaster's next poll.
+    """
+    if not broadcaster.has_subscribers(user_id):
+        return
+    count = get_unread_count(user_id)
+    broadcaster.set_unread_count(user_id, count)
+    broadcaster.publish(user_id, format_event('unread-count', {'unread_count': count}))
@@ -0,0 +1,407 @@
+"""
+Notification writes and unread counters.
+
+Helpers for writing the same notification to many users at once: recipients
+are expanded with a single query and the rows are written with bulk inserts
+in batches instead of one ORM object and one commit per user.
+
+Every write path that changes how many unread notifications a user has
+(insert, mark read, mark all read, delete) also adjusts that user's row in
+``notification_counters``, so the unread count is a primary key lookup
+instead of a COUNT over the notifications table.
+
+Notifications of a type listed in NOTIFICATION_DIGEST_WINDOWS are digested
+(no type is by default, and announcements never are): if the user already
+has an unread notification of the same type and link that was opened within
+the type's window, the new event is folded into that row (its count goes up
+and it shows the latest title and message) instead of adding another one.
+The folded row is written back under a new id, so the live stream, which
+tails new ids, delivers it like any other notification. Digesting is best
+effort; two writers racing on the first event of a window can still open
+two rows.
+
+New notification rows are also queued for email in the same transaction when
+email notifications are enabled (see app/email_outbox.py).
+
+Read notifications older than the retention period are removed (or moved to
+``notification_archive``) in small batches by ``purge_read_notifications``.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, select, union, exists, func, bindparam, update, delete, and_, or_, literal, false
+
+from app.email_outbox import email_notifications_enabled, enqueue_notification_emails
+from app.models import (db, Notification, NotificationArchive, NotificationCounter, NotificationType, User,
+                        Student, Faculty, DepartmentHead, Enrollment, Course)
+
+BATCH_SIZE = 1000
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _insert_ignoring_conflicts(table):
+    """INSERT that skips rows already present, where the database supports it"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(table), False
+    return dialect_insert(table), True
+
+
+def _unread_count_query(user_id_column):
+    return select(func.count(Notification.id))\
+        .where(Notification.user_id == user_id_column, Notification.read == False)\
+        .scalar_subquery()
+
+
+def ensure_unread_counters(user_ids):
+    """Create counter rows, initialised from the notifications table, for users that have none"""
+    user_ids = sorted(set(user_ids))
+    for chunk in _chunks(user_ids, BATCH_SIZE):
+        stmt, supports_conflicts = _insert_ignoring_conflicts(NotificationCounter)
+        stmt = stmt.from_select(
+            ['user_id', 'unread_count', 'updated_at'],
+            select(User.id, _unread_count_query(User.id), func.current_timestamp()).where(
+                User.id.in_(chunk),
+                ~exists().where(NotificationCounter.user_id == User.id)
+            )
+        )
+        if supports_conflicts:
+            stmt = stmt.on_conflict_do_nothing(index_elements=['user_id'])
+        db.session.execute(stmt)
+
+
+def adjust_unread_counters(deltas):
+    """Apply {user_id: delta} to the unread counters; the rows must exist"""
+    params = [{'uid': user_id, 'delta': delta} for user_id, delta in deltas.items() if delta]
+    if not params:
+        return
+    stmt = update(NotificationCounter)\
+        .where(NotificationCounter.user_id == bindparam('uid'))\
+        .values(
+            unread_count=NotificationCounter.unread_count + bindparam('delta'),
+            updated_at=datetime.utcnow()
+        )
+    for chunk in _chunks(params, BATCH_SIZE):
+        db.session.connection().execute(stmt, chunk)
+
+
+def get_unread_count(user_id):
+    """Read a user's unread count from the counter, creating it on first use"""
+    count = db.session.query(NotificationCounter.unread_count).filter_by(user_id=user_id).scalar()
+    if count is None:
+        ensure_unread_counters([user_id])
+        db.session.commit()
+        count = db.session.query(NotificationCounter.unread_count).filter_by(user_id=user_id).scalar() or 0
+    return count
+
+
+def rebuild_unread_counters(user_ids=None):
+    """Recompute unread counters from the notifications table, for some users or for everyone.
+
+    Returns the number of counters rebuilt.
+    """
+    if user_ids is None:
+        db.session.execute(delete(NotificationCounter))
+        user_ids = [row[0] for row in db.session.query(User.id)]
+    else:
+        user_ids = list(set(user_ids))
+        for chunk in _chunks(user_ids, BATCH_SIZE):
+            db.session.execute(delete(NotificationCounter).where(NotificationCounter.user_id.in_(chunk)))
+    ensure_unread_counters(user_ids)
+    db.session.commit()
+    return len(user_ids)
+
+
+def recipients_query(course_id=None, department=None, role=None):
+    """Build a single SELECT of recipient user ids for an announcement target.
+
+    Soft-deleted users are filtered out explicitly: the loader criteria only see
+    the User entity, not profile tables reached through user_id.
+    """
+    live = User.deleted_at.is_(None)
+
+    if course_id is not None:
+        return select(Student.user_id)\
+            .join(User, User.id == Student.user_id)\
+            .join(Enrollment, Enrollment.student_id == Student.id)\
+            .where(Enrollment.course_id == course_id, Enrollment.status == 'enrolled', live)\
+            .distinct()
+
+    if department is not None:
+        # Faculty and heads of the department, plus students enrolled in its courses
+        return union(
+            select(Faculty.user_id)
+                .join(User, User.id == Faculty.user_id)
+                .where(Faculty.department == department, live),
+            select(DepartmentHead.user_id)
+                .join(User, User.id == DepartmentHead.user_id)
+                .where(DepartmentHead.department == department, live),
+            select(Student.user_id)
+                .join(User, User.id == Student.user_id)
+                .join(Enrollment, Enrollment.student_id == Student.id)
+                .join(Course, Course.id == Enrollment.course_id)
+                .where(Course.department == department, Enrollment.status == 'enrolled', live)
+        )
+
+    if role is not None:
+        return select(User.id).where(User.role == role, live)
+
+    raise ValueError('An announcement needs a course, department or role target')
+
+
+def get_digest_window(notification_type):
+    """Seconds during which notifications of this type are digested; 0 if digesting is off"""
+    windows = current_app.config.get('NOTIFICATION_DIGEST_WINDOWS', {})
+    return windows.get(notification_type.value, 0)
+
+
+def fold_into_digests(user_ids, title, message, notification_type, link, now=None):
+    """Fold an event into each user's open digest for (type, link).
+
+    Returns the user ids that have no open digest and need a new row.
+    """
+    if now is None:
+        now = datetime.utcnow()
+    window = get_digest_window(notification_type)
+    if not window or link is None:
+        return list(user_ids)
+
+    since = now - timedelta(seconds=window)
+    digested = set()
+    for chunk in _chunks(sorted(set(user_ids)), BATCH_SIZE):
+        # Newest open digest per user
+        rows = db.session.query(Notification.user_id, func.max(Notification.id))\
+            .filter(
+                Notification.user_id.in_(chunk),
+                Notification.type == notification_type,
+                Notification.link == link,
+                Notification.read == False,
+                Notification.created_at >= since
+            )\
+            .group_by(Notification.user_id)\
+            .all()
+        if not rows:
+            continue
+
+        # Rewritten under a new id rather than updated in place, so the stream picks it up
+        ids = [notification_id for _, notification_id in rows]
+        db.session.execute(
+            insert(Notification).from_select(
+                ['user_id', 'title', 'message', 'type', 'link', 'created_at', 'read', 'count', 'updated_at'],
+                select(Notification.user_id, literal(title, Notification.title.type),
+                       literal(message, Notification.message.type), Notification.type, Notification.link,
+                       Notification.created_at, false(), Notification.count + 1,
+                       literal(now, Notification.updated_at.type))
+                .where(Notification.id.in_(ids))
+                .order_by(Notification.id)
+            )
+        )
+        db.session.execute(
+            delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        digested.update(user_id for user_id, _ in rows)
+
+    return [user_id for user_id in user_ids if user_id not in digested]
+
+
+def bulk_create_notifications(user_ids, title, message, notification_type=NotificationType.INFO, link=None,
+                              batch_size=BATCH_SIZE, digest=True):
+    """Insert one notification per user in batches and bump their unread counters; the caller commits.
+
+    Unless digest is False, users with an open digest for the type and link
+    get that row folded instead. Returns the number of users notified.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    now = datetime.utcnow()
+    notified = len(user_ids)
+    # Digested events update an unread row that is already counted
+    if digest:
+        user_ids = fold_into_digests(user_ids, title, message, notification_type, link, now=now)
+    if not user_ids:
+        return notified
+
+    # Counters are initialised before the insert so the new rows are only counted once
+    ensure_unread_counters(user_ids)
+
+    for chunk in _chunks(user_ids, batch_size):
+        db.session.execute(insert(Notification), [{
+            'user_id': user_id,
+            'title': title,
+            'message': message,
+            'type': notification_type,
+            'link': link,
+            'created_at': now,
+            'read': False,
+            'count': 1
+        } for user_id in chunk])
+
+    adjust_unread_counters(Counter(user_ids))
+    if email_notifications_enabled():
+        enqueue_notification_emails(user_ids, title, message, link=link, now=now)
+    return notified
+
+
+def create_notification(user_id, title, message, notification_type=NotificationType.INFO, link=None):
+    """Create a single notification and bump the user's unread counter.
+
+    Returns the user's open digest instead if the event was folded into it.
+    """
+    if not fold_into_digests([user_id], title, message, notification_type, link):
+        db.session.commit()
+        return Notification.query\
+            .filter_by(user_id=user_id, type=notification_type, link=link, read=False)\
+            .order_by(Notification.id.desc())\
+            .first()
+
+    ensure_unread_counters([user_id])
+    notification = Notification(
+        user_id=user_id,
+        title=title,
+        message=message,
+        type=notification_type,
+        link=link
+    )
+    db.session.add(notification)
+    db.session.flush()
+    adjust_unread_counters({user_id: 1})
+    if email_notifications_enabled():
+        enqueue_notification_emails([user_id], title, message, link=link)
+    db.session.commit()
+    return notification
+
+
+def mark_notification_read(user_id, notification_id):
+    """Mark one notification read; returns False if the user has no such notification"""
+    notification = Notification.query.filter_by(id=notification_id, user_id=user_id).first()
+    if not notification:
+        return False
+
+    # The counter must exist before the update, or it would be initialised without this row
+    ensure_unread_counters([user_id])
+    changed = Notification.query\
+        .filter_by(id=notification_id, user_id=user_id, read=False)\
+        .update({'read': True}, synchronize_session=False)
+    adjust_unread_counters({user_id: -changed})
+    db.session.commit()
+    return True
+
+
+def mark_all_notifications_read(user_id):
+    """Mark all of a user's notifications read; returns how many changed"""
+    ensure_unread_counters([user_id])
+    changed = Notification.query\
+        .filter_by(user_id=user_id, read=False)\
+        .update({'read': True}, synchronize_session=False)
+    db.session.execute(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == user_id)
+        .values(unread_count=0, updated_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return changed
+
+
+def delete_notification(user_id, notification_id):
+    """Delete one of a user's notifications; returns False if it doesn't exist"""
+    notification = Notification.query.filter_by(id=notification_id, user_id=user_id).first()
+    if not notification:
+        return False
+
+    was_unread = not notification.read
+    if was_unread:
+        ensure_unread_counters([user_id])
+    db.session.delete(notification)
+    if was_unread:
+        adjust_unread_counters({user_id: -1})
+    db.session.commit()
+    return True
+
+
+def send_announcement(title, message, notification_type=NotificationType.INFO, link=None,
+                      course_id=None, department=None, role=None, batch_size=BATCH_SIZE):
+    """Expand an announcement target and notify every recipient; returns the recipient count.
+
+    Announcements are never digested, so each one keeps its own title and message.
+    """
+    query = recipients_query(course_id=course_id, department=department, role=role)
+    user_ids = db.session.execute(query).scalars().all()
+
+    count = bulk_create_notifications(user_ids, title, message, notification_type=notification_type,
+                                      link=link, batch_size=batch_size, digest=False)
+    db.session.commit()
+    return count
+
+
+def get_notifications_page(user_id, before_id=None, limit=50):
+    """Get a page of a user's notifications, newest first, starting after the cursor.
+
+    Returns (notifications, next_before_id); next_before_id is None on the last page.
+    """
+    query = Notification.query.filter(Notification.user_id == user_id)
+
+    if before_id is not None:
+        cursor = db.session.query(Notification.created_at)\
+            .filter_by(id=before_id, user_id=user_id)\
+            .scalar()
+        if cursor is not None:
+            query = query.filter(or_(
+                Notification.created_at < cursor,
+                and_(Notification.created_at == cursor, Notification.id < before_id)
+            ))
+        else:
+            query = query.filter(Notification.id < before_id)
+
+    rows = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, rows[-1].id if has_more else None
+
+
+def purge_read_notifications(older_than_days, archive=False, batch_size=BATCH_SIZE, now=None):
+    """Delete (or archive) read notifications older than the given age in batches.
+
+    Each batch is its own short transaction so the table is never locked for
+    long. Returns the number of notifications removed.
+    """
+    if now is None:
+        now = datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+    columns = ['id', 'user_id', 'title', 'message', 'created_at', 'read', 'type', 'link', 'count']
+    total = 0
+
+    while True:
+        ids = [row[0] for row in db.session.query(Notification.id)
+               .filter(Notification.read == True, Notification.created_at < cutoff)
+               .order_by(Notification.id)
+               .limit(batch_size)]
+        if not ids:
+            break
+
+        if archive:
+            db.session.execute(
+                insert(NotificationArchive).from_select(
+                    columns,
+                    select(*[getattr(Notification, column) for column in columns]).where(Notification.id.in_(ids))
+                )
+            )
+        db.session.execute(delete(Notification).where(Notification.id.in_(ids)))
+        db.session.commit()
+        total += len(ids)
+
+        if len(ids) < batch_size:
+            break
+
+    return total
+
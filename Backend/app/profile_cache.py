@@ -0,0 +1,60 @@
+"""
+Short-lived per-user cache of the /api/users/me response.
+
+The frontend asks for /me on nearly every page load. Each worker keeps the
+serialized response per user for ME_CACHE_SECONDS, together with an ETag
+(a hash of the body), so a repeat request needs no query and a client that
+already has the body gets a 304. Routes that change a user or their profile
+call invalidate(); changes made elsewhere (bulk jobs, other workers) show up
+once the entry expires.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProfileCache:
+    """user id -> (etag, payload), oldest entries dropped beyond max_entries"""
+
+    def __init__(self, ttl_seconds=30, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (expires_at, etag, payload)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl_seconds = app.config.get('ME_CACHE_SECONDS', self.ttl_seconds)
+        self.max_entries = app.config.get('ME_CACHE_MAX_ENTRIES', self.max_entries)
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, user_id):
+        """(etag, payload) for the user, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(int(user_id))
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1], entry[2]
+
+    def put(self, user_id, payload):
+        """Store a payload; returns (etag, payload)"""
+        etag = hashlib.blake2b(json.dumps(payload, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+        if self.ttl_seconds > 0:
+            with self._lock:
+                self._entries[int(user_id)] = (time.monotonic() + self.ttl_seconds, etag, payload)
+                self._entries.move_to_end(int(user_id))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag, payload
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,275 @@
+"""
+Bulk user provisioning from a CSV file.
+
+Rows are read as a stream and handled in batches of PROVISION_BATCH_SIZE.
+For each batch the temporary passwords are bcrypt-hashed on a process pool
+(bcrypt is CPU-bound, so threads would queue behind each other), access codes
+come from one allocator call, and the users and their role profiles are
+written with two executemany INSERTs and one commit. Every input row ends up
+in the credentials report, either with its access code and temporary
+password or with the reason it was skipped.
+
+The pool is shared by every upload of the process. It is started on first
+use with the spawn method, since forking a threaded server can copy locks
+held by other request threads, and shut down at exit.
+
+CSV columns: email, first_name, last_name, role (required) and optionally
+student_id, program, year_level for students, faculty_id, department,
+position for faculty and department for admins and department heads.
+"""
+import atexit
+import csv
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import bcrypt
+from email_validator import EmailNotValidError
+from flask import current_app, has_app_context
+from sqlalchemy import insert
+
+from app.access_codes import allocate_access_codes
+from app.auth import get_bcrypt_rounds, normalize_email
+from app.models import db, User, UserRole, Student, Faculty, Admin, DepartmentHead
+
+REQUIRED_COLUMNS = ('email', 'first_name', 'last_name', 'role')
+REPORT_COLUMNS = ('line', 'email', 'first_name', 'last_name', 'role', 'access_code', 'temporary_password',
+                  'result', 'error')
+DEFAULT_BATCH_SIZE = 500
+
+_pool = None  # (executor, workers)
+_pool_lock = threading.Lock()
+
+
+def _config(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def _hash_passwords(passwords, rounds):
+    """Hash a chunk of passwords; runs in a worker process"""
+    return [bcrypt.hashpw(p.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8') for p in passwords]
+
+
+def _get_pool(processes):
+    """The shared hashing pool, started on first use; returns (executor, workers)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+            _pool = (executor, processes)
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the hashing pool; the next upload starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool[0].shutdown(wait=True)
+            _pool = None
+
+
+def hash_passwords(passwords, rounds, pool=None, workers=1):
+    """Hash passwords in order, split into one chunk per worker process of the pool"""
+    if pool is None or len(passwords) < 2:
+        return _hash_passwords(passwords, rounds)
+    size = -(-len(passwords) // workers)
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    return [h for hashed in pool.map(_hash_passwords, chunks, [rounds] * len(chunks)) for h in hashed]
+
+
+def _validate_row(line, row):
+    """Normalize a CSV row; returns (entry, error)"""
+    missing = [c for c in REQUIRED_COLUMNS if not (row.get(c) or '').strip()]
+    if missing:
+        return None, f"Missing {', '.join(missing)}"
+    try:
+        email = normalize_email(row['email'].strip())
+    except EmailNotValidError as e:
+        return None, str(e)
+    try:
+        role = UserRole(row['role'].strip().lower())
+    except ValueError:
+        return None, f"Invalid role {row['role']}"
+    year_level = (row.get('year_level') or '').strip()
+    if year_level and not year_level.isdigit():
+        return None, "year_level must be a number"
+
+    def optional(column):
+        return (row.get(column) or '').strip() or None
+
+    return {
+        'line': line,
+        'email': email,
+        'first_name': row['first_name'].strip(),
+        'last_name': row['last_name'].strip(),
+        'role': role,
+        'student_id': optional('student_id'),
+        'program': optional('program'),
+        'year_level': int(year_level) if year_level else None,
+        'faculty_id': optional('faculty_id'),
+        'department': optional('department'),
+        'position': optional('position'),
+    }, None
+
+
+def _report_row(entry, result, error=None, access_code=None, temporary_password=None):
+    role = entry.get('role')
+    return {
+        'line': entry['line'],
+        'email': entry.get('email'),
+        'first_name': entry.get('first_name'),
+        'last_name': entry.get('last_name'),
+        'role': role.value if isinstance(role, UserRole) else role,
+        'access_code': access_code,
+        'temporary_password': temporary_password,
+        'result': result,
+        'error': error,
+    }
+
+
+def _existing(column, values):
+    values = [v for v in values if v]
+    if not values:
+        return set()
+    # Soft-deleted users still hold their email
+    return {v for (v,) in db.session.query(column).filter(column.in_(values)).execution_options(include_deleted=True)}
+
+
+def _free_ids(candidates, column, taken):
+    """Make generated profile ids unique against `taken` and the table, adding -1, -2... on a clash"""
+    ids = list(candidates)
+    pending = list(range(len(ids)))
+    suffix = 0
+    while pending:
+        used = taken | _existing(column, [ids[i] for i in pending])
+        clashes = [i for i in pending if ids[i] in used]
+        taken.update(ids[i] for i in pending if ids[i] not in used)
+        suffix += 1
+        for i in clashes:
+            ids[i] = f"{candidates[i]}-{suffix}"
+        pending = clashes
+    return ids
+
+
+def _generated_ids(entries, user_ids, role, column, prefix, taken):
+    """Profile ids of the entries of a role that gave none: prefix and user id, unless that is taken"""
+    missing = [user_id for entry, user_id in zip(entries, user_ids)
+               if entry['role'] == role and not entry.get(column.key)]
+    return dict(zip(missing, _free_ids([f"{prefix}{user_id:04d}" for user_id in missing], column, taken)))
+
+
+def _profile_rows(entries, user_ids, taken_ids):
+    """Profile mappings per model for the inserted users"""
+    # Generated ids can match an explicit id of this file or one already in the database
+    generated = {
+        **_generated_ids(entries, user_ids, UserRole.STUDENT, Student.student_id, 'STU', taken_ids),
+        **_generated_ids(entries, user_ids, UserRole.FACULTY, Faculty.faculty_id, 'FAC', taken_ids),
+        **_generated_ids(entries, user_ids, UserRole.ADMIN, Admin.admin_id, 'ADM', set()),
+    }
+    profiles = {Student: [], Faculty: [], Admin: [], DepartmentHead: []}
+    for entry, user_id in zip(entries, user_ids):
+        role = entry['role']
+        if role == UserRole.STUDENT:
+            profiles[Student].append({'user_id': user_id, 'student_id': entry['student_id'] or generated[user_id],
+                                      'program': entry['program'], 'year_level': entry['year_level']})
+        elif role == UserRole.FACULTY:
+            profiles[Faculty].append({'user_id': user_id, 'faculty_id': entry['faculty_id'] or generated[user_id],
+                                      'department': entry['department'], 'position': entry['position']})
+        elif role == UserRole.ADMIN:
+            profiles[Admin].append({'user_id': user_id, 'admin_id': generated[user_id],
+                                    'department': entry['department']})
+        elif role == UserRole.DEPARTMENT_HEAD:
+            profiles[DepartmentHead].append({'user_id': user_id, 'department': entry['department'] or 'General'})
+    return profiles
+
+
+def _provision_batch(rows, rounds, pool, workers):
+    """Create the users of one batch; returns their report rows"""
+    report, entries = [], []
+    for line, row in rows:
+        entry, error = _validate_row(line, row)
+        if error:
+            report.append(_report_row({'line': line, **{c: row.get(c) for c in REQUIRED_COLUMNS}}, 'skipped', error))
+        else:
+            entries.append(entry)
+
+    # One lookup per unique column for the whole batch
+    taken_emails = _existing(User.email, [e['email'] for e in entries])
+    taken_ids = _existing(Student.student_id, [e['student_id'] for e in entries]) | \
+        _existing(Faculty.faculty_id, [e['faculty_id'] for e in entries])
+    accepted = []
+    for entry in entries:
+        profile_id = entry['student_id'] if entry['role'] == UserRole.STUDENT else \
+            entry['faculty_id'] if entry['role'] == UserRole.FACULTY else None
+        if entry['email'] in taken_emails:
+            report.append(_report_row(entry, 'skipped', "Email already in use"))
+        elif profile_id and profile_id in taken_ids:
+            report.append(_report_row(entry, 'skipped', f"ID {profile_id} already in use"))
+        else:
+            taken_emails.add(entry['email'])
+            if profile_id:
+                taken_ids.add(profile_id)
+            accepted.append(entry)
+    if not accepted:
+        return report
+
+    # Codes first: on SQLite the allocator must run before this transaction writes
+    access_codes = allocate_access_codes([e['email'] for e in accepted])
+    passwords = [secrets.token_hex(4) for _ in accepted]  # 8 character hex strings, as create_user
+    hashes = hash_passwords(passwords, rounds, pool, workers)
+
+    try:
+        user_ids = db.session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{'email': e['email'], 'password_hash': password_hash, 'first_name': e['first_name'],
+              'last_name': e['last_name'], 'role': e['role'], 'access_code': access_code, 'status': 'active'}
+             for e, password_hash, access_code in zip(accepted, hashes, access_codes)]
+        ).scalars().all()
+        for model, mappings in _profile_rows(accepted, user_ids, taken_ids).items():
+            if mappings:
+                db.session.execute(insert(model), mappings)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return report + [_report_row(entry, 'failed', f"Batch failed: {str(e)}") for entry in accepted]
+
+    return report + [_report_row(entry, 'created', access_code=access_code, temporary_password=password)
+                     for entry, access_code, password in zip(accepted, access_codes, passwords)]
+
+
+def provision_users(lines, report_file, batch_size=None, processes=None):
+    """Create the users of a CSV stream and write the credentials report.
+
+    `lines` is any iterable of CSV lines (an open file, a text stream of an
+    upload). Returns the counts of created, skipped and failed rows.
+    """
+    batch_size = batch_size or _config('PROVISION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    processes = processes or _config('PROVISION_HASH_PROCESSES', None) or os.cpu_count() or 1
+    rounds = get_bcrypt_rounds()
+
+    reader = csv.DictReader(lines)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing the column(s): {', '.join(missing)}")
+
+    writer = csv.DictWriter(report_file, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    counts = {'created': 0, 'skipped': 0, 'failed': 0}
+    # Line numbers as a spreadsheet shows them: the header is line 1
+    rows = ((reader.line_num, row) for row in reader)
+
+    pool, workers = _get_pool(processes) if processes > 1 else (None, 1)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        report = _provision_batch(batch, rounds, pool, workers)
+        for report_row in sorted(report, key=lambda r: r['line']):
+            counts[report_row['result']] += 1
+            writer.writerow(report_row)
+    return counts
@@ -0,0 +1,243 @@
+"""
+Sliding-window rate limiting for the login endpoints.
+
+Each key (an IP address or an email) keeps three numbers: the start of the
+current fixed window, the hits in it and the hits in the previous window.
+The sliding-window count is the current hits plus the previous hits weighted
+by how much of the previous window still overlaps the last ``window``
+seconds, which is accurate enough for abuse limits at a fraction of the
+memory of a timestamp log.
+
+Counters live in process memory by default. With RATE_LIMIT_STORE=sqlite
+they live in a small SQLite file shared by all workers on the host. Every
+key records when it stops counting (two of its own windows after its last
+window started), since limiters with different windows share one store;
+expired keys are dropped at most once a minute.
+
+Login requests are checked before any database or bcrypt work:
+
+* every login attempt counts against the client IP,
+* failed logins count against the email, and a success clears it (lockout),
+* user lookups (check-user) count against the client IP.
+"""
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+
+class MemoryStore:
+    """Per-process counters"""
+
+    PRUNE_THRESHOLD = 10000
+    PRUNE_INTERVAL = 60  # seconds between prunes once past the threshold
+
+    def __init__(self):
+        self._counters = {}  # key -> [window_start, current, previous, expires_at]
+        self._lock = threading.Lock()
+        self._next_prune = 0
+
+    def hit(self, key, window, now, increment=True):
+        """Record a hit (optionally) and return the sliding-window count for the key"""
+        start = now - now % window
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = [start, 0, 0, 0]
+            elif entry[0] != start:
+                previous = entry[1] if start - entry[0] == window else 0
+                entry = [start, 0, previous, 0]
+            if increment:
+                entry[1] += 1
+            # Nothing in the last two windows no longer counts for anything; each key keeps its own window
+            entry[3] = start + 2 * window
+            self._counters[key] = entry
+
+            if len(self._counters) > self.PRUNE_THRESHOLD and now >= self._next_prune:
+                self._prune(now)
+            return _sliding_count(entry, window, now)
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def _prune(self, now):
+        # At most once per interval, so a store full of live keys isn't rebuilt on every hit
+        self._counters = {key: entry for key, entry in self._counters.items() if entry[3] > now}
+        self._next_prune = now + self.PRUNE_INTERVAL
+
+
+class SQLiteStore:
+    """Counters in a SQLite file, shared by the worker processes of one host"""
+
+    PRUNE_INTERVAL = 60  # seconds between deletes of expired rows, per process
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._next_prune = 0
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, window_start REAL NOT NULL, current INTEGER NOT NULL, previous INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(rate_limits)")]
+        if 'expires_at' not in columns:
+            # Files from before expiry tracking; their rows are pruned on the first cleanup
+            connection.execute("ALTER TABLE rate_limits ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_rate_limits_expires_at ON rate_limits (expires_at)")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, window, now, increment=True):
+        start = now - now % window
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT window_start, current, previous FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                entry = [start, 0, 0]
+            elif row[0] != start:
+                entry = [start, 0, row[1] if start - row[0] == window else 0]
+            else:
+                entry = list(row)
+            if increment:
+                entry[1] += 1
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, window_start, current, previous, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, *entry, start + 2 * window)
+            )
+            if now >= self._next_prune:
+                self._next_prune = now + self.PRUNE_INTERVAL
+                connection.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return _sliding_count(entry, window, now)
+
+    def reset(self, key):
+        self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+def _sliding_count(entry, window, now):
+    start, current, previous = entry[:3]
+    overlap = 1 - (now - start) / window
+    return current + previous * overlap
+
+
+class RateLimiter:
+    """At most `limit` hits per key in any `window` seconds"""
+
+    def __init__(self, store, name, limit, window):
+        self.store = store
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def hit(self, key, now=None):
+        """Count a hit; returns seconds to wait if the key is over the limit, otherwise None"""
+        now = time.time() if now is None else now
+        count = self.store.hit(f'{self.name}:{key}', self.window, now)
+        return self._retry_after(now) if count > self.limit else None
+
+    def peek(self, key, now=None):
+        """Like hit, but doesn't count; returns seconds to wait if another hit would be over the limit"""
+        now = time.time() if now is None else now
+        count = self.store.hit(f'{self.name}:{key}', self.window, now, increment=False)
+        return self._retry_after(now) if count >= self.limit else None
+
+    def reset(self, key):
+        self.store.reset(f'{self.name}:{key}')
+
+    def _retry_after(self, now):
+        return max(1, int(self.window - now % self.window))
+
+
+class LoginGuard:
+    """The login and user lookup limits, plus counters of what they rejected"""
+
+    def __init__(self, store, config):
+        self.enabled = config.get('RATE_LIMIT_ENABLED', True)
+        self.login_ip = RateLimiter(store, 'login-ip', config.get('LOGIN_IP_LIMIT', 20),
+                                    config.get('LOGIN_IP_WINDOW_SECONDS', 60))
+        self.login_email = RateLimiter(store, 'login-email', config.get('LOGIN_EMAIL_FAILURE_LIMIT', 5),
+                                       config.get('LOGIN_EMAIL_WINDOW_SECONDS', 900))
+        self.lookup_ip = RateLimiter(store, 'lookup-ip', config.get('CHECK_USER_IP_LIMIT', 60),
+                                     config.get('CHECK_USER_IP_WINDOW_SECONDS', 60))
+        self._metrics = Counter()
+        self._metrics_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    def check_login(self, ip, email):
+        """Returns seconds to wait if this login attempt must be rejected, otherwise None"""
+        if not self.enabled:
+            return None
+        email = (email or '').strip().lower()
+        retry_after = self.login_email.peek(email)
+        if retry_after:
+            self._count('login_rejected_email')
+            return retry_after
+        retry_after = self.login_ip.hit(ip)
+        if retry_after:
+            self._count('login_rejected_ip')
+            return retry_after
+        self._count('login_allowed')
+        return None
+
+    def record_login_result(self, email, success):
+        if not self.enabled:
+            return
+        email = (email or '').strip().lower()
+        if success:
+            self.login_email.reset(email)
+        else:
+            self.login_email.hit(email)
+            self._count('login_failed')
+
+    def check_lookup(self, ip):
+        """Returns seconds to wait if this user lookup must be rejected, otherwise None"""
+        if not self.enabled:
+            return None
+        retry_after = self.lookup_ip.hit(ip)
+        self._count('lookup_rejected_ip' if retry_after else 'lookup_allowed')
+        return retry_after
+
+    def metrics(self):
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+
+def init_login_guard(app):
+    """Create the app's LoginGuard with the configured store"""
+    if app.config.get('RATE_LIMIT_STORE', 'memory') == 'sqlite':
+        store = SQLiteStore(app.config.get('RATE_LIMIT_SQLITE_PATH', 'rate_limits.db'))
+    else:
+        store = MemoryStore()
+    app.extensions['login_guard'] = LoginGuard(store, app.config)
+    return app.extensions['login_guard']
+
+
+_init_lock = threading.Lock()
+
+
+def get_login_guard(app):
+    """The app's LoginGuard, created on first use if the app didn't call init_login_guard()"""
+    guard = app.extensions.get('login_guard')
+    if guard is None:
+        with _init_lock:
+            guard = app.extensions.get('login_guard') or init_login_guard(app)
+    return guard
@@ -0,0 +1,163 @@
+"""
+Assignment deadline reminders.
+
+A background thread wakes up every REMINDER_INTERVAL_SECONDS and, for each
+offset in REMINDER_OFFSETS_HOURS, notifies the enrolled students who have not
+submitted an assignment that is due within that offset.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, exists
+from sqlalchemy.exc import IntegrityError
+
+from app.models import (db, Assignment, AssignmentReminder, AssignmentSubmission, Enrollment,
+                        NotificationType, Student, User)
+from app.notifications import bulk_create_notifications
+
+logger = logging.getLogger(__name__)
+
+_scheduler_thread = None
+_stop_event = threading.Event()
+
+
+def get_pending_recipients(assignment):
+    """Get user ids of enrolled, not deleted students with no submission for the assignment"""
+    # Single anti-join: enrolled students LEFT JOIN submissions WHERE submission IS NULL
+    rows = db.session.query(Student.user_id)\
+        .join(User, User.id == Student.user_id)\
+        .join(Enrollment, Enrollment.student_id == Student.id)\
+        .outerjoin(AssignmentSubmission, and_(
+            AssignmentSubmission.student_id == Student.id,
+            AssignmentSubmission.assignment_id == assignment.id
+        ))\
+        .filter(
+            Enrollment.course_id == assignment.course_id,
+            Enrollment.status == 'enrolled',
+            User.deleted_at.is_(None),
+            AssignmentSubmission.id.is_(None)
+        )\
+        .distinct()\
+        .all()
+    return [row[0] for row in rows]
+
+
+def get_due_assignments(offset_hours, next_offset_hours, now):
+    """Get assignments due inside the reminder window that have not been reminded yet"""
+    # Each offset only owns the window down to the next smaller offset, so an
+    # assignment created close to its deadline gets one reminder, not several
+    window_start = now + timedelta(hours=next_offset_hours)
+    window_end = now + timedelta(hours=offset_hours)
+    already_sent = exists().where(and_(
+        AssignmentReminder.assignment_id == Assignment.id,
+        AssignmentReminder.offset_hours == offset_hours
+    ))
+    return Assignment.query.filter(
+        Assignment.due_date > window_start,
+        Assignment.due_date <= window_end,
+        ~already_sent
+    ).all()
+
+
+def send_assignment_reminder(assignment, offset_hours, now):
+    """Send one reminder for an assignment; returns the number of students notified,
+    or None if another worker already sent it"""
+    recipients = get_pending_recipients(assignment)
+
+    try:
+        # Claim the (assignment, offset) pair in the same transaction as the
+        # notifications so that either both are committed or neither is
+        db.session.add(AssignmentReminder(
+            assignment_id=assignment.id,
+            offset_hours=offset_hours,
+            recipient_count=len(recipients),
+            sent_at=now
+        ))
+        db.session.flush()
+
+        if recipients:
+            hours_left = max(1, int((assignment.due_date - now).total_seconds() // 3600))
+            bulk_create_notifications(
+                recipients,
+                title=f'Assignment due soon: {assignment.title}'[:100],
+                message=f'"{assignment.title}" is due in about {hours_left} hour(s) '
+                        f'({assignment.due_date.isoformat()}) and you have not submitted it yet.',
+                notification_type=NotificationType.WARNING,
+                link='/dashboard/assignment-management'
+            )
+
+        db.session.commit()
+        return len(recipients)
+    except IntegrityError:
+        # Another process claimed this reminder first
+        db.session.rollback()
+        return None
+
+
+def send_due_reminders(offsets=None, now=None):
+    """Send all reminders that are due; returns a summary of what was sent"""
+    if offsets is None:
+        offsets = current_app.config.get('REMINDER_OFFSETS_HOURS', [48, 2])
+    if now is None:
+        now = datetime.utcnow()
+
+    offsets = sorted(set(offsets), reverse=True)
+    sent = []
+
+    for index, offset_hours in enumerate(offsets):
+        next_offset_hours = offsets[index + 1] if index + 1 < len(offsets) else 0
+        for assignment in get_due_assignments(offset_hours, next_offset_hours, now):
+            count = send_assignment_reminder(assignment, offset_hours, now)
+            if count is not None:
+                sent.append({
+                    'assignment_id': assignment.id,
+                    'offset_hours': offset_hours,
+                    'recipient_count': count
+                })
+
+    if sent:
+        logger.info(f"Sent {len(sent)} assignment reminder(s)")
+    return sent
+
+
+def _run_scheduler(app, interval):
+    while not _stop_event.wait(interval):
+        with app.app_context():
+            try:
+                send_due_reminders()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error sending assignment reminders: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+def start_reminder_scheduler(app):
+    """Start the in-process reminder thread (once per process)"""
+    global _scheduler_thread
+
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
+        return _scheduler_thread
+
+    interval = app.config.get('REMINDER_INTERVAL_SECONDS', 300)
+    _stop_event.clear()
+    _scheduler_thread = threading.Thread(
+        target=_run_scheduler,
+        args=(app, interval),
+        name='assignment-reminders',
+        daemon=True
+    )
+    _scheduler_thread.start()
+    return _scheduler_thread
+
+
+def stop_reminder_scheduler():
+    """Stop the reminder thread"""
+    global _scheduler_thread
+
+    _stop_event.set()
+    if _scheduler_thread is not None:
+        _scheduler_thread.join(timeout=5)
+    _scheduler_thread = None
@@ -0,0 +1,239 @@
+"""
+Diff-based sync of the registrar's (SIS) student and faculty roster.
+
+A sync has two steps:
+
+1. load_roster() streams the export into ``roster_staging`` under a new
+   sync id, in batches of executemany INSERTs.
+2. apply_roster() compares the staged rows with users, students and faculty
+   in a few set-based statements and changes only what differs:
+
+   * people not in users yet are created, pending password setup,
+   * names, programs, year levels, departments and positions that differ are
+     updated (UPDATE ... FROM staging, matched on lower(email)),
+   * inactive users that are back on the roster are reactivated,
+   * active students and faculty missing from the roster are deactivated and
+     their sessions revoked, access tokens included.
+
+People are matched by email; soft-deleted users are matched too but stay
+deleted. Admins and department heads are never touched, and student/faculty
+ids are only set when a user is created. A feed with no row of a role
+deactivates nobody of that role, so a truncated export can't empty the
+school.
+"""
+import csv
+import uuid
+from itertools import islice
+
+from email_validator import EmailNotValidError
+from sqlalchemy import insert, update, delete, exists, and_, or_, func, case
+
+from app.access_codes import allocate_access_codes
+from app.auth import normalize_email, revoke_user_sessions
+from app.models import db, User, UserRole, Student, Faculty, RosterStaging
+
+SYNCED_ROLES = (UserRole.STUDENT, UserRole.FACULTY)
+REQUIRED_COLUMNS = ('email', 'first_name', 'last_name', 'role')
+BATCH_SIZE = 1000
+
+
+def _staged_row(sync_id, row):
+    """Staging mapping for a CSV row, or None if the row is unusable"""
+    if any(not (row.get(c) or '').strip() for c in REQUIRED_COLUMNS):
+        return None
+    try:
+        email = normalize_email(row['email'].strip()).lower()
+        role = UserRole(row['role'].strip().lower())
+    except (EmailNotValidError, ValueError):
+        return None
+    if role not in SYNCED_ROLES:
+        return None
+    year_level = (row.get('year_level') or '').strip()
+
+    def optional(column):
+        return (row.get(column) or '').strip() or None
+
+    return {
+        'sync_id': sync_id,
+        'email': email,
+        'first_name': row['first_name'].strip(),
+        'last_name': row['last_name'].strip(),
+        'role': role,
+        'sis_id': optional('sis_id') or optional('student_id') or optional('faculty_id'),
+        'program': optional('program'),
+        'year_level': int(year_level) if year_level.isdigit() else None,
+        'department': optional('department'),
+        'position': optional('position'),
+    }
+
+
+def load_roster(lines, batch_size=BATCH_SIZE, commit=True):
+    """Stage a roster CSV; returns (sync_id, rows staged, rows rejected).
+
+    Columns: email, first_name, last_name, role (student or faculty) and
+    optionally sis_id (or student_id/faculty_id), program, year_level,
+    department, position. Repeated emails keep their first row. Each batch
+    is committed unless commit is False, in which case the staged rows go
+    with the caller's transaction.
+    """
+    reader = csv.DictReader(lines)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing the column(s): {', '.join(missing)}")
+
+    sync_id = str(uuid.uuid4())
+    seen = set()
+    staged = rejected = 0
+    rows = iter(reader)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        batch = []
+        for row in chunk:
+            mapping = _staged_row(sync_id, row)
+            if mapping is None or mapping['email'] in seen:
+                rejected += 1
+                continue
+            seen.add(mapping['email'])
+            batch.append(mapping)
+        if batch:
+            db.session.execute(insert(RosterStaging), batch)
+            if commit:
+                db.session.commit()
+            staged += len(batch)
+    return sync_id, staged, rejected
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _update(model, *criteria):
+    """UPDATE ... FROM, without syncing the session (the rows are not loaded)"""
+    return update(model).where(*criteria).execution_options(synchronize_session=False)
+
+
+def _create_new_users(sync_id, in_sync, email_match, dry_run=False):
+    """Create users (and profiles) for staged people without an account; returns (created, conflicts).
+
+    A dry run is rolled back, so it gives the users placeholder codes
+    instead of allocating real ones, which would commit on their own.
+    """
+    new_rows = RosterStaging.query.filter(in_sync, ~exists().where(email_match))\
+        .execution_options(include_deleted=True).order_by(RosterStaging.id).all()
+
+    # Registrar ids that another profile already has can't be created
+    taken = {v for (v,) in db.session.query(Student.student_id).filter(
+        Student.student_id.in_([r.sis_id for r in new_rows if r.sis_id and r.role == UserRole.STUDENT]))}
+    taken |= {v for (v,) in db.session.query(Faculty.faculty_id).filter(
+        Faculty.faculty_id.in_([r.sis_id for r in new_rows if r.sis_id and r.role == UserRole.FACULTY]))}
+    creatable = [r for r in new_rows if not (r.sis_id and r.sis_id in taken)]
+    if not creatable:
+        return 0, len(new_rows)
+
+    if dry_run:
+        access_codes = [f"{sync_id}-{i}" for i in range(len(creatable))]
+    else:
+        # Codes first: on SQLite the allocator must run before this transaction writes
+        access_codes = allocate_access_codes([r.email for r in creatable])
+    user_ids = db.session.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True),
+        [{'email': r.email, 'password_hash': 'NEEDS_SETUP', 'first_name': r.first_name, 'last_name': r.last_name,
+          'role': r.role, 'access_code': access_code, 'status': 'pending'}
+         for r, access_code in zip(creatable, access_codes)]
+    ).scalars().all()
+
+    students = [{'user_id': user_id, 'student_id': r.sis_id or f"STU{user_id:04d}", 'program': r.program,
+                 'year_level': r.year_level}
+                for r, user_id in zip(creatable, user_ids) if r.role == UserRole.STUDENT]
+    faculty = [{'user_id': user_id, 'faculty_id': r.sis_id or f"FAC{user_id:04d}", 'department': r.department,
+                'position': r.position}
+               for r, user_id in zip(creatable, user_ids) if r.role == UserRole.FACULTY]
+    if students:
+        db.session.execute(insert(Student), students)
+    if faculty:
+        db.session.execute(insert(Faculty), faculty)
+    return len(creatable), len(new_rows) - len(creatable)
+
+
+def _changed(column, staged):
+    """The feed has a value for the column and it differs from the stored one"""
+    return and_(staged.isnot(None), column.is_distinct_from(staged))
+
+
+def apply_roster(sync_id, deactivate_missing=True, dry_run=False):
+    """Apply a staged roster; returns how many rows of each kind changed.
+
+    With dry_run the changes are computed and rolled back. The staged rows
+    are removed either way.
+    """
+    S = RosterStaging
+    in_sync = S.sync_id == sync_id
+    email_match = and_(in_sync, S.email == func.lower(User.email))
+    counts = {}
+
+    try:
+        # Emails on the roster that belong to someone with another role (e.g. an admin)
+        counts['conflicts'] = db.session.query(func.count(S.id))\
+            .filter(in_sync, exists().where(email_match, User.role != S.role))\
+            .execution_options(include_deleted=True).scalar()
+
+        counts['created'], conflicts = _create_new_users(sync_id, in_sync, email_match, dry_run=dry_run)
+        counts['conflicts'] += conflicts
+
+        counts['updated'] = db.session.execute(_update(
+            User, email_match, User.role == S.role,
+            or_(User.first_name != S.first_name, User.last_name != S.last_name)
+        ).values(first_name=S.first_name, last_name=S.last_name)).rowcount
+
+        counts['profiles_updated'] = db.session.execute(_update(
+            Student, Student.user_id == User.id, email_match, S.role == UserRole.STUDENT,
+            or_(_changed(Student.program, S.program), _changed(Student.year_level, S.year_level))
+        ).values(program=func.coalesce(S.program, Student.program),
+                 year_level=func.coalesce(S.year_level, Student.year_level))).rowcount
+        counts['profiles_updated'] += db.session.execute(_update(
+            Faculty, Faculty.user_id == User.id, email_match, S.role == UserRole.FACULTY,
+            or_(_changed(Faculty.department, S.department), _changed(Faculty.position, S.position))
+        ).values(department=func.coalesce(S.department, Faculty.department),
+                 position=func.coalesce(S.position, Faculty.position))).rowcount
+
+        counts['reactivated'] = db.session.execute(_update(
+            User, User.status == 'inactive', User.role.in_(SYNCED_ROLES), exists().where(email_match, User.role == S.role)
+        ).values(status=case((User.password_hash == 'NEEDS_SETUP', 'pending'), else_='active'))).rowcount
+
+        counts['deactivated'] = 0
+        if deactivate_missing:
+            # Only roles the feed has rows for, so a partial export deactivates nobody of the missing role
+            roles = [role for (role,) in db.session.query(S.role).filter(in_sync).distinct()]
+            if roles:
+                deactivated = [user_id for (user_id,) in db.session.query(User.id).filter(
+                    User.role.in_(roles), User.status != 'inactive', ~exists().where(email_match)
+                ).execution_options(include_deleted=True)]
+                for chunk in _chunks(deactivated, BATCH_SIZE):
+                    db.session.execute(_update(User, User.id.in_(chunk)).values(status='inactive'))
+                    revoke_user_sessions(chunk)
+                counts['deactivated'] = len(deactivated)
+
+        if dry_run:
+            db.session.rollback()
+        db.session.execute(delete(S).where(in_sync))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        db.session.execute(delete(S).where(in_sync))
+        db.session.commit()
+        raise
+
+    return counts
+
+
+def sync_roster(lines, deactivate_missing=True, dry_run=False):
+    """Stage and apply a roster CSV in one go; returns the counts.
+
+    A dry run stages the rows in its own transaction too, so it commits nothing.
+    """
+    sync_id, staged, rejected = load_roster(lines, commit=not dry_run)
+    counts = apply_roster(sync_id, deactivate_missing=deactivate_missing, dry_run=dry_run)
+    return dict(counts, staged=staged, rejected=rejected)
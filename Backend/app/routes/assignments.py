@@ -1,10 +1,25 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Assignment, Course, User
+from app.models import db, Assignment, Course, User, UserRole, Student, FacultyCourse, Enrollment, AssignmentSubmission
+from app.auth import current_identity, current_profile
+from app.grading_queue import (claim_next_submission, release_submission, grade_submissions, get_queue_status,
+                               get_lease_seconds)
+from sqlalchemy import func, and_
 from datetime import datetime
+import hashlib
 
 assignments_bp = Blueprint('assignments', __name__)
 
+def teaches_course(user, course_id):
+    """Check whether the requesting user (a TokenIdentity) is faculty assigned to the course."""
+    if not user or user.role != UserRole.FACULTY or user.profile_id is None:
+        return False
+    
+    return db.session.query(FacultyCourse.id).filter_by(
+        faculty_id=user.profile_id,
+        course_id=course_id
+    ).first() is not None
+
 @assignments_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_assignments():
@@ -158,18 +173,16 @@ def create_assignment():
 @jwt_required()
 def submit_assignment(assignment_id):
     """Submit an assignment (student only)."""
-    current_user_id = get_jwt_identity()
-    
     # Check if user is a student
-    user = User.query.get(current_user_id)
-    if not user or user.role != 'student':
+    user = current_identity()
+    if not user or user.role != UserRole.STUDENT:
         return jsonify({
             'status': 'error',
             'message': 'Only students can submit assignments'
         }), 403
     
     # Get the student profile
-    student = user.student_profile
+    student = current_profile()
     if not student:
         return jsonify({
             'status': 'error',
@@ -185,7 +198,7 @@ def submit_assignment(assignment_id):
         }), 404
     
     # Check if student is enrolled in the course
-    enrollment = student.enrollments.filter_by(course_id=assignment.course_id).first()
+    enrollment = Enrollment.query.filter_by(student_id=student.id, course_id=assignment.course_id).first()
     if not enrollment:
         return jsonify({
             'status': 'error',
@@ -207,9 +220,12 @@ def submit_assignment(assignment_id):
         }), 400
     
     # For testing purposes, we're just going to simulate file saving
-    from app.models import AssignmentSubmission
-    
     try:
+        # Read the file once for its size and content hash
+        content = file.read()
+        file.seek(0)
+        content_hash = hashlib.sha256(content).hexdigest()
+
         # Check if submission already exists
         existing_submission = AssignmentSubmission.query.filter_by(
             assignment_id=assignment_id,
@@ -219,8 +235,8 @@ def submit_assignment(assignment_id):
         if existing_submission:
             # Update existing submission
             existing_submission.file_name = file.filename
-            existing_submission.file_size = len(file.read())
-            file.seek(0)  # Reset file pointer after reading
+            existing_submission.file_size = len(content)
+            existing_submission.content_hash = content_hash
             existing_submission.file_type = file.filename.split('.')[-1] if '.' in file.filename else 'unknown'
             existing_submission.submission_date = datetime.utcnow()
             existing_submission.is_late = datetime.utcnow() > assignment.due_date
@@ -245,8 +261,9 @@ def submit_assignment(assignment_id):
             student_id=student.id,
             file_name=file.filename,
             file_path=file_path,
-            file_size=len(file.read()),
+            file_size=len(content),
             file_type=file.filename.split('.')[-1] if '.' in file.filename else 'unknown',
+            content_hash=content_hash,
             is_late=datetime.utcnow() > assignment.due_date,
             comments=request.form.get('comments', '')
         )
@@ -312,7 +329,6 @@ def get_assignment_submissions(assignment_id):
             }), 403
         
         # Get student's submission
-        from app.models import AssignmentSubmission
         submission = AssignmentSubmission.query.filter_by(
             assignment_id=assignment_id,
             student_id=student.id
@@ -329,10 +345,309 @@ def get_assignment_submissions(assignment_id):
         }), 403
     
     # Get all submissions for the assignment
-    from app.models import AssignmentSubmission
     submissions = AssignmentSubmission.query.filter_by(assignment_id=assignment_id).all()
     
     return jsonify({
         'status': 'success',
         'data': [submission.to_dict() for submission in submissions]
-    }) 
\ No newline at end of file
+    }) 
+
+@assignments_bp.route('/submissions/<int:assignment_id>/duplicates', methods=['GET'])
+@jwt_required()
+def get_duplicate_submissions(assignment_id):
+    """List groups of identical files submitted for an assignment (faculty only)."""
+    assignment = Assignment.query.get(assignment_id)
+    if not assignment:
+        return jsonify({
+            'status': 'error',
+            'message': 'Assignment not found'
+        }), 404
+    
+    user = current_identity()
+    if not teaches_course(user, assignment.course_id):
+        return jsonify({
+            'status': 'error',
+            'message': 'Not teaching this course'
+        }), 403
+    
+    # Hashes shared by more than one submission, resolved from the
+    # (assignment_id, content_hash) index and joined back in the same query
+    duplicate_hashes = db.session.query(AssignmentSubmission.content_hash)\
+        .filter(
+            AssignmentSubmission.assignment_id == assignment_id,
+            AssignmentSubmission.content_hash.isnot(None)
+        )\
+        .group_by(AssignmentSubmission.content_hash)\
+        .having(func.count(AssignmentSubmission.id) > 1)\
+        .subquery()
+    
+    rows = db.session.query(AssignmentSubmission, Student, User)\
+        .join(duplicate_hashes, AssignmentSubmission.content_hash == duplicate_hashes.c.content_hash)\
+        .join(Student, AssignmentSubmission.student_id == Student.id)\
+        .join(User, Student.user_id == User.id)\
+        .filter(AssignmentSubmission.assignment_id == assignment_id)\
+        .order_by(AssignmentSubmission.content_hash, AssignmentSubmission.submission_date)\
+        .all()
+    
+    groups = {}
+    for submission, student, student_user in rows:
+        groups.setdefault(submission.content_hash, []).append({
+            'submission_id': submission.id,
+            'student_id': student.student_id,
+            'student_name': f"{student_user.first_name} {student_user.last_name}",
+            'file_name': submission.file_name,
+            'file_size': submission.file_size,
+            'submission_date': submission.submission_date.isoformat() if submission.submission_date else None
+        })
+    
+    return jsonify({
+        'status': 'success',
+        'data': [{
+            'content_hash': content_hash,
+            'submissions': submissions
+        } for content_hash, submissions in groups.items()]
+    })
+
+def _get_grader_assignment(assignment_id):
+    """Load the assignment and current user for grading queue routes.
+    
+    Returns (user, assignment, error_response).
+    """
+    user = current_identity()
+    
+    assignment = Assignment.query.get(assignment_id)
+    if not assignment:
+        return user, None, (jsonify({
+            'status': 'error',
+            'message': 'Assignment not found'
+        }), 404)
+    
+    if not teaches_course(user, assignment.course_id):
+        return user, assignment, (jsonify({
+            'status': 'error',
+            'message': 'Not teaching this course'
+        }), 403)
+    
+    return user, assignment, None
+
+@assignments_bp.route('/<int:assignment_id>/grading-queue', methods=['GET'])
+@jwt_required()
+def grading_queue_status(assignment_id):
+    """Get grading progress for an assignment (faculty only)."""
+    user, assignment, error = _get_grader_assignment(assignment_id)
+    if error:
+        return error
+    
+    return jsonify({
+        'status': 'success',
+        'data': get_queue_status(assignment_id)
+    })
+
+@assignments_bp.route('/<int:assignment_id>/grading-queue/claim', methods=['POST'])
+@jwt_required()
+def claim_submission(assignment_id):
+    """Claim the next ungraded submission with a lease (faculty only)."""
+    user, assignment, error = _get_grader_assignment(assignment_id)
+    if error:
+        return error
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        lease_seconds = get_lease_seconds(data.get('lease_seconds'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    try:
+        submission = claim_next_submission(
+            assignment_id,
+            user.id,
+            lease_seconds=lease_seconds
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to claim submission: {str(e)}'
+        }), 500
+    
+    if not submission:
+        return jsonify({
+            'status': 'success',
+            'message': 'No ungraded submissions left',
+            'data': None
+        })
+    
+    return jsonify({
+        'status': 'success',
+        'data': submission.to_dict()
+    })
+
+@assignments_bp.route('/<int:assignment_id>/grading-queue/<int:submission_id>/release', methods=['POST'])
+@jwt_required()
+def release_claimed_submission(assignment_id, submission_id):
+    """Return a claimed submission to the queue without grading it (faculty only)."""
+    user, assignment, error = _get_grader_assignment(assignment_id)
+    if error:
+        return error
+    
+    if not release_submission(submission_id, user.id):
+        return jsonify({
+            'status': 'error',
+            'message': 'Submission is not claimed by you'
+        }), 409
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'Submission released'
+    })
+
+@assignments_bp.route('/<int:assignment_id>/grading-queue/grades', methods=['POST'])
+@jwt_required()
+def submit_grades(assignment_id):
+    """Grade several submissions at once (faculty only)."""
+    user, assignment, error = _get_grader_assignment(assignment_id)
+    if error:
+        return error
+    
+    data = request.get_json() or {}
+    grades = data.get('grades')
+    if not isinstance(grades, list) or not grades:
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing required field: grades'
+        }), 400
+    
+    max_grade = current_app.config.get('GRADE_MAX', 100)
+    for item in grades:
+        if not isinstance(item, dict) or 'submission_id' not in item or 'grade' not in item:
+            return jsonify({
+                'status': 'error',
+                'message': 'Each grade needs a submission_id and a grade'
+            }), 400
+        # bool is an int subclass, so it is ruled out explicitly
+        submission_id, grade = item['submission_id'], item['grade']
+        if not isinstance(submission_id, int) or isinstance(submission_id, bool):
+            return jsonify({
+                'status': 'error',
+                'message': 'submission_id must be an integer'
+            }), 400
+        if not isinstance(grade, (int, float)) or isinstance(grade, bool) or not 0 <= grade <= max_grade:
+            return jsonify({
+                'status': 'error',
+                'message': f'Grade for submission {submission_id} must be a number from 0 to {max_grade}'
+            }), 400
+    
+    try:
+        graded_ids, rejected_ids = grade_submissions(assignment_id, user.id, grades)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to save grades: {str(e)}'
+        }), 500
+    
+    return jsonify({
+        'status': 'success',
+        'message': f'Graded {len(graded_ids)} submissions',
+        'data': {
+            'graded': graded_ids,
+            'rejected': rejected_ids
+        }
+    })
+
+@assignments_bp.route('/<int:course_id>/submission-matrix', methods=['GET'])
+@jwt_required()
+def get_submission_matrix(course_id):
+    """Get the students x assignments submission matrix for a course (faculty only).
+    
+    The response is columnar: student and assignment attributes are parallel
+    arrays, and status/grade/late are row-major grids indexed [student][assignment].
+    """
+    course = Course.query.get(course_id)
+    if not course:
+        return jsonify({
+            'status': 'error',
+            'message': 'Course not found'
+        }), 404
+    
+    user = current_identity()
+    if not teaches_course(user, course_id):
+        return jsonify({
+            'status': 'error',
+            'message': 'Not teaching this course'
+        }), 403
+    
+    # One pass: enrolled students x course assignments, left joined to submissions
+    rows = db.session.query(
+        Student.id,
+        Student.student_id,
+        User.first_name,
+        User.last_name,
+        Assignment.id,
+        Assignment.title,
+        Assignment.due_date,
+        AssignmentSubmission.status,
+        AssignmentSubmission.grade,
+        AssignmentSubmission.is_late
+    ).select_from(Enrollment)\
+        .join(Student, Enrollment.student_id == Student.id)\
+        .join(User, Student.user_id == User.id)\
+        .outerjoin(Assignment, Assignment.course_id == Enrollment.course_id)\
+        .outerjoin(AssignmentSubmission, and_(
+            AssignmentSubmission.assignment_id == Assignment.id,
+            AssignmentSubmission.student_id == Student.id
+        ))\
+        .filter(Enrollment.course_id == course_id, Enrollment.status == 'enrolled')\
+        .order_by(User.last_name, User.first_name, Student.id, Assignment.due_date, Assignment.id)\
+        .all()
+    
+    students = {'id': [], 'student_id': [], 'name': []}
+    assignments = {'id': [], 'title': [], 'due_date': []}
+    student_index = {}
+    assignment_index = {}
+    cells = []
+    
+    for (student_pk, student_code, first_name, last_name, assignment_id, title, due_date,
+         status, grade, is_late) in rows:
+        if student_pk not in student_index:
+            student_index[student_pk] = len(students['id'])
+            students['id'].append(student_pk)
+            students['student_id'].append(student_code)
+            students['name'].append(f"{first_name} {last_name}")
+        if assignment_id is None:
+            continue
+        if assignment_id not in assignment_index:
+            assignment_index[assignment_id] = len(assignments['id'])
+            assignments['id'].append(assignment_id)
+            assignments['title'].append(title)
+            assignments['due_date'].append(due_date.isoformat() if due_date else None)
+        if status is not None:
+            cells.append((student_index[student_pk], assignment_index[assignment_id], status, grade, is_late))
+    
+    # Assignments are ordered by due date within each student, so the
+    # assignment columns come out in due date order
+    student_count = len(students['id'])
+    assignment_count = len(assignments['id'])
+    status_grid = [['missing'] * assignment_count for _ in range(student_count)]
+    grade_grid = [[None] * assignment_count for _ in range(student_count)]
+    late_grid = [[False] * assignment_count for _ in range(student_count)]
+    
+    for row, column, status, grade, is_late in cells:
+        status_grid[row][column] = status
+        grade_grid[row][column] = grade
+        late_grid[row][column] = bool(is_late)
+    
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'course_id': course_id,
+            'students': students,
+            'assignments': assignments,
+            'status': status_grid,
+            'grade': grade_grid,
+            'late': late_grid
+        }
+    })
@@ -1,11 +1,22 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 
 from app.models import User, UserRole
-from app.auth import register_user, login_user, check_user_exists, setup_user_password
+from app.auth import (register_user, login_user, check_user_exists, setup_user_password, rotate_refresh_token,
+                      revoke_session, current_identity)
+from app.rate_limit import get_login_guard
 
 auth_bp = Blueprint('auth', __name__)
 
+def _too_many_requests(retry_after):
+    """429 response for a rate-limited request"""
+    response = jsonify({
+        "success": False,
+        "message": "Too many attempts, please try again later"
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
 @auth_bp.route('/check-user', methods=['POST', 'OPTIONS'])
 def check_user():
     """Check if a user exists and needs setup"""
@@ -13,6 +24,10 @@ def check_user():
     if request.method == 'OPTIONS':
         return '', 200
         
+    retry_after = get_login_guard(current_app).check_lookup(request.remote_addr)
+    if retry_after:
+        return _too_many_requests(retry_after)
+    
     data = request.get_json()
     
     if 'email' not in data:
@@ -25,7 +40,9 @@ def check_user():
     
     if result["success"]:
         # Return the appropriate response based on existence
-        if result.get("exists", False):
+        if result.get("deleted", False):
+            return jsonify(result), 410
+        elif result.get("exists", False):
             return jsonify(result), 200
         else:
             # User does not exist
@@ -105,11 +122,18 @@ def login():
             "message": "Email and password are required"
         }), 400
     
+    # Reject over-limit attempts before any database or bcrypt work
+    login_guard = get_login_guard(current_app)
+    retry_after = login_guard.check_login(request.remote_addr, data['email'])
+    if retry_after:
+        return _too_many_requests(retry_after)
+    
     # Login the user
     result = login_user(
         email=data['email'],
         password=data['password']
     )
+    login_guard.record_login_result(data['email'], result["success"])
     
     if result["success"]:
         # Return the token along with the success result
@@ -117,6 +141,39 @@ def login():
     else:
         return jsonify(result), 401
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """Exchange a refresh token for a new access token and refresh token"""
+    result = rotate_refresh_token(get_jwt())
+    
+    if result["success"]:
+        return jsonify(result), 200
+    else:
+        return jsonify(result), 401
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """Revoke the presented access or refresh token and end its login session"""
+    return jsonify(revoke_session(get_jwt())), 200
+
+@auth_bp.route('/rate-limit/metrics', methods=['GET'])
+@jwt_required()
+def rate_limit_metrics():
+    """Counts of allowed and rejected login and lookup attempts in this worker (admin only)"""
+    user = current_identity()
+    if not user or user.role != UserRole.ADMIN:
+        return jsonify({
+            "success": False,
+            "message": "Access denied"
+        }), 403
+    
+    return jsonify({
+        "success": True,
+        "metrics": get_login_guard(current_app).metrics()
+    }), 200
+
 @auth_bp.route('/verify-token', methods=['GET'])
 @jwt_required()
 def verify_token():
@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify
-from app.models import db, Course, CourseApproval, User, UserRole, ApprovalStatus, Faculty, Enrollment, Student, Policy, Report, ReportType, Notification, NotificationType, DepartmentHead
-from app.auth import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from app.models import db, Course, CourseApproval, User, UserRole, ApprovalStatus, Student, Policy, Report, ReportType, Notification, NotificationType, DepartmentHead
+from app.auth import jwt_required, get_jwt_identity, current_identity, current_profile
+from app.department_analytics import get_department_snapshot, get_all_department_snapshots
+from app.enrollment_trends import enrollment_trend, format_bucket, parse_timestamp
 from datetime import datetime
-from sqlalchemy import func, text
+from sqlalchemy import text
 import json
 import traceback
 import time
@@ -148,132 +150,187 @@ def update_course_approval(approval_id):
             'message': error_message
         }), 500
 
+def _own_department(requested=None):
+    """The requesting department head's department, and an error response if they asked for another one"""
+    profile = current_profile()
+    department = profile.department if profile else None
+    if not department or (requested and requested != department):
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'Department heads can only view their own department'
+        }), 403)
+    return department, None
+
 @department_head_bp.route('/analytics', methods=['GET'])
+@jwt_required()
 def get_department_analytics():
+    user = current_identity()
+    if not user:
+        return jsonify({
+            'status': 'error',
+            'message': 'User not found'
+        }), 404
+    
+    if user.role not in (UserRole.DEPARTMENT_HEAD, UserRole.ADMIN):
+        return jsonify({
+            'status': 'error',
+            'message': 'Only department heads and administrators can view department analytics'
+        }), 403
+    
+    department = request.args.get('department')
+    if user.role == UserRole.DEPARTMENT_HEAD:
+        department, error = _own_department(department)
+        if error:
+            return error
+    department = department or 'Computer Science'
+    
     try:
-        # For debugging, allow access without JWT
-        # Get department from query param or use default
-        department = request.args.get('department', 'Computer Science')
-        
-        # Get all courses in the department
-        courses = Course.query.filter_by(department=department).all()
-        course_ids = [course.id for course in courses]
-        
-        # Get course statistics
-        course_count = len(courses)
-        active_course_count = Course.query.filter_by(department=department, is_active=True).count()
-        
-        # If we have no data, add some sample data for development
-        if course_count == 0:
-            course_count = 12
-            active_course_count = 9
-        
-        # Get enrollment statistics for these courses
-        enrollment_count = Enrollment.query.filter(Enrollment.course_id.in_(course_ids)).count() if course_ids else 0
-        
-        # If we have no enrollment data, add some sample data
-        if enrollment_count == 0:
-            enrollment_count = 240  # Average 20 students per course
-        
-        # Get faculty members in the department
-        faculty_count = Faculty.query.filter_by(department=department).count()
-        
-        # If we have no faculty data, add realistic sample data
-        if faculty_count == 0:
-            faculty_count = 15
-        
-        # Get course approval statistics
-        approval_stats = db.session.query(
-            CourseApproval.status,
-            func.count(CourseApproval.id)
-        ).join(Course, CourseApproval.course_id == Course.id)\
-        .filter(Course.department == department)\
-        .group_by(CourseApproval.status)\
-        .all()
-        
-        approval_data = {status.value: 0 for status in ApprovalStatus}
-        for status, count in approval_stats:
-            approval_data[status.value] = count
-        
-        # If we have no approval data, add realistic sample data
-        if sum(approval_data.values()) == 0:
-            approval_data['pending'] = 3
-            approval_data['approved'] = 18
-            approval_data['rejected'] = 2
-        
-        # Get most popular courses (based on enrollment)
-        popular_courses = []
-        if course_ids:
-            popular_course_data = db.session.query(
-                Course,
-                func.count(Enrollment.id).label('enrollment_count')
-            ).outerjoin(Enrollment, Course.id == Enrollment.course_id)\
-            .filter(Course.id.in_(course_ids))\
-            .group_by(Course.id)\
-            .order_by(func.count(Enrollment.id).desc())\
-            .limit(5)\
-            .all()
-            
-            popular_courses = [{
-                'course': course.to_dict(),
-                'enrollment_count': count
-            } for course, count in popular_course_data]
-        
-        # If we have no popular course data, add sample data
-        if not popular_courses and courses:
-            for i, course in enumerate(courses[:5]):
-                # Create descending enrollment counts (30, 27, 24, 21, 18)
-                enrollment_count = 30 - (i * 3)
-                popular_courses.append({
-                    'course': course.to_dict(),
-                    'enrollment_count': enrollment_count
-                })
-        elif not popular_courses:
-            # Create completely fake data if no courses exist
-            fake_courses = [
-                {'id': 1, 'course_code': 'CS101', 'title': 'Introduction to Computer Science', 'credits': 3, 'department': department},
-                {'id': 2, 'course_code': 'CS201', 'title': 'Data Structures and Algorithms', 'credits': 4, 'department': department},
-                {'id': 3, 'course_code': 'CS301', 'title': 'Database Systems', 'credits': 3, 'department': department},
-                {'id': 4, 'course_code': 'CS401', 'title': 'Artificial Intelligence', 'credits': 4, 'department': department},
-                {'id': 5, 'course_code': 'CS501', 'title': 'Software Engineering', 'credits': 3, 'department': department}
-            ]
-            for i, course in enumerate(fake_courses):
-                enrollment_count = 30 - (i * 3)
-                popular_courses.append({
-                    'course': course,
-                    'enrollment_count': enrollment_count
-                })
+        # One primary key read; recomputed only if something in the department changed
+        snapshot = get_department_snapshot(
+            department, max_age_seconds=current_app.config.get('DEPARTMENT_ANALYTICS_MAX_AGE_SECONDS', 3600)
+        )
         
-        # Return all analytics data
-        data = {
-            'department': department,
-            'course_statistics': {
-                'total_courses': course_count,
-                'active_courses': active_course_count,
-                'inactive_courses': course_count - active_course_count
-            },
-            'enrollment_statistics': {
-                'total_enrollments': enrollment_count
-            },
-            'faculty_statistics': {
-                'total_faculty': faculty_count
-            },
-            'approval_statistics': approval_data,
-            'popular_courses': popular_courses
+        return jsonify({
+            'status': 'success',
+            'data': snapshot.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in analytics: {str(e)}")
+        traceback.print_exc()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@department_head_bp.route('/analytics/departments', methods=['GET'])
+@jwt_required()
+def get_all_departments_analytics():
+    """The department analytics of every department, plus school-wide totals (a head's own department only)"""
+    user = current_identity()
+    if not user:
+        return jsonify({
+            'status': 'error',
+            'message': 'User not found'
+        }), 404
+    
+    if user.role not in (UserRole.DEPARTMENT_HEAD, UserRole.ADMIN):
+        return jsonify({
+            'status': 'error',
+            'message': 'Only department heads and administrators can view department analytics'
+        }), 403
+    
+    # Only admins see every department; a head gets theirs alone
+    department = None
+    if user.role == UserRole.DEPARTMENT_HEAD:
+        department, error = _own_department()
+        if error:
+            return error
+    
+    try:
+        max_age_seconds = current_app.config.get('DEPARTMENT_ANALYTICS_MAX_AGE_SECONDS', 3600)
+        if department:
+            snapshots = [get_department_snapshot(department, max_age_seconds=max_age_seconds)]
+        else:
+            snapshots = get_all_department_snapshots(max_age_seconds=max_age_seconds)
+        departments = [snapshot.to_dict() for snapshot in snapshots]
+        
+        totals = {
+            'total_courses': sum(s.total_courses for s in snapshots),
+            'active_courses': sum(s.active_courses for s in snapshots),
+            'total_enrollments': sum(s.total_enrollments for s in snapshots),
+            'total_faculty': sum(s.total_faculty for s in snapshots),
+            'approval_statistics': {
+                'pending': sum(s.approvals_pending for s in snapshots),
+                'approved': sum(s.approvals_approved for s in snapshots),
+                'rejected': sum(s.approvals_rejected for s in snapshots)
+            }
         }
         
         return jsonify({
             'status': 'success',
-            'data': data
+            'data': {
+                'departments': departments,
+                'totals': totals
+            }
         })
     except Exception as e:
-        print(f"Error in analytics: {str(e)}")
-        import traceback
+        db.session.rollback()
+        print(f"Error in all-departments analytics: {str(e)}")
+        traceback.print_exc()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@department_head_bp.route('/analytics/enrollment-trends', methods=['GET'])
+@jwt_required()
+def get_enrollment_trends():
+    """Enrollments per hour, day or week for a course (?course_id=) or a department (?department=)"""
+    user = current_identity()
+    if not user:
+        return jsonify({
+            'status': 'error',
+            'message': 'User not found'
+        }), 404
+    
+    if user.role not in (UserRole.DEPARTMENT_HEAD, UserRole.ADMIN):
+        return jsonify({
+            'status': 'error',
+            'message': 'Only department heads and administrators can view enrollment trends'
+        }), 403
+    
+    interval = request.args.get('interval', 'day')
+    course_id = request.args.get('course_id', type=int)
+    department = None if course_id is not None else request.args.get('department')
+    if user.role == UserRole.DEPARTMENT_HEAD:
+        # Heads only see their own department and its courses
+        own, error = _own_department(department)
+        if error:
+            return error
+        if course_id is None:
+            department = own
+        elif getattr(db.session.get(Course, course_id), 'department', None) != own:
+            return jsonify({
+                'status': 'error',
+                'message': 'Department heads can only view their own department'
+            }), 403
+    elif course_id is None:
+        department = department or 'Computer Science'
+    
+    try:
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else None
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else None
+        buckets, counts = enrollment_trend(
+            interval, start=start, end=end, course_id=course_id, department=department,
+            max_buckets=current_app.config.get('ENROLLMENT_TRENDS_MAX_BUCKETS', 1000)
+        )
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in enrollment trends: {str(e)}")
         traceback.print_exc()
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
+    
+    # Parallel arrays keep long series small
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'interval': interval,
+            'course_id': course_id,
+            'department': department,
+            'labels': [format_bucket(b, interval) for b in buckets],
+            'counts': counts,
+            'total': sum(counts)
+        }
+    })
 
 @department_head_bp.route('/policy', methods=['GET'])
 def get_department_policies():
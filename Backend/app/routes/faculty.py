@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, User, Faculty, Course, FacultyCourse, CourseMaterial, MaterialType, UserRole, Attendance, AttendanceStatus, Student, Enrollment
+from flask_jwt_extended import jwt_required
+from app.auth import current_identity, current_profile
+from app.models import db, Faculty, Course, FacultyCourse, CourseMaterial, MaterialType, UserRole, Attendance, AttendanceStatus, Student, Enrollment
 from datetime import datetime, date
 import os
 import csv
@@ -13,8 +14,7 @@ faculty_bp = Blueprint('faculty', __name__)
 @faculty_bp.route('/courses', methods=['GET'])
 @jwt_required()
 def get_faculty_courses():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -29,7 +29,7 @@ def get_faculty_courses():
         }), 403
     
     # Get the faculty profile
-    faculty = Faculty.query.filter_by(user_id=user.id).first()
+    faculty = current_profile()
     
     if not faculty:
         return jsonify({
@@ -60,8 +60,7 @@ def get_faculty_courses():
 @faculty_bp.route('/courses', methods=['POST'])
 @jwt_required()
 def assign_course():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -146,8 +145,7 @@ def assign_course():
 @faculty_bp.route('/courses/<int:course_id>/materials', methods=['GET'])
 @jwt_required()
 def get_course_materials(course_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -165,7 +163,7 @@ def get_course_materials(course_id):
     
     # If user is faculty, check if they're assigned to this course
     if user.role == UserRole.FACULTY:
-        faculty = Faculty.query.filter_by(user_id=user.id).first()
+        faculty = current_profile()
         if not faculty:
             return jsonify({
                 'status': 'error',
@@ -198,8 +196,7 @@ def get_course_materials(course_id):
 @faculty_bp.route('/courses/<int:course_id>/materials', methods=['POST'])
 @jwt_required()
 def add_course_material(course_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -214,7 +211,7 @@ def add_course_material(course_id):
         }), 403
     
     # Check if faculty is assigned to this course
-    faculty = Faculty.query.filter_by(user_id=user.id).first()
+    faculty = current_profile()
     if not faculty:
         return jsonify({
             'status': 'error',
@@ -296,8 +293,7 @@ def add_course_material(course_id):
 @faculty_bp.route('/courses/<int:course_id>/materials/<int:material_id>', methods=['PUT'])
 @jwt_required()
 def update_course_material(course_id, material_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -327,7 +323,7 @@ def update_course_material(course_id, material_id):
         }), 400
     
     # Check if user created this material or is assigned to this course
-    faculty = Faculty.query.filter_by(user_id=user.id).first()
+    faculty = current_profile()
     if not faculty:
         return jsonify({
             'status': 'error',
@@ -388,8 +384,7 @@ def update_course_material(course_id, material_id):
 @faculty_bp.route('/courses/<int:course_id>/materials/<int:material_id>', methods=['DELETE'])
 @jwt_required()
 def delete_course_material(course_id, material_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -444,8 +439,7 @@ def delete_course_material(course_id, material_id):
 @faculty_bp.route('/courses/<int:faculty_course_id>/attendance', methods=['GET'])
 @jwt_required()
 def get_course_attendance(faculty_course_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -460,7 +454,7 @@ def get_course_attendance(faculty_course_id):
         }), 403
     
     # Check if faculty is assigned to this course
-    faculty = Faculty.query.filter_by(user_id=user.id).first()
+    faculty = current_profile()
     if not faculty:
         return jsonify({
             'status': 'error',
@@ -509,8 +503,7 @@ def get_course_attendance(faculty_course_id):
 @faculty_bp.route('/courses/<int:faculty_course_id>/attendance', methods=['POST'])
 @jwt_required()
 def add_attendance(faculty_course_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -525,7 +518,7 @@ def add_attendance(faculty_course_id):
         }), 403
     
     # Check if faculty is assigned to this course
-    faculty = Faculty.query.filter_by(user_id=user.id).first()
+    faculty = current_profile()
     if not faculty:
         return jsonify({
             'status': 'error',
@@ -622,8 +615,7 @@ def add_attendance(faculty_course_id):
 @faculty_bp.route('/courses/<int:faculty_course_id>/attendance/import', methods=['POST'])
 @jwt_required()
 def import_attendance(faculty_course_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -638,7 +630,7 @@ def import_attendance(faculty_course_id):
         }), 403
     
     # Check if faculty is assigned to this course
-    faculty = Faculty.query.filter_by(user_id=user.id).first()
+    faculty = current_profile()
     if not faculty:
         return jsonify({
             'status': 'error',
@@ -760,8 +752,7 @@ def import_attendance(faculty_course_id):
 @faculty_bp.route('/courses/<int:faculty_course_id>/attendance/report', methods=['GET'])
 @jwt_required()
 def generate_attendance_report(faculty_course_id):
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({
@@ -776,7 +767,7 @@ def generate_attendance_report(faculty_course_id):
         }), 403
     
     # Check if faculty is assigned to this course
-    faculty = Faculty.query.filter_by(user_id=user.id).first()
+    faculty = current_profile()
     if not faculty:
         return jsonify({
             'status': 'error',
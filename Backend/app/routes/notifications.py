@@ -1,81 +1,232 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Notification, NotificationType
-from datetime import datetime
+from app.models import db, Notification, NotificationType, UserRole, Course, FacultyCourse
+from app.auth import current_identity, current_profile
+from app import notifications as notification_service
+from app.notification_stream import broadcaster, format_event, get_missed_notifications, publish_unread_count
+import queue
 
 notifications_bp = Blueprint('notifications', __name__)
 
 @notifications_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_notifications():
+    """Get the current user's notifications, newest first.
+    
+    Paginated with a cursor: pass the returned next_before_id as ?before_id=
+    to get the next page.
+    """
     current_user = get_jwt_identity()
-    notifications = Notification.query.filter_by(user_id=current_user).order_by(Notification.created_at.desc()).all()
-    return jsonify([{
-        'id': n.id,
-        'title': n.title,
-        'message': n.message,
-        'created_at': n.created_at.isoformat(),
-        'read': n.is_read,
-        'type': n.type.value,
-        'link': n.link
-    } for n in notifications])
+    
+    try:
+        before_id = request.args.get('before_id', type=int)
+        limit = int(request.args.get('limit', current_app.config.get('NOTIFICATIONS_PAGE_SIZE', 50)))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, current_app.config.get('NOTIFICATIONS_MAX_PAGE_SIZE', 200)))
+    
+    notifications, next_before_id = notification_service.get_notifications_page(
+        current_user, before_id=before_id, limit=limit
+    )
+    return jsonify({
+        'notifications': [n.to_dict() for n in notifications],
+        'next_before_id': next_before_id
+    })
 
 @notifications_bp.route('/notifications/unread', methods=['GET'])
 @jwt_required()
 def get_unread_notifications():
     current_user_id = get_jwt_identity()
-    notifications = Notification.query.filter_by(user_id=current_user_id, is_read=False).order_by(Notification.created_at.desc()).all()
+    notifications = Notification.query.filter_by(user_id=current_user_id, read=False).order_by(Notification.created_at.desc()).all()
     return jsonify([notification.to_dict() for notification in notifications])
 
 @notifications_bp.route('/<int:notification_id>/read', methods=['PUT'])
 @jwt_required()
 def mark_notification_read(notification_id):
     current_user = get_jwt_identity()
-    notification = Notification.query.filter_by(id=notification_id, user_id=current_user).first_or_404()
-    notification.is_read = True
-    db.session.commit()
+    if not notification_service.mark_notification_read(current_user, notification_id):
+        return jsonify({'error': 'Notification not found'}), 404
+    publish_unread_count(current_user)
     return jsonify({'message': 'Notification marked as read'})
 
 @notifications_bp.route('/mark-all-read', methods=['PUT'])
 @jwt_required()
 def mark_all_notifications_read():
     current_user = get_jwt_identity()
-    Notification.query.filter_by(user_id=current_user, is_read=False).update({'is_read': True})
-    db.session.commit()
+    notification_service.mark_all_notifications_read(current_user)
+    publish_unread_count(current_user)
     return jsonify({'message': 'All notifications marked as read'})
 
 @notifications_bp.route('/notifications', methods=['POST'])
 @jwt_required()
 def create_notification():
     data = request.get_json()
-    notification = Notification(
+    try:
+        notification_type = NotificationType(data['type'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    notification = notification_service.create_notification(
         user_id=data['user_id'],
         title=data['title'],
         message=data['message'],
-        type=data['type'],
+        notification_type=notification_type,
         link=data.get('link')
     )
-    db.session.add(notification)
-    db.session.commit()
     return jsonify(notification.to_dict()), 201
 
 @notifications_bp.route('/notifications/unread-count', methods=['GET'])
 @jwt_required()
 def get_unread_count():
     current_user_id = get_jwt_identity()
-    count = Notification.query.filter_by(user_id=current_user_id, is_read=False).count()
-    return jsonify({'unread_count': count})
+    return jsonify({'unread_count': notification_service.get_unread_count(current_user_id)})
+
+@notifications_bp.route('/notifications/unread-count/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_unread_counts():
+    """Recompute unread counters from the notifications table (admin only)"""
+    user = current_identity()
+    if not user or user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Only administrators can rebuild unread counters'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    rebuilt = notification_service.rebuild_unread_counters(data.get('user_ids'))
+    return jsonify({'message': f'Rebuilt {rebuilt} unread counters'})
 
 @notifications_bp.route('/notifications/<int:notification_id>', methods=['DELETE'])
 @jwt_required()
 def delete_notification(notification_id):
     current_user_id = get_jwt_identity()
-    notification = Notification.query.filter_by(id=notification_id, user_id=current_user_id).first()
-    
-    if not notification:
+    if not notification_service.delete_notification(current_user_id, notification_id):
         return jsonify({'error': 'Notification not found'}), 404
-        
-    db.session.delete(notification)
-    db.session.commit()
+    publish_unread_count(current_user_id)
+    
+    return jsonify({'message': 'Notification deleted successfully'}) 
+
+def _can_announce(user, course_id=None, department=None, role=None):
+    """Check whether the requesting user (a TokenIdentity) may send an announcement to the given target"""
+    if user.role == UserRole.ADMIN:
+        return True
+    
+    if role is not None:
+        return False
+    
+    if course_id is not None:
+        if user.role == UserRole.FACULTY:
+            return FacultyCourse.query.filter_by(
+                faculty_id=user.profile_id,
+                course_id=course_id
+            ).first() is not None
+        if user.role == UserRole.DEPARTMENT_HEAD:
+            course = Course.query.get(course_id)
+            head = current_profile()
+            return bool(course and head and course.department == head.department)
+        return False
+    
+    if user.role == UserRole.DEPARTMENT_HEAD:
+        head = current_profile()
+        return bool(head and head.department == department)
+    
+    return False
+
+@notifications_bp.route('/announcements', methods=['POST'])
+@jwt_required()
+def create_announcement():
+    """Send one notification to every user in a course, department or role"""
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    data = request.get_json() or {}
+    for field in ('title', 'message'):
+        if not data.get(field):
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    targets = [key for key in ('course_id', 'department', 'role') if data.get(key) is not None]
+    if len(targets) != 1:
+        return jsonify({'error': 'Exactly one of course_id, department or role is required'}), 400
+    
+    try:
+        notification_type = NotificationType(data.get('type', NotificationType.INFO.value))
+        role = UserRole(data['role']) if data.get('role') is not None else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    course_id = data.get('course_id')
+    department = data.get('department')
+    
+    if not _can_announce(user, course_id=course_id, department=department, role=role):
+        return jsonify({'error': 'Not allowed to send announcements to this audience'}), 403
+    
+    try:
+        recipient_count = notification_service.send_announcement(
+            title=data['title'][:100],
+            message=data['message'],
+            notification_type=notification_type,
+            link=data.get('link'),
+            course_id=course_id,
+            department=department,
+            role=role
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to send announcement: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': 'Announcement sent',
+        'recipient_count': recipient_count
+    }), 201
+
+@notifications_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_notifications():
+    """Server-Sent Events stream of new notifications and unread count changes.
+    
+    EventSource cannot send headers, so the token may also be passed as ?token=.
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) to receive
+    the notifications they missed.
+    """
+    current_user_id = get_jwt_identity()
+    heartbeat_seconds = current_app.config.get('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', 15)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    backlog = []
+    if last_event_id is not None:
+        backlog = [
+            (n.id, format_event('notification', n.to_dict(), event_id=n.id))
+            for n in get_missed_notifications(current_user_id, last_event_id)
+        ]
+    
+    subscriber = broadcaster.subscribe(current_user_id)
+    # Don't hold a DB connection for the lifetime of the stream
+    db.session.remove()
+    
+    def generate():
+        last_sent_id = last_event_id or 0
+        try:
+            yield 'retry: 5000\n\n'
+            for event_id, message in backlog:
+                last_sent_id = event_id
+                yield message
+            while True:
+                try:
+                    event_id, message = subscriber.get(timeout=heartbeat_seconds)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                if event_id is not None:
+                    if event_id <= last_sent_id:
+                        continue
+                    last_sent_id = event_id
+                yield message
+        finally:
+            broadcaster.unsubscribe(current_user_id, subscriber)
     
-    return jsonify({'message': 'Notification deleted successfully'}) 
\ No newline at end of file
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,10 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from app.models import db, User, UserRole, Student, Faculty, Admin, DepartmentHead
 from functools import wraps
+import io
 import secrets
-from app.auth import hash_password, generate_access_code
+from app.auth import hash_password, allocate_access_code, current_identity, revoke_user_sessions
+from app.user_directory import get_users_page, get_user_with_profile, STATUSES
+from app.profile_cache import profile_cache
+from app.user_purge import soft_delete_users, restore_users, purge_users
+from app.provisioning import provision_users
+from app.roster_sync import sync_roster
 
 users_bp = Blueprint('users', __name__)
 
@@ -13,8 +19,8 @@ def role_required(roles):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            # Role comes from the token claims, so this check needs no query
+            user = current_identity()
             
             if not user:
                 return jsonify({"success": False, "message": "User not found"}), 404
@@ -37,31 +43,32 @@ def role_required(roles):
 @users_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
-    """Get the current user's profile"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    """Get the current user's profile.
     
-    if not user:
-        return jsonify({"success": False, "message": "User not found"}), 404
-    
-    # Get role-specific profile
-    profile = None
-    if user.role == UserRole.STUDENT:
-        profile = Student.query.filter_by(user_id=user.id).first()
-    elif user.role == UserRole.FACULTY:
-        profile = Faculty.query.filter_by(user_id=user.id).first()
-    elif user.role == UserRole.ADMIN:
-        profile = Admin.query.filter_by(user_id=user.id).first()
-    elif user.role == UserRole.DEPARTMENT_HEAD:
-        profile = DepartmentHead.query.filter_by(user_id=user.id).first()
-    
-    profile_data = profile.to_dict() if profile else None
+    Served from a short-lived per-user cache; the ETag lets clients
+    revalidate with If-None-Match and get a 304 when nothing changed.
+    """
+    user_id = get_jwt_identity()
+    cached = profile_cache.get(user_id)
     
-    return jsonify({
-        "success": True,
-        "user": user.to_dict(),
-        "profile": profile_data
-    }), 200
+    if cached is None:
+        # User and role profile in one query
+        user, profile = get_user_with_profile(user_id)
+        
+        if not user:
+            return jsonify({"success": False, "message": "User not found"}), 404
+        
+        cached = profile_cache.put(user_id, {
+            "success": True,
+            "user": user.to_dict(),
+            "profile": profile.to_dict() if profile else None
+        })
+    
+    etag, payload = cached
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 @users_bp.route('/me', methods=['PUT'])
 @jwt_required()
@@ -111,6 +118,7 @@ def update_current_user():
     
     try:
         db.session.commit()
+        profile_cache.invalidate(user.id)
         return jsonify({
             "success": True,
             "message": "Profile updated successfully",
@@ -127,12 +135,56 @@ def update_current_user():
 @jwt_required()
 @role_required([UserRole.ADMIN, UserRole.DEPARTMENT_HEAD])
 def get_all_users():
-    """Get all users (admin only)"""
-    users = User.query.all()
+    """Get a page of users (admin only).
+    
+    Query parameters: role, status (active, inactive, pending), search (prefix of
+    email, first or last name), include=profile, limit and after_id, the cursor
+    returned as next_after_id.
+    """
+    role = None
+    if request.args.get('role'):
+        try:
+            role = UserRole(request.args['role'])
+        except ValueError:
+            valid_roles = [r.value for r in UserRole]
+            return jsonify({
+                "success": False,
+                "message": f"Invalid role. Must be one of: {', '.join(valid_roles)}"
+            }), 400
+    
+    return _users_page_response(role)
+
+def _users_page_response(role):
+    """Respond with one page of the user directory for the request's filters"""
+    status = request.args.get('status') or None
+    if status is not None and status not in STATUSES:
+        return jsonify({
+            "success": False,
+            "message": f"Invalid status. Must be one of: {', '.join(STATUSES)}"
+        }), 400
+    
+    try:
+        after_id = request.args.get('after_id', type=int)
+        limit = int(request.args.get('limit', current_app.config.get('USERS_PAGE_SIZE', 50)))
+    except ValueError:
+        return jsonify({"success": False, "message": "limit must be an integer"}), 400
+    limit = max(1, min(limit, current_app.config.get('USERS_MAX_PAGE_SIZE', 200)))
+    include_profile = request.args.get('include') == 'profile'
+    
+    rows, next_after_id = get_users_page(
+        role=role, status=status, search=request.args.get('search'),
+        after_id=after_id, limit=limit, include_profile=include_profile
+    )
+    
+    if include_profile:
+        users = [dict(user.to_dict(), profile=profile.to_dict() if profile else None) for user, profile in rows]
+    else:
+        users = [user.to_dict() for user in rows]
     
     return jsonify({
         "success": True,
-        "users": [user.to_dict() for user in users]
+        "users": users,
+        "next_after_id": next_after_id
     }), 200
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
@@ -168,7 +220,7 @@ def get_user(user_id):
 @jwt_required()
 @role_required([UserRole.ADMIN, UserRole.DEPARTMENT_HEAD])
 def get_users_by_role(role):
-    """Get users by role (admin only)"""
+    """Get a page of users with a role (admin only); takes the same parameters as get_all_users"""
     try:
         role_enum = UserRole(role)
     except ValueError:
@@ -178,12 +230,7 @@ def get_users_by_role(role):
             "message": f"Invalid role. Must be one of: {', '.join(valid_roles)}"
         }), 400
     
-    users = User.query.filter_by(role=role_enum).all()
-    
-    return jsonify({
-        "success": True,
-        "users": [user.to_dict() for user in users]
-    }), 200
+    return _users_page_response(role_enum)
 
 @users_bp.route('/access-code/<code>', methods=['GET'])
 @jwt_required()
@@ -217,7 +264,7 @@ def create_user():
             }), 400
     
     # Check if email already exists
-    existing_user = User.query.filter_by(email=data['email']).first()
+    existing_user = User.query.filter_by(email=data['email']).execution_options(include_deleted=True).first()
     if existing_user:
         return jsonify({
             "success": False,
@@ -235,6 +282,9 @@ def create_user():
                 "message": f"Invalid role. Must be one of: {', '.join(valid_roles)}"
             }), 400
         
+        # Allocate the access code first; it never needs a retry
+        access_code = allocate_access_code(data['email'])
+        
         # Create the new user
         new_user = User(
             first_name=data['first_name'],
@@ -249,9 +299,7 @@ def create_user():
         # Hash the password
         new_user.password_hash = hash_password(temp_password)
         
-        # Generate access code
-        count = User.query.count() + 1
-        new_user.access_code = generate_access_code(data['email'], count)
+        new_user.access_code = access_code
         
         db.session.add(new_user)
         db.session.commit()
@@ -299,6 +347,68 @@ def create_user():
             "message": f"Failed to create user: {str(e)}"
         }), 500
 
+@users_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@role_required([UserRole.ADMIN])
+def bulk_create_users():
+    """Create users from an uploaded CSV (admin only).
+    
+    Responds with the credentials report as a CSV download: one line per input
+    row with the access code and temporary password, or why it was skipped.
+    """
+    if 'file' not in request.files:
+        return jsonify({"success": False, "message": "No file provided"}), 400
+    
+    file = request.files['file']
+    if not file.filename.endswith('.csv'):
+        return jsonify({"success": False, "message": "Only CSV files are supported"}), 400
+    
+    report = io.StringIO()
+    try:
+        counts = provision_users(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''), report)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    return Response(report.getvalue(), mimetype='text/csv', headers={
+        'Content-Disposition': 'attachment; filename=credentials.csv',
+        'X-Users-Created': str(counts['created']),
+        'X-Users-Skipped': str(counts['skipped']),
+        'X-Users-Failed': str(counts['failed'])
+    })
+
+@users_bp.route('/roster-sync', methods=['POST'])
+@jwt_required()
+@role_required([UserRole.ADMIN])
+def roster_sync():
+    """Sync students and faculty with an uploaded registrar roster CSV (admin only).
+    
+    Only rows that differ are written. ?dry_run=true reports the changes
+    without applying them; ?deactivate=false keeps people missing from the
+    roster active.
+    """
+    if 'file' not in request.files:
+        return jsonify({"success": False, "message": "No file provided"}), 400
+    
+    file = request.files['file']
+    if not file.filename.endswith('.csv'):
+        return jsonify({"success": False, "message": "Only CSV files are supported"}), 400
+    
+    try:
+        counts = sync_roster(
+            io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''),
+            deactivate_missing=request.args.get('deactivate', 'true').lower() != 'false',
+            dry_run=request.args.get('dry_run', 'false').lower() == 'true'
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Roster sync failed: {str(e)}"}), 500
+    
+    # Names and profiles may have changed for anyone
+    profile_cache.clear()
+    
+    return jsonify({"success": True, "counts": counts}), 200
+
 @users_bp.route('/<int:user_id>', methods=['PUT'])
 @jwt_required()
 @role_required([UserRole.ADMIN])
@@ -318,7 +428,7 @@ def update_user(user_id):
         user.last_name = data['last_name']
     if 'email' in data and data['email'] != user.email:
         # Check if email is unique
-        existing_user = User.query.filter_by(email=data['email']).first()
+        existing_user = User.query.filter_by(email=data['email']).execution_options(include_deleted=True).first()
         if existing_user and existing_user.id != user.id:
             return jsonify({
                 "success": False,
@@ -331,6 +441,8 @@ def update_user(user_id):
             # Only update if role has changed
             if role != user.role:
                 user.role = role
+                # Their tokens carry the old role
+                revoke_user_sessions([user.id])
                 # Handle role-specific profile updates
                 # This is a simplified implementation - you may need to create/update profiles
         except ValueError:
@@ -342,6 +454,7 @@ def update_user(user_id):
     
     try:
         db.session.commit()
+        profile_cache.invalidate(user.id)
         return jsonify({
             "success": True,
             "message": "User updated successfully",
@@ -389,10 +502,10 @@ def reset_user_password(user_id):
         user.password_hash = hash_password(temp_password)
         
         # Update access code
-        count = User.query.count()
-        user.access_code = generate_access_code(user.email, count)
+        user.access_code = allocate_access_code(user.email)
         
         db.session.commit()
+        profile_cache.invalidate(user.id)
         
         # In a real app, you would send an email with the temporary password
         # For now, we'll just return it in the response
@@ -413,7 +526,7 @@ def reset_user_password(user_id):
 @jwt_required()
 @role_required([UserRole.ADMIN])
 def delete_user(user_id):
-    """Delete a specific user (admin only)"""
+    """Soft-delete a specific user (admin only); purge_users.py removes them for good"""
     user = User.query.get(user_id)
     
     if not user:
@@ -428,27 +541,8 @@ def delete_user(user_id):
         }), 400
     
     try:
-        # Delete role-specific profile first (to maintain referential integrity)
-        if user.role == UserRole.STUDENT:
-            profile = Student.query.filter_by(user_id=user.id).first()
-            if profile:
-                db.session.delete(profile)
-        elif user.role == UserRole.FACULTY:
-            profile = Faculty.query.filter_by(user_id=user.id).first()
-            if profile:
-                db.session.delete(profile)
-        elif user.role == UserRole.ADMIN:
-            profile = Admin.query.filter_by(user_id=user.id).first()
-            if profile:
-                db.session.delete(profile)
-        elif user.role == UserRole.DEPARTMENT_HEAD:
-            profile = DepartmentHead.query.filter_by(user_id=user.id).first()
-            if profile:
-                db.session.delete(profile)
-        
-        # Delete the user
-        db.session.delete(user)
-        db.session.commit()
+        soft_delete_users([user_id])
+        profile_cache.invalidate(user_id)
         
         return jsonify({
             "success": True,
@@ -459,4 +553,58 @@ def delete_user(user_id):
         return jsonify({
             "success": False,
             "message": f"Failed to delete user: {str(e)}"
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@users_bp.route('/bulk-delete', methods=['POST'])
+@jwt_required()
+@role_required([UserRole.ADMIN])
+def bulk_delete_users():
+    """Delete many users at once (admin only).
+    
+    Body: {"user_ids": [...], "hard": false}. Users are soft-deleted; with
+    "hard": true they and everything that depends on them are then purged in
+    batches, and records they authored are handed over to the current admin.
+    """
+    data = request.get_json() or {}
+    user_ids = data.get('user_ids')
+    if not isinstance(user_ids, list) or not all(isinstance(i, int) for i in user_ids):
+        return jsonify({"success": False, "message": "user_ids must be a list of user ids"}), 400
+    
+    current_user_id = int(get_jwt_identity())
+    if current_user_id in user_ids:
+        return jsonify({"success": False, "message": "Cannot delete your own account"}), 400
+    
+    try:
+        deleted = soft_delete_users(user_ids)
+        purged = 0
+        if data.get('hard'):
+            purged = purge_users(current_user_id, user_ids=user_ids,
+                                 batch_size=current_app.config.get('USER_PURGE_BATCH_SIZE', 200))
+        for user_id in user_ids:
+            profile_cache.invalidate(user_id)
+        
+        return jsonify({
+            "success": True,
+            "deleted": deleted,
+            "purged": purged
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "success": False,
+            "message": f"Failed to delete users: {str(e)}"
+        }), 500
+
+@users_bp.route('/<int:user_id>/restore', methods=['POST'])
+@jwt_required()
+@role_required([UserRole.ADMIN])
+def restore_user(user_id):
+    """Undo the soft delete of a user that has not been purged yet (admin only)"""
+    if not restore_users([user_id]):
+        return jsonify({"success": False, "message": "No deleted user with this id"}), 404
+    
+    return jsonify({
+        "success": True,
+        "message": "User restored successfully",
+        "user": User.query.get(user_id).to_dict()
+    }), 200 
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+JWT revocation blocklist.
+
+Revoked token ids (jti) are stored in the ``revoked_tokens`` table. Each
+worker keeps an in-memory copy: a Bloom filter that answers "definitely not
+revoked" for almost every valid token, backed by an exact set of the revoked
+jtis that have not expired yet, so a Bloom false positive never rejects a
+valid token. The copy is refreshed incrementally (rows with an id above the
+last one seen) at most once every BLOCKLIST_REFRESH_SECONDS, so checking a
+token normally costs no I/O. A token revoked in another worker is rejected
+here within that interval. Expired jtis are dropped from the exact set at
+most once every EVICT_SECONDS during a refresh; the filter keeps their bits
+until it fills up and is rebuilt.
+
+Besides single tokens, whole login sessions can be revoked: the family id
+that every access and refresh token of a login carries is stored like a
+jti (see revoke_user_sessions() in app/auth.py), and tokens are checked by
+both.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+
+from app.models import db, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+EVICT_SECONDS = 60
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class TokenBlocklist:
+    """Per-process mirror of the revoked_tokens table"""
+
+    def __init__(self, capacity=100000, error_rate=0.001, refresh_seconds=5):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._revoked = {}  # jti -> expires_at
+        self._last_id = 0
+        self._last_refresh = None
+        self._last_eviction = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.capacity = app.config.get('BLOCKLIST_CAPACITY', self.capacity)
+        self.refresh_seconds = app.config.get('BLOCKLIST_REFRESH_SECONDS', self.refresh_seconds)
+        self.reset()
+
+    def reset(self):
+        """Forget everything; the next check reloads from the table"""
+        with self._lock:
+            self._bloom = BloomFilter(self.capacity, self.error_rate)
+            self._revoked = {}
+            self._last_id = 0
+            self._last_refresh = None
+            self._last_eviction = None
+
+    def _add(self, jti, expires_at):
+        if jti not in self._revoked:
+            self._revoked[jti] = expires_at
+            self._bloom.add(jti)
+
+    def _evict(self, now):
+        """Drop expired jtis from the exact set"""
+        self._revoked = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > now}
+        self._last_eviction = time.monotonic()
+
+    def _rebuild(self, now):
+        """Drop expired jtis and rebuild the filter from the rest"""
+        self._evict(now)
+        self._bloom = BloomFilter(max(self.capacity, 2 * len(self._revoked)), self.error_rate)
+        for jti in self._revoked:
+            self._bloom.add(jti)
+
+    def refresh(self, now=None):
+        """Load tokens revoked since the last refresh; needs an app context"""
+        if now is None:
+            now = datetime.utcnow()
+        # Query outside the lock so token checks in other threads never wait on the database
+        last_id = self._last_id
+        rows = db.session.query(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)\
+            .filter(RevokedToken.id > last_id)\
+            .order_by(RevokedToken.id)\
+            .all()
+        with self._lock:
+            for row_id, jti, expires_at in rows:
+                if row_id <= self._last_id:
+                    continue  # loaded by a refresh that finished first
+                self._last_id = row_id
+                if expires_at > now:
+                    self._add(jti, expires_at)
+            if self._bloom.count >= self._bloom.capacity:
+                self._rebuild(now)
+            elif self._last_eviction is None or time.monotonic() - self._last_eviction >= EVICT_SECONDS:
+                self._evict(now)
+            self._last_refresh = time.monotonic()
+
+    def is_revoked(self, jti, family=None):
+        """Check a token id and its login family, refreshing from the table if the copy is stale"""
+        if self._last_refresh is None or time.monotonic() - self._last_refresh >= self.refresh_seconds:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving from the last good copy
+                logger.error(f"Error refreshing token blocklist: {str(e)}")
+        return any(key in self._bloom and key in self._revoked for key in (jti, family) if key)
+
+    def revoke(self, jti, expires_at, user_id=None):
+        """Persist a revoked token and block it in this process right away"""
+        if not RevokedToken.query.filter_by(jti=jti).first():
+            db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+            db.session.commit()
+        with self._lock:
+            self._add(jti, expires_at)
+
+
+token_blocklist = TokenBlocklist()
+
+
+def purge_expired_revocations(now=None):
+    """Delete revocations of tokens that have expired anyway; returns the number removed"""
+    if now is None:
+        now = datetime.utcnow()
+    removed = RevokedToken.query.filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
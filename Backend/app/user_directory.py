@@ -0,0 +1,90 @@
+"""
+The admin user directory: filtered, searchable pages of users.
+
+Pages are keyset-paginated on users.id: a page is "the next `limit` users
+with an id above the cursor", which the primary key (or the (role, id) and
+(status, id) indexes when filtering) serves without counting or skipping
+earlier rows, so the last page of 50k users costs the same as the first.
+
+Search is a case-insensitive prefix match on email, first name or last name.
+Each is a range over lower(column) (``>= 'jo' AND < 'jp'``) rather than a
+LIKE, so it uses the ix_users_*_lower expression indexes on every database.
+"""
+from sqlalchemy import or_, and_
+
+from app.models import db, User, UserRole, Student, Faculty, Admin, DepartmentHead
+
+STATUSES = ('active', 'inactive', 'pending')
+
+_PROFILE_MODELS = {
+    UserRole.STUDENT: Student,
+    UserRole.FACULTY: Faculty,
+    UserRole.ADMIN: Admin,
+    UserRole.DEPARTMENT_HEAD: DepartmentHead,
+}
+
+
+def _prefix(column, prefix):
+    """lower(column) starts with prefix, as an index-friendly range"""
+    expression = db.func.lower(column)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(expression >= prefix, expression < upper)
+
+
+def _search_filter(search):
+    tokens = search.lower().split()
+    if len(tokens) > 1:
+        # "jane sm" - first name and last name prefixes
+        return and_(_prefix(User.first_name, tokens[0]), _prefix(User.last_name, ' '.join(tokens[1:])))
+    return or_(_prefix(User.email, tokens[0]), _prefix(User.first_name, tokens[0]),
+               _prefix(User.last_name, tokens[0]))
+
+
+def _query_with_profiles():
+    """Users with every role profile outer-joined; see _with_profile for reading the rows"""
+    query = db.session.query(User, *_PROFILE_MODELS.values())
+    for model in _PROFILE_MODELS.values():
+        query = query.outerjoin(model, model.user_id == User.id)
+    return query
+
+
+def _with_profile(row):
+    """(user, profile) from a _query_with_profiles row: the profile of the user's role"""
+    user = row[0]
+    position = list(_PROFILE_MODELS).index(user.role) + 1 if user.role in _PROFILE_MODELS else None
+    return user, row[position] if position else None
+
+
+def get_user_with_profile(user_id):
+    """Load a user and their role profile in one query; returns (None, None) if there is no such user"""
+    row = _query_with_profiles().filter(User.id == user_id).first()
+    return _with_profile(row) if row else (None, None)
+
+
+def get_users_page(role=None, status=None, search=None, after_id=None, limit=50, include_profile=False):
+    """Get a page of users ordered by id, starting after the cursor.
+
+    Returns (rows, next_after_id); next_after_id is None on the last page.
+    Rows are users, or (user, profile) pairs with include_profile, where the
+    profiles come from the same query through outer joins.
+    """
+    query = _query_with_profiles() if include_profile else User.query
+
+    if role is not None:
+        query = query.filter(User.role == role)
+    if status is not None:
+        query = query.filter(User.status == status)
+    if search and search.strip():
+        query = query.filter(_search_filter(search))
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+
+    rows = query.order_by(User.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if not include_profile:
+        return rows, rows[-1].id if has_more else None
+
+    rows = [_with_profile(row) for row in rows]
+    return rows, rows[-1][0].id if has_more else None
@@ -0,0 +1,174 @@
+"""
+Soft and hard deletion of users.
+
+Deleting a user through the API is a soft delete: users.deleted_at is set,
+their sessions are revoked (access tokens included), and the do_orm_execute hook in app/models.py
+hides them from every query. Nothing else is touched, so it can be undone
+with restore_users().
+
+purge_users() hard-deletes soft-deleted users, batch_size users per
+transaction, with set-based statements per table:
+
+* rows that belong to the user go: their profile, enrollments, submissions,
+  their own attendance, notifications, outbox emails and refresh tokens,
+* shared records they authored (courses, approval requests, policies,
+  reports, course materials, attendance they took) are handed over to
+  `reassign_to`,
+* their teaching assignments are kept, inactive and without a faculty
+  member, so the students' attendance under them survives,
+* optional references (approved_by, graded_by, claimed_by and revoked
+  token owners) are cleared.
+
+Files of deleted submissions are removed from disk after the batch commits.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update, select
+
+from app.auth import revoke_user_sessions
+from app.models import (db, User, UserRole, Student, Faculty, Admin, DepartmentHead, Course, CourseApproval,
+                        Enrollment, Notification, NotificationArchive, NotificationCounter, AssignmentSubmission,
+                        Policy, Report, FacultyCourse, Attendance, CourseMaterial, EmailOutbox, RefreshToken,
+                        RevokedToken)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def soft_delete_users(user_ids, now=None):
+    """Mark users deleted and end their sessions; returns the number deleted"""
+    if now is None:
+        now = datetime.utcnow()
+    user_ids = list(user_ids)
+    deleted = db.session.execute(
+        update(User).where(User.id.in_(user_ids), User.deleted_at.is_(None)).values(deleted_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    # Their access tokens too; purged users were soft-deleted first, so this covers purging as well
+    revoke_user_sessions(user_ids)
+    db.session.commit()
+    return deleted
+
+
+def restore_users(user_ids):
+    """Undo a soft delete; returns the number restored"""
+    restored = db.session.execute(
+        update(User).where(User.id.in_(list(user_ids)), User.deleted_at.isnot(None)).values(deleted_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return restored
+
+
+def _delete(model, *criteria):
+    return db.session.execute(delete(model).where(*criteria).execution_options(synchronize_session=False)).rowcount
+
+
+def _update(model, values, *criteria):
+    db.session.execute(update(model).where(*criteria).values(**values).execution_options(synchronize_session=False))
+
+
+def _purge_batch(user_ids, reassign_to):
+    """Delete one batch of users and everything that depends on them; returns file paths to remove"""
+    student_ids = select(Student.id).where(Student.user_id.in_(user_ids))
+    faculty_ids = select(Faculty.id).where(Faculty.user_id.in_(user_ids))
+
+    files = [path for (path,) in db.session.query(AssignmentSubmission.file_path)
+             .filter(AssignmentSubmission.student_id.in_(student_ids))]
+
+    # Their own records, children first
+    _delete(Attendance, Attendance.student_id.in_(student_ids))
+    _delete(AssignmentSubmission, AssignmentSubmission.student_id.in_(student_ids))
+    _delete(Enrollment, Enrollment.student_id.in_(student_ids))
+    for model in (Notification, NotificationArchive, NotificationCounter, EmailOutbox, RefreshToken):
+        _delete(model, model.user_id.in_(user_ids))
+
+    # Shared records they wrote stay, under someone else's name
+    _update(Attendance, {'created_by': reassign_to}, Attendance.created_by.in_(user_ids))
+    _update(Course, {'created_by': reassign_to}, Course.created_by.in_(user_ids))
+    _update(CourseApproval, {'requested_by': reassign_to}, CourseApproval.requested_by.in_(user_ids))
+    _update(Policy, {'created_by': reassign_to}, Policy.created_by.in_(user_ids))
+    _update(Report, {'created_by': reassign_to}, Report.created_by.in_(user_ids))
+    _update(CourseMaterial, {'created_by': reassign_to}, CourseMaterial.created_by.in_(user_ids))
+
+    # Teaching assignments lose their teacher but keep the attendance taken under them
+    _update(FacultyCourse, {'faculty_id': None, 'is_active': False}, FacultyCourse.faculty_id.in_(faculty_ids))
+
+    # Optional references are cleared; revocations stay until their tokens expire
+    _update(CourseApproval, {'approved_by': None}, CourseApproval.approved_by.in_(user_ids))
+    _update(AssignmentSubmission, {'graded_by': None}, AssignmentSubmission.graded_by.in_(user_ids))
+    _update(AssignmentSubmission, {'claimed_by': None, 'claim_expires_at': None},
+            AssignmentSubmission.claimed_by.in_(user_ids))
+    _update(RevokedToken, {'user_id': None}, RevokedToken.user_id.in_(user_ids))
+
+    for model in (Student, Faculty, Admin, DepartmentHead):
+        _delete(model, model.user_id.in_(user_ids))
+    _delete(User, User.id.in_(user_ids))
+    return files
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {str(e)}")
+
+
+def default_reassign_target(excluding=()):
+    """The longest-standing admin not being purged, who inherits shared records"""
+    return db.session.query(User.id)\
+        .filter(User.role == UserRole.ADMIN, User.id.notin_(list(excluding)))\
+        .order_by(User.id)\
+        .limit(1)\
+        .scalar()
+
+
+def purge_users(reassign_to, user_ids=None, deleted_before=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Hard-delete soft-deleted users in batches; returns the number purged.
+
+    Purges the given user_ids, or everyone deleted before `deleted_before`.
+    Each batch is its own transaction, so tables are never locked for long.
+    """
+    if user_ids is None and deleted_before is None:
+        raise ValueError("Give user_ids or deleted_before")
+
+    query = db.session.query(User.id).filter(User.deleted_at.isnot(None), User.id != reassign_to)\
+        .execution_options(include_deleted=True)
+    if user_ids is not None:
+        query = query.filter(User.id.in_(list(user_ids)))
+    if deleted_before is not None:
+        query = query.filter(User.deleted_at < deleted_before)
+
+    total = 0
+    last_id = 0
+    while True:
+        batch = [user_id for (user_id,) in query.filter(User.id > last_id).order_by(User.id).limit(batch_size)]
+        if not batch:
+            break
+        try:
+            files = _purge_batch(batch, reassign_to)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        _remove_files(files)
+        total += len(batch)
+        last_id = batch[-1]
+        if len(batch) < batch_size:
+            break
+    return total
+
+
+def purge_deleted_users(older_than_days, reassign_to=None, batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Hard-delete users soft-deleted more than `older_than_days` ago"""
+    if now is None:
+        now = datetime.utcnow()
+    if reassign_to is None:
+        reassign_to = default_reassign_target()
+    if reassign_to is None:
+        raise ValueError("No admin to hand shared records over to")
+    return purge_users(reassign_to, deleted_before=now - timedelta(days=older_than_days), batch_size=batch_size)
@@ -1,5 +1,6 @@
 from app.models import db, User, UserRole, Student, Faculty, Admin, DepartmentHead, Course, CourseApproval, Enrollment, ApprovalStatus
-from app.password_utils import hash_password, generate_access_code
+from app.password_utils import hash_password
+from app.access_codes import allocate_access_codes
 
 def create_role_specific_profile(user, role):
     """Create role-specific profile for a user"""
@@ -36,10 +37,8 @@ def create_role_specific_profile(user, role):
         )
         db.session.add(dept_head)
 
-def create_test_user(email, password, first_name, last_name, role, user_count):
+def create_test_user(email, password, first_name, last_name, role, access_code):
     """Create a test user with the specified role"""
-    access_code = generate_access_code(email, user_count)
-    
     user = User(
         email=email,
         password_hash=hash_password(password),
@@ -56,17 +55,16 @@ def create_test_user(email, password, first_name, last_name, role, user_count):
     
     return user
 
-def create_enrolled_user_without_password(email, first_name, last_name, role, user_count):
+def create_enrolled_user_without_password(email, first_name, last_name, role, access_code):
     """Create a user that is enrolled but has not set up a password yet"""
-    access_code = generate_access_code(email, user_count)
-    
     user = User(
         email=email,
         password_hash="NEEDS_SETUP",  # Special marker for users who need to set up passwords
         first_name=first_name,
         last_name=last_name,
         role=role,
-        access_code=access_code
+        access_code=access_code,
+        status='pending'
     )
     
     db.session.add(user)
@@ -115,19 +113,6 @@ def populate_test_data():
         }
     ]
     
-    user_count = 1
-    
-    for user_data in users_data:
-        create_test_user(
-            email=user_data["email"],
-            password=user_data["password"],
-            first_name=user_data["first_name"],
-            last_name=user_data["last_name"],
-            role=user_data["role"],
-            user_count=user_count
-        )
-        user_count += 1
-    
     # Create enrolled students who haven't set up passwords yet
     enrolled_students = [
         {
@@ -150,15 +135,27 @@ def populate_test_data():
         }
     ]
     
-    for student_data in enrolled_students:
+    # Allocate all access codes before writing anything
+    access_codes = allocate_access_codes([u["email"] for u in users_data + enrolled_students])
+    
+    for user_data, access_code in zip(users_data, access_codes):
+        create_test_user(
+            email=user_data["email"],
+            password=user_data["password"],
+            first_name=user_data["first_name"],
+            last_name=user_data["last_name"],
+            role=user_data["role"],
+            access_code=access_code
+        )
+    
+    for student_data, access_code in zip(enrolled_students, access_codes[len(users_data):]):
         create_enrolled_user_without_password(
             email=student_data["email"],
             first_name=student_data["first_name"],
             last_name=student_data["last_name"],
             role=student_data["role"],
-            user_count=user_count
+            access_code=access_code
         )
-        user_count += 1
     
     # Create sample courses (pre-approved)
     dept_head = User.query.filter_by(role=UserRole.DEPARTMENT_HEAD).first()
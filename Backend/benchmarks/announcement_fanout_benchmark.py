@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark for announcement fanout.
+
+Creates a role with N users in a file-backed SQLite database and times a
+single announcement to all of them, compared with inserting and committing
+one notification per recipient.
+
+Usage:
+    python benchmarks/announcement_fanout_benchmark.py --recipients 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Announcement fanout benchmark')
+    parser.add_argument('--recipients', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--skip-baseline', action='store_true', help='Skip the one-commit-per-row baseline')
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file.name}'
+
+    from app import create_app
+    from app.models import db, User, UserRole, Notification, NotificationType
+    from app.notifications import send_announcement
+
+    app = create_app()
+    with app.app_context():
+        db.session.bulk_insert_mappings(User, [{
+            'email': f'student{i}@bench.local', 'password_hash': 'x', 'first_name': 'S', 'last_name': str(i),
+            'role': UserRole.STUDENT, 'access_code': f'BENCH{i}'
+        } for i in range(args.recipients)])
+        db.session.commit()
+
+        start = time.perf_counter()
+        count = send_announcement(
+            title='Benchmark announcement',
+            message='Hello everyone',
+            role=UserRole.STUDENT,
+            batch_size=args.batch_size
+        )
+        fanout_elapsed = time.perf_counter() - start
+
+        print(f"recipients:        {count}")
+        print(f"bulk fanout:       {fanout_elapsed:.3f}s ({count / fanout_elapsed:.0f} rows/s)")
+
+        if not args.skip_baseline:
+            db.session.query(Notification).delete()
+            db.session.commit()
+            user_ids = [row[0] for row in db.session.query(User.id).filter(User.role == UserRole.STUDENT)]
+
+            start = time.perf_counter()
+            for user_id in user_ids:
+                db.session.add(Notification(user_id=user_id, title='Benchmark announcement',
+                                            message='Hello everyone', type=NotificationType.INFO))
+                db.session.commit()
+            baseline_elapsed = time.perf_counter() - start
+
+            print(f"row-by-row commit: {baseline_elapsed:.3f}s ({len(user_ids) / baseline_elapsed:.0f} rows/s)")
+            print(f"speedup:           {baseline_elapsed / fanout_elapsed:.1f}x")
+
+    os.unlink(db_file.name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the grading queue.
+
+Starts N grader threads against a file-backed SQLite database, each claiming
+and grading submissions until the queue is empty, then checks that no
+submission was handed out twice and reports throughput.
+
+Usage:
+    python benchmarks/grading_queue_benchmark.py --graders 8 --submissions 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def populate(db, models, submission_count):
+    """Create one course, one assignment and the submissions to grade"""
+    User, UserRole, Student, Course, Assignment, AssignmentSubmission = models
+
+    faculty = User(email='grader@bench.local', password_hash='x', first_name='Bench', last_name='Grader',
+                   role=UserRole.FACULTY, access_code='BENCHGRADER')
+    db.session.add(faculty)
+    db.session.flush()
+    course = Course(course_code='BENCH101', title='Benchmark', department='Bench', created_by=faculty.id)
+    db.session.add(course)
+    db.session.flush()
+    assignment = Assignment(title='Bench', course_id=course.id, due_date=datetime.utcnow() + timedelta(days=1))
+    db.session.add(assignment)
+    db.session.flush()
+
+    users = [{'email': f'student{i}@bench.local', 'password_hash': 'x', 'first_name': 'S', 'last_name': str(i),
+              'role': UserRole.STUDENT, 'access_code': f'BENCH{i}'} for i in range(submission_count)]
+    db.session.bulk_insert_mappings(User, users)
+    user_ids = [row[0] for row in db.session.query(User.id).filter(User.role == UserRole.STUDENT).order_by(User.id)]
+    db.session.bulk_insert_mappings(Student, [{'user_id': uid, 'student_id': f'BS{uid}'} for uid in user_ids])
+    student_ids = [row[0] for row in db.session.query(Student.id).order_by(Student.id)]
+    db.session.bulk_insert_mappings(AssignmentSubmission, [{
+        'assignment_id': assignment.id, 'student_id': sid, 'file_name': 'a.pdf', 'file_path': 'bench/a.pdf',
+        'file_size': 1, 'file_type': 'pdf', 'status': 'submitted'
+    } for sid in student_ids])
+    db.session.commit()
+    return faculty.id, assignment.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grading queue throughput benchmark')
+    parser.add_argument('--graders', type=int, default=8)
+    parser.add_argument('--submissions', type=int, default=2000)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file.name}'
+
+    from app import create_app
+    from app.models import db, User, UserRole, Student, Course, Assignment, AssignmentSubmission
+    from app.grading_queue import claim_next_submission, grade_submissions
+
+    app = create_app()
+    with app.app_context():
+        grader_id, assignment_id = populate(
+            db, (User, UserRole, Student, Course, Assignment, AssignmentSubmission), args.submissions)
+
+    claimed = []
+    errors = []
+    lock = threading.Lock()
+
+    def grader():
+        with app.app_context():
+            while True:
+                try:
+                    submission = claim_next_submission(assignment_id, grader_id, lease_seconds=300)
+                    if submission is None:
+                        break
+                    grade_submissions(assignment_id, grader_id, [{'submission_id': submission.id, 'grade': 100}])
+                    with lock:
+                        claimed.append(submission.id)
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(str(e))
+            db.session.remove()
+
+    threads = [threading.Thread(target=grader) for _ in range(args.graders)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    duplicates = len(claimed) - len(set(claimed))
+    print(f"graders:      {args.graders}")
+    print(f"submissions:  {args.submissions}")
+    print(f"graded:       {len(set(claimed))}")
+    print(f"duplicates:   {duplicates}")
+    print(f"errors:       {len(errors)}")
+    print(f"elapsed:      {elapsed:.2f}s")
+    print(f"throughput:   {len(claimed) / elapsed:.1f} claims+grades/s")
+
+    os.unlink(db_file.name)
+    return 0 if duplicates == 0 and len(set(claimed)) == args.submissions else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
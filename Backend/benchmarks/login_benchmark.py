@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark for login throughput under a login storm.
+
+Creates users with bcrypt hashes in a file-backed SQLite database, then runs
+concurrent logins through the test client while a separate thread keeps
+hitting a trivial endpoint. Reports login throughput and the latency of the
+trivial endpoint, for each size of the password hashing pool.
+
+Usage:
+    python benchmarks/login_benchmark.py --users 200 --clients 16 --rounds 12 --workers 2,4,8
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def run_storm(app, users, clients):
+    """Log every user in once from `clients` threads; returns (elapsed, ping latencies in ms)"""
+    latencies = []
+    done = threading.Event()
+
+    def ping():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/bench/ping')
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    def login(email):
+        response = app.test_client().post('/api/auth/login', json={'email': email, 'password': 'password123'})
+        assert response.status_code == 200, response.data
+
+    pinger = threading.Thread(target=ping)
+    pinger.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(login, users))
+    elapsed = time.perf_counter() - start
+    done.set()
+    pinger.join()
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput benchmark')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent login requests')
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt work factor')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated hashing pool sizes to compare')
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    db_file.close()
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file.name}'
+
+    from app import create_app
+    from app.auth import hash_password, shutdown_hash_executor
+    from app.models import db, User, UserRole
+
+    app = create_app()
+    app.config['BCRYPT_ROUNDS'] = args.rounds
+
+    @app.route('/bench/ping')
+    def ping():
+        return 'ok'
+
+    with app.app_context():
+        password_hash = hash_password('password123')
+        db.session.bulk_insert_mappings(User, [{
+            'email': f'student{i}@bench.local', 'password_hash': password_hash, 'first_name': 'S',
+            'last_name': str(i), 'role': UserRole.STUDENT, 'access_code': f'BENCH{i}'
+        } for i in range(args.users)])
+        db.session.commit()
+    emails = [f'student{i}@bench.local' for i in range(args.users)]
+
+    print(f"users: {args.users}, clients: {args.clients}, bcrypt rounds: {args.rounds}")
+    for workers in [int(w) for w in args.workers.split(',')]:
+        shutdown_hash_executor()
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        elapsed, latencies = run_storm(app, emails, args.clients)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else max(latencies, default=0)
+        print(f"hash workers {workers:>2}: {args.users / elapsed:7.1f} logins/s, "
+              f"ping median {statistics.median(latencies):6.2f} ms, p95 {p95:6.2f} ms")
+
+    shutdown_hash_executor()
+    os.unlink(db_file.name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -24,5 +24,107 @@ class Config:
     # CORS settings
     CORS_HEADERS = 'Content-Type'
     
+    # Refresh tokens, exchanged at /api/auth/refresh for new access tokens
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', '30')))
+    
+    # Token revocation: in-memory blocklist size and how often workers pick up new revocations
+    BLOCKLIST_CAPACITY = int(os.getenv('BLOCKLIST_CAPACITY', '100000'))
+    BLOCKLIST_REFRESH_SECONDS = float(os.getenv('BLOCKLIST_REFRESH_SECONDS', '5'))
+    
+    # Email validation: "syntax" (no network) or "deliverability" (DNS lookup on the request)
+    EMAIL_VALIDATION_MODE = os.getenv('EMAIL_VALIDATION_MODE', 'syntax')
+    EMAIL_ASYNC_DELIVERABILITY = os.getenv('EMAIL_ASYNC_DELIVERABILITY', 'False').lower() in ('true', '1', 't')
+    EMAIL_DELIVERABILITY_CACHE_SECONDS = int(os.getenv('EMAIL_DELIVERABILITY_CACHE_SECONDS', '3600'))
+    
+    # Login rate limiting (sliding windows)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() in ('true', '1', 't')
+    RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'memory')  # memory or sqlite (shared by workers)
+    RATE_LIMIT_SQLITE_PATH = os.getenv('RATE_LIMIT_SQLITE_PATH', 'rate_limits.db')
+    LOGIN_IP_LIMIT = int(os.getenv('LOGIN_IP_LIMIT', '20'))
+    LOGIN_IP_WINDOW_SECONDS = int(os.getenv('LOGIN_IP_WINDOW_SECONDS', '60'))
+    LOGIN_EMAIL_FAILURE_LIMIT = int(os.getenv('LOGIN_EMAIL_FAILURE_LIMIT', '5'))
+    LOGIN_EMAIL_WINDOW_SECONDS = int(os.getenv('LOGIN_EMAIL_WINDOW_SECONDS', '900'))
+    CHECK_USER_IP_LIMIT = int(os.getenv('CHECK_USER_IP_LIMIT', '60'))
+    CHECK_USER_IP_WINDOW_SECONDS = int(os.getenv('CHECK_USER_IP_WINDOW_SECONDS', '60'))
+    
+    # Password hashing
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '4'))
+    
+    # Access codes: numbers reserved per trip to the allocation_counters table
+    ACCESS_CODE_BLOCK_SIZE = int(os.getenv('ACCESS_CODE_BLOCK_SIZE', '100'))
+    
+    # Assignment deadline reminders
+    REMINDER_SCHEDULER_ENABLED = os.getenv('REMINDER_SCHEDULER_ENABLED', 'False').lower() in ('true', '1', 't')
+    REMINDER_OFFSETS_HOURS = [int(h) for h in os.getenv('REMINDER_OFFSETS_HOURS', '48,2').split(',') if h.strip()]
+    REMINDER_INTERVAL_SECONDS = int(os.getenv('REMINDER_INTERVAL_SECONDS', '300'))
+    
+    # User directory paging
+    USERS_PAGE_SIZE = int(os.getenv('USERS_PAGE_SIZE', '50'))
+    USERS_MAX_PAGE_SIZE = int(os.getenv('USERS_MAX_PAGE_SIZE', '200'))
+    
+    # Per-worker cache of /api/users/me responses; 0 disables it
+    ME_CACHE_SECONDS = int(os.getenv('ME_CACHE_SECONDS', '30'))
+    ME_CACHE_MAX_ENTRIES = int(os.getenv('ME_CACHE_MAX_ENTRIES', '10000'))
+    
+    # Deleted users: purged by purge_users.py this many days after the soft delete, in batches
+    USER_PURGE_AFTER_DAYS = int(os.getenv('USER_PURGE_AFTER_DAYS', '30'))
+    USER_PURGE_BATCH_SIZE = int(os.getenv('USER_PURGE_BATCH_SIZE', '200'))
+    
+    # Department analytics snapshots are recomputed on read once older than this, even if nothing marked them stale
+    DEPARTMENT_ANALYTICS_MAX_AGE_SECONDS = int(os.getenv('DEPARTMENT_ANALYTICS_MAX_AGE_SECONDS', '3600'))
+    
+    # Enrollment trends: ended buckets are cached per worker and rebuilt after this long; 0 disables the cache
+    ENROLLMENT_TRENDS_CACHE_SECONDS = int(os.getenv('ENROLLMENT_TRENDS_CACHE_SECONDS', '3600'))
+    ENROLLMENT_TRENDS_CACHE_MAX_ENTRIES = int(os.getenv('ENROLLMENT_TRENDS_CACHE_MAX_ENTRIES', '1000'))
+    ENROLLMENT_TRENDS_MAX_BUCKETS = int(os.getenv('ENROLLMENT_TRENDS_MAX_BUCKETS', '1000'))
+    
+    # Bulk provisioning: rows per transaction and processes hashing temporary passwords (default: one per core)
+    PROVISION_BATCH_SIZE = int(os.getenv('PROVISION_BATCH_SIZE', '500'))
+    PROVISION_HASH_PROCESSES = int(os.getenv('PROVISION_HASH_PROCESSES', '0')) or None
+    
+    # Notification listing and retention
+    NOTIFICATIONS_PAGE_SIZE = int(os.getenv('NOTIFICATIONS_PAGE_SIZE', '50'))
+    NOTIFICATIONS_MAX_PAGE_SIZE = int(os.getenv('NOTIFICATIONS_MAX_PAGE_SIZE', '200'))
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '90'))
+    
+    # Notification digests: seconds during which notifications of a type with the same
+    # link are folded into one row per user, e.g. "success:300"; off for every type unless listed
+    NOTIFICATION_DIGEST_WINDOWS = {
+        name.strip(): int(seconds)
+        for name, seconds in (
+            item.split(':') for item in os.getenv('NOTIFICATION_DIGEST_WINDOWS', '').split(',')
+            if item.strip()
+        )
+    }
+    
+    # Email delivery of notifications through the outbox
+    EMAIL_NOTIFICATIONS_ENABLED = os.getenv('EMAIL_NOTIFICATIONS_ENABLED', 'False').lower() in ('true', '1', 't')
+    EMAIL_DISPATCHER_ENABLED = os.getenv('EMAIL_DISPATCHER_ENABLED', 'False').lower() in ('true', '1', 't')
+    EMAIL_TRANSPORT = os.getenv('EMAIL_TRANSPORT', 'smtp')  # smtp, file or memory
+    EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', 'outbox.jsonl')
+    EMAIL_DISPATCH_INTERVAL_SECONDS = int(os.getenv('EMAIL_DISPATCH_INTERVAL_SECONDS', '10'))
+    EMAIL_DISPATCH_BATCH_SIZE = int(os.getenv('EMAIL_DISPATCH_BATCH_SIZE', '100'))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '5'))
+    EMAIL_RETRY_BASE_SECONDS = int(os.getenv('EMAIL_RETRY_BASE_SECONDS', '30'))
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', '25'))
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'False').lower() in ('true', '1', 't')
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@snu.edu.in')
+    MAIL_TIMEOUT_SECONDS = int(os.getenv('MAIL_TIMEOUT_SECONDS', '10'))
+    
+    # Live notification stream
+    JWT_QUERY_STRING_NAME = 'token'
+    NOTIFICATION_STREAM_POLL_SECONDS = float(os.getenv('NOTIFICATION_STREAM_POLL_SECONDS', '2'))
+    NOTIFICATION_STREAM_GAP_SECONDS = float(os.getenv('NOTIFICATION_STREAM_GAP_SECONDS', '30'))  # How long ids skipped by the tail are looked for
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS = int(os.getenv('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '15'))
+    
+    # Grading queue
+    GRADING_LEASE_SECONDS = int(os.getenv('GRADING_LEASE_SECONDS', '900'))
+    GRADING_MAX_LEASE_SECONDS = int(os.getenv('GRADING_MAX_LEASE_SECONDS', '3600'))  # Longest lease a claim can ask for
+    GRADE_MAX = float(os.getenv('GRADE_MAX', '100'))  # Highest grade the bulk grading endpoint accepts
+    
     # Other settings
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() in ('true', '1', 't') 
\ No newline at end of file
@@ -1,11 +1,15 @@
 from app import create_app
 from app.models import db, User, UserRole, Admin, DepartmentHead
-from app.password_utils import hash_password, generate_access_code
+from app.password_utils import hash_password
+from app.access_codes import allocate_access_codes
 
 def create_admin_and_dept_head():
     app = create_app()
     
     with app.app_context():
+        # Allocate access codes before writing anything
+        admin_code, dept_head_code = allocate_access_codes(["admin@example.com", "depthead@example.com"])
+        
         # Create admin user if not exists
         admin = User.query.filter_by(email="admin@example.com").first()
         if not admin:
@@ -15,7 +19,7 @@ def create_admin_and_dept_head():
                 first_name="Admin",
                 last_name="User",
                 role=UserRole.ADMIN,
-                access_code=generate_access_code("admin@example.com", 1)
+                access_code=admin_code
             )
             db.session.add(admin)
             db.session.flush()
@@ -38,7 +42,7 @@ def create_admin_and_dept_head():
                 first_name="Department",
                 last_name="Head",
                 role=UserRole.DEPARTMENT_HEAD,
-                access_code=generate_access_code("depthead@example.com", 2)
+                access_code=dept_head_code
             )
             db.session.add(dept_head)
             db.session.flush()
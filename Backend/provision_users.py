@@ -0,0 +1,32 @@
+import argparse
+import sys
+from app import create_app
+from app.provisioning import provision_users as provision
+
+def provision_users():
+    """Create users from a CSV file and write their credentials report"""
+    app = create_app()
+    
+    parser = argparse.ArgumentParser(description='Create users and their role profiles from a CSV file')
+    parser.add_argument('csv_file', help='CSV with email, first_name, last_name, role and optional profile columns')
+    parser.add_argument('--report', default='credentials.csv',
+                        help='Where to write access codes and temporary passwords')
+    parser.add_argument('--batch-size', type=int, default=app.config.get('PROVISION_BATCH_SIZE', 500))
+    parser.add_argument('--processes', type=int, default=app.config.get('PROVISION_HASH_PROCESSES'),
+                        help='Processes hashing passwords (default: one per core)')
+    args = parser.parse_args()
+    
+    with app.app_context(), open(args.csv_file, newline='', encoding='utf-8-sig') as lines, \
+            open(args.report, 'w', newline='') as report:
+        try:
+            counts = provision(lines, report, batch_size=args.batch_size, processes=args.processes)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+    
+    print(f"Created {counts['created']} users, skipped {counts['skipped']}, failed {counts['failed']}")
+    print(f"Credentials written to {args.report}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(provision_users())
@@ -0,0 +1,23 @@
+import argparse
+from app import create_app
+from app.notifications import purge_read_notifications
+
+def purge_notifications():
+    """Remove read notifications older than the retention period"""
+    app = create_app()
+    
+    parser = argparse.ArgumentParser(description='Delete or archive old read notifications')
+    parser.add_argument('--days', type=int, default=app.config.get('NOTIFICATION_RETENTION_DAYS', 90),
+                        help='Remove read notifications older than this many days')
+    parser.add_argument('--archive', action='store_true',
+                        help='Move notifications to notification_archive instead of deleting them')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    
+    with app.app_context():
+        removed = purge_read_notifications(args.days, archive=args.archive, batch_size=args.batch_size)
+        action = "Archived" if args.archive else "Deleted"
+        print(f"{action} {removed} read notifications older than {args.days} days")
+
+if __name__ == "__main__":
+    purge_notifications()
@@ -0,0 +1,23 @@
+import argparse
+from app import create_app
+from app.user_purge import purge_deleted_users
+
+def purge_users():
+    """Permanently remove users that were deleted longer ago than the retention period"""
+    app = create_app()
+    
+    parser = argparse.ArgumentParser(description='Hard-delete soft-deleted users and everything that depends on them')
+    parser.add_argument('--days', type=int, default=app.config.get('USER_PURGE_AFTER_DAYS', 30),
+                        help='Purge users deleted more than this many days ago')
+    parser.add_argument('--reassign-to', type=int, default=None,
+                        help='User id that takes over courses, approvals, policies and reports of purged users '
+                             '(default: the first admin)')
+    parser.add_argument('--batch-size', type=int, default=app.config.get('USER_PURGE_BATCH_SIZE', 200))
+    args = parser.parse_args()
+    
+    with app.app_context():
+        purged = purge_deleted_users(args.days, reassign_to=args.reassign_to, batch_size=args.batch_size)
+        print(f"Purged {purged} users deleted more than {args.days} days ago")
+
+if __name__ == "__main__":
+    purge_users()
@@ -0,0 +1,19 @@
+import argparse
+from app import create_app
+from app.department_analytics import refresh_departments
+
+def refresh_department_analytics():
+    """Recompute the department analytics snapshots"""
+    app = create_app()
+    
+    parser = argparse.ArgumentParser(description='Recompute the department dashboard snapshots')
+    parser.add_argument('--stale-only', action='store_true',
+                        help='Only recompute departments whose data changed since their last refresh')
+    args = parser.parse_args()
+    
+    with app.app_context():
+        refreshed = refresh_departments(stale_only=args.stale_only)
+        print(f"Refreshed analytics of {refreshed} department(s)")
+
+if __name__ == "__main__":
+    refresh_department_analytics()
@@ -4,7 +4,8 @@ from datetime import datetime
 from flask import Flask
 from app import create_app
 from app.models import db, User, UserRole, Student, Course, Enrollment, CourseMaterial
-from app.password_utils import hash_password, generate_access_code
+from app.password_utils import hash_password
+from app.access_codes import allocate_access_codes
 
 # Initialize the Flask app
 app = create_app()
@@ -76,7 +77,10 @@ def seed_students():
         
         created_students = []
         
-        for user_data in student_users_data:
+        # Allocate access codes before writing anything
+        access_codes = allocate_access_codes([u["email"] for u in student_users_data])
+        
+        for user_data, access_code in zip(student_users_data, access_codes):
             # Check if user already exists
             existing_user = User.query.filter_by(email=user_data["email"]).first()
             if existing_user:
@@ -85,7 +89,6 @@ def seed_students():
                 
             # Create user
             hashed_password = hash_password(user_data["password"])
-            access_code = generate_access_code(user_data["email"], 1)  # 1 for STUDENT role
             
             new_user = User(
                 email=user_data["email"],
@@ -0,0 +1,33 @@
+import argparse
+import sys
+from app import create_app
+from app.roster_sync import sync_roster as sync
+
+def sync_roster():
+    """Sync students and faculty with the registrar's roster export"""
+    app = create_app()
+    
+    parser = argparse.ArgumentParser(description='Apply the changes in a registrar (SIS) roster export')
+    parser.add_argument('csv_file', help='CSV with email, first_name, last_name, role and optional sis_id, '
+                                         'program, year_level, department, position')
+    parser.add_argument('--dry-run', action='store_true', help='Report the changes without applying them')
+    parser.add_argument('--no-deactivate', action='store_true',
+                        help='Keep students and faculty that are missing from the roster active')
+    args = parser.parse_args()
+    
+    with app.app_context(), open(args.csv_file, newline='', encoding='utf-8-sig') as lines:
+        try:
+            counts = sync(lines, deactivate_missing=not args.no_deactivate, dry_run=args.dry_run)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+    
+    prefix = "Would have" if args.dry_run else "Roster sync:"
+    print(f"{prefix} created {counts['created']}, updated {counts['updated']} users and "
+          f"{counts['profiles_updated']} profiles, reactivated {counts['reactivated']}, "
+          f"deactivated {counts['deactivated']}")
+    print(f"{counts['staged']} roster rows, {counts['rejected']} rejected, {counts['conflicts']} conflicts")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(sync_roster())
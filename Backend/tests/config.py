@@ -9,4 +9,5 @@ class TestConfig:
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = "test-secret-key"
-    JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour 
\ No newline at end of file
+    JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour 
+    BCRYPT_ROUNDS = 4  # Keep password hashing fast in tests
@@ -0,0 +1,82 @@
+"""
+Tests for access code allocation.
+"""
+from unittest import mock
+from sqlalchemy import event
+from app import access_codes
+from app.access_codes import allocate_access_codes, allocate_numbers, generate_access_code
+from app.auth import register_user
+from app.models import db, User, AllocationCounter, UserRole
+from tests.test_base import BaseTestCase
+
+
+class AccessCodeTestCase(BaseTestCase):
+    """Test case for the block-reserving access code allocator."""
+
+    def setUp(self):
+        super().setUp()
+        # Blocks reserved against an earlier test database mean nothing here
+        access_codes._blocks.clear()
+        self.app.config['ACCESS_CODE_BLOCK_SIZE'] = 10
+
+    def test_counter_starts_above_existing_users(self):
+        """The first block starts after the highest user id."""
+        max_id = db.session.query(db.func.max(User.id)).scalar()
+        self.assertEqual(allocate_numbers(3), [max_id + 1, max_id + 2, max_id + 3])
+        self.assertEqual(db.session.get(AllocationCounter, 'access_code').next_value, max_id + 11)
+
+    def test_first_block_leaves_pending_changes_unflushed(self):
+        """Seeding the counter doesn't flush the caller's session, which would hold the SQLite write lock."""
+        user = db.session.get(User, 1)
+        user.password_hash = "new-hash"
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            allocate_numbers(1)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertIn(user, db.session.dirty)
+        self.assertFalse([s for s in statements if s.startswith('UPDATE users')])
+        db.session.commit()
+        self.assertEqual(db.session.get(User, 1).password_hash, "new-hash")
+
+    def test_block_is_reserved_once_per_block_size(self):
+        """Numbers inside a reserved block are handed out without touching the database."""
+        with mock.patch('app.access_codes._reserve_block', wraps=access_codes._reserve_block) as reserve:
+            numbers = [allocate_numbers(1)[0] for _ in range(25)]
+        self.assertEqual(len(set(numbers)), 25)
+        self.assertEqual(reserve.call_count, 3)
+
+        # A large request reserves everything it needs at once
+        with mock.patch('app.access_codes._reserve_block', wraps=access_codes._reserve_block) as reserve:
+            self.assertEqual(len(set(allocate_numbers(500))), 500)
+        self.assertEqual(reserve.call_count, 1)
+
+    def test_codes_are_unique_without_counting_users(self):
+        """Registrations get distinct codes and never run a COUNT over users."""
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            for i in range(5):
+                result = register_user(f"new{i}@test.com", "password123", "New", str(i), UserRole.STUDENT)
+                self.assertTrue(result["success"], result)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        codes = [u.access_code for u in User.query.filter(User.email.like('new%')).all()]
+        self.assertEqual(len(set(codes)), 5)
+        self.assertFalse([s for s in statements if 'count(' in s.lower()])
+
+    def test_generate_access_code_format(self):
+        """Codes are the cleaned local part (max 10 characters), a dash and the number."""
+        self.assertEqual(generate_access_code("john.doe-smith@test.com", 42), "johndoesmi-42")
+        self.assertEqual(len(set(allocate_access_codes(["same@test.com"] * 20))), 20)
+
+    def test_codes_of_different_emails_cannot_collide(self):
+        """A local part ending in digits doesn't run into another email's number."""
+        self.assertNotEqual(generate_access_code("user1@test.com", 10), generate_access_code("user@test.com", 110))
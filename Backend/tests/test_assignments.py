@@ -0,0 +1,220 @@
+"""
+Tests for assignment routes.
+"""
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models import (db, User, UserRole, Student, Faculty, Course, FacultyCourse, Enrollment,
+                        Assignment, AssignmentSubmission)
+from tests.test_base import BaseTestCase
+
+
+class AssignmentTestCase(BaseTestCase):
+    """Test case for assignment routes."""
+
+    def setUp(self):
+        super().setUp()
+        self.course = Course.query.filter_by(course_code="CS101").first()
+        self.faculty_user = User.query.filter_by(email="faculty@test.com").first()
+        self.faculty = Faculty.query.filter_by(user_id=self.faculty_user.id).first()
+        db.session.add(FacultyCourse(faculty_id=self.faculty.id, course_id=self.course.id, semester="Spring 2024"))
+
+        self.assignment = Assignment(
+            title="Homework 1",
+            course_id=self.course.id,
+            due_date=datetime.utcnow() + timedelta(days=7)
+        )
+        db.session.add(self.assignment)
+        db.session.commit()
+
+        # Three enrolled students
+        self.students = [Student.query.filter_by(student_id="STU001").first()]
+        for i in range(2, 4):
+            user = User(
+                email=f"student{i}@test.com",
+                password_hash="hash",
+                first_name="Student",
+                last_name=str(i),
+                role=UserRole.STUDENT,
+                access_code=f"STUDENT{i}"
+            )
+            db.session.add(user)
+            db.session.commit()
+            student = Student(user_id=user.id, student_id=f"STU00{i}")
+            db.session.add(student)
+            db.session.commit()
+            self.students.append(student)
+        for student in self.students:
+            db.session.add(Enrollment(student_id=student.id, course_id=self.course.id))
+        db.session.commit()
+
+    def _submit(self, student, content, file_name="hw.txt"):
+        self.current_user_id = student.user_id
+        return self.client.post(
+            f'/api/assignments/submit/{self.assignment.id}',
+            data={'file': (io.BytesIO(content), file_name)},
+            content_type='multipart/form-data'
+        )
+
+    def test_submission_records_content_hash(self):
+        """Submitting stores the SHA-256 of the file."""
+        response = self._submit(self.students[0], b"my answer")
+        self.assert_status_code(response, 201)
+
+        submission = AssignmentSubmission.query.filter_by(student_id=self.students[0].id).first()
+        self.assertEqual(submission.content_hash, hashlib.sha256(b"my answer").hexdigest())
+
+    def test_duplicate_submissions_grouped(self):
+        """Identical files from different students are reported as one group."""
+        self._submit(self.students[0], b"copied answer", "a.txt")
+        self._submit(self.students[1], b"copied answer", "b.txt")
+        self._submit(self.students[2], b"original answer", "c.txt")
+
+        self.current_user_id = self.faculty_user.id
+        response = self.client.get(f'/api/assignments/submissions/{self.assignment.id}/duplicates')
+        self.assert_status_code(response, 200)
+
+        groups = json.loads(response.data)['data']
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(
+            sorted(s['student_id'] for s in groups[0]['submissions']),
+            ["STU001", "STU002"]
+        )
+
+    def test_duplicate_submissions_requires_course_faculty(self):
+        """Only faculty teaching the course can list duplicates."""
+        self.current_user_id = self.students[0].user_id
+        response = self.client.get(f'/api/assignments/submissions/{self.assignment.id}/duplicates')
+        self.assert_status_code(response, 403)
+
+    def test_grading_queue_hands_out_distinct_submissions(self):
+        """Two graders claiming at once never get the same submission."""
+        for i, student in enumerate(self.students[:2]):
+            self._submit(student, f"answer {i}".encode())
+
+        self.current_user_id = self.faculty_user.id
+        first = json.loads(self.client.post(f'/api/assignments/{self.assignment.id}/grading-queue/claim').data)['data']
+        second = json.loads(self.client.post(f'/api/assignments/{self.assignment.id}/grading-queue/claim').data)['data']
+        third = json.loads(self.client.post(f'/api/assignments/{self.assignment.id}/grading-queue/claim').data)['data']
+
+        self.assertNotEqual(first['id'], second['id'])
+        self.assertIsNone(third)
+
+    def test_expired_lease_returns_to_queue(self):
+        """A submission whose lease has expired can be claimed again."""
+        self._submit(self.students[0], b"answer")
+
+        self.current_user_id = self.faculty_user.id
+        first = json.loads(self.client.post(
+            f'/api/assignments/{self.assignment.id}/grading-queue/claim',
+            json={'lease_seconds': 60}
+        ).data)['data']
+        AssignmentSubmission.query.update({'claim_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        again = json.loads(self.client.post(f'/api/assignments/{self.assignment.id}/grading-queue/claim').data)['data']
+
+        self.assertEqual(first['id'], again['id'])
+
+    def test_claim_validates_lease_seconds(self):
+        """Leases must be positive integers and are capped at the configured maximum."""
+        self._submit(self.students[0], b"answer")
+
+        self.current_user_id = self.faculty_user.id
+        url = f'/api/assignments/{self.assignment.id}/grading-queue/claim'
+        for lease_seconds in (-1, 0, "60", 1.5, True):
+            self.assert_status_code(self.client.post(url, json={'lease_seconds': lease_seconds}), 400)
+
+        self.app.config['GRADING_MAX_LEASE_SECONDS'] = 600
+        self.assert_status_code(self.client.post(url, json={'lease_seconds': 10 ** 9}), 200)
+        lease = AssignmentSubmission.query.one().claim_expires_at - datetime.utcnow()
+        self.assertLessEqual(lease, timedelta(seconds=600))
+
+    def test_bulk_grade(self):
+        """Grading several submissions marks them graded and empties the queue."""
+        for i, student in enumerate(self.students):
+            self._submit(student, f"answer {i}".encode())
+        submission_ids = [s.id for s in AssignmentSubmission.query.all()]
+
+        # Another grader holds the last one
+        AssignmentSubmission.query.filter_by(id=submission_ids[-1]).update(
+            {'claimed_by': 1, 'claim_expires_at': datetime.utcnow() + timedelta(hours=1)})
+        db.session.commit()
+
+        self.current_user_id = self.faculty_user.id
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.post(
+                f'/api/assignments/{self.assignment.id}/grading-queue/grades',
+                json={'grades': [{'submission_id': sid, 'grade': 80 + i, 'feedback': f"Note {i}"}
+                                 for i, sid in enumerate(submission_ids)]}
+            )
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assert_status_code(response, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual((data['graded'], data['rejected']), (submission_ids[:2], submission_ids[2:]))
+        self.assertEqual(len([s for s in statements if s.startswith('UPDATE assignment_submissions')]), 1)
+        self.assertEqual([(s.grade, s.feedback) for s in AssignmentSubmission.query.order_by(AssignmentSubmission.id)],
+                         [(80, "Note 0"), (81, "Note 1"), (None, None)])
+
+        AssignmentSubmission.query.filter_by(id=submission_ids[-1]).update({'claimed_by': None})
+        db.session.commit()
+        response = self.client.post(
+            f'/api/assignments/{self.assignment.id}/grading-queue/grades',
+            json={'grades': [{'submission_id': submission_ids[-1], 'grade': 90}]}
+        )
+        self.assertEqual(json.loads(response.data)['data']['graded'], submission_ids[-1:])
+
+        status = json.loads(self.client.get(f'/api/assignments/{self.assignment.id}/grading-queue').data)['data']
+        self.assertEqual(status, {'total': 3, 'graded': 3, 'claimed': 0, 'available': 0})
+
+    def test_bulk_grade_validates_grades(self):
+        """Grades must be numbers from 0 to GRADE_MAX and ids integers; nothing is written otherwise."""
+        self._submit(self.students[0], b"answer")
+        submission_id = AssignmentSubmission.query.one().id
+
+        self.current_user_id = self.faculty_user.id
+        url = f'/api/assignments/{self.assignment.id}/grading-queue/grades'
+        for grade in ("A", [90], None, True, -1, 100.5):
+            response = self.client.post(url, json={'grades': [{'submission_id': submission_id, 'grade': grade}]})
+            self.assert_status_code(response, 400)
+        self.assert_status_code(self.client.post(url, json={'grades': [{'submission_id': str(submission_id),
+                                                                        'grade': 90}]}), 400)
+        self.assertIsNone(AssignmentSubmission.query.one().grade)
+
+        self.app.config['GRADE_MAX'] = 20
+        self.assert_status_code(self.client.post(url, json={'grades': [{'submission_id': submission_id,
+                                                                        'grade': 30}]}), 400)
+        self.assert_status_code(self.client.post(url, json={'grades': [{'submission_id': submission_id,
+                                                                        'grade': 17.5}]}), 200)
+        self.assertEqual(AssignmentSubmission.query.one().grade, 17.5)
+
+    def test_submission_matrix(self):
+        """The matrix has one row per enrolled student and one column per assignment."""
+        second = Assignment(
+            title="Homework 2",
+            course_id=self.course.id,
+            due_date=datetime.utcnow() + timedelta(days=14)
+        )
+        db.session.add(second)
+        db.session.commit()
+        self._submit(self.students[0], b"answer")
+
+        self.current_user_id = self.faculty_user.id
+        response = self.client.get(f'/api/assignments/{self.course.id}/submission-matrix')
+        self.assert_status_code(response, 200)
+
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['assignments']['id'], [self.assignment.id, second.id])
+        self.assertEqual(len(data['students']['id']), 3)
+
+        row = data['students']['student_id'].index("STU001")
+        self.assertEqual(data['status'][row], ['submitted', 'missing'])
+        self.assertEqual(data['late'][row], [False, False])
+        other_row = data['students']['student_id'].index("STU002")
+        self.assertEqual(data['status'][other_row], ['missing', 'missing'])
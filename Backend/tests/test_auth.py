@@ -2,9 +2,18 @@
 Tests for authentication routes.
 """
 import json
+import threading
 import unittest
+from datetime import datetime
 from unittest import mock
-from app.models import User, UserRole
+import email_validator
+import jwt
+from sqlalchemy import event
+from app.auth import (hash_password, login_user, current_identity, current_profile, password_needs_rehash,
+                      rotate_refresh_token, issue_refresh_token, get_identity_claims, normalize_email,
+                      _validate_email_cached)
+from app import auth
+from app.models import db, User, UserRole, Faculty
 from tests.test_base import BaseTestCase
 
 
@@ -35,6 +44,18 @@ class AuthTestCase(BaseTestCase):
         self.assertTrue(data["success"])
         self.assertFalse(data["exists"])
     
+    def test_check_user_deleted(self):
+        """A soft-deleted account is reported as deleted, not as unregistered."""
+        user = User.query.filter_by(email="faculty@test.com").first()
+        user.deleted_at = datetime.utcnow()
+        db.session.commit()
+        
+        response = self.client.post('/api/auth/check-user', json={"email": "faculty@test.com"})
+        data = json.loads(response.data)
+        self.assert_status_code(response, 410)
+        self.assertTrue(data["deleted"])
+        self.assertNotIn("user_details", data)
+    
     def test_check_user_invalid_request(self):
         """Test check_user endpoint with invalid request data."""
         response = self.client.post(
@@ -216,6 +237,183 @@ class AuthTestCase(BaseTestCase):
         # Expecting 401 or 422 status code
         self.assertIn(response.status_code, [401, 422])
 
+    def test_login_token_carries_role_claims(self):
+        """Access tokens include the user's role and role profile id."""
+        user = User.query.filter_by(email="faculty@test.com").first()
+        user.password_hash = hash_password("secret")
+        db.session.commit()
+        faculty = Faculty.query.filter_by(user_id=user.id).first()
+        
+        result = login_user("faculty@test.com", "secret")
+        
+        self.assertTrue(result["success"])
+        claims = jwt.decode(result["access_token"], options={"verify_signature": False})
+        self.assertEqual(claims["role"], "faculty")
+        self.assertEqual(claims["profile_id"], faculty.id)
+    
+    def test_login_rehashes_when_cost_changes(self):
+        """A successful login upgrades a hash made with a different work factor."""
+        user = User.query.filter_by(email="faculty@test.com").first()
+        user.password_hash = hash_password("secret", rounds=5)
+        db.session.commit()
+        self.assertTrue(password_needs_rehash(user.password_hash))
+        
+        self.assertTrue(login_user("faculty@test.com", "secret")["success"])
+        
+        user = User.query.filter_by(email="faculty@test.com").first()
+        self.assertTrue(user.password_hash.startswith("$2b$04$"))
+        self.assertFalse(password_needs_rehash(user.password_hash))
+        self.assertTrue(login_user("faculty@test.com", "secret")["success"])
+    
+    def test_email_validation_is_offline_and_cached(self):
+        """By default emails are only syntax-checked, once per address."""
+        _validate_email_cached.cache_clear()
+        with mock.patch('app.auth.validate_email', wraps=email_validator.validate_email) as validate:
+            self.assertEqual(normalize_email("Someone@Example.org"), "Someone@example.org")
+            normalize_email("Someone@Example.org")
+        
+        validate.assert_called_once_with("Someone@Example.org", check_deliverability=False)
+    
+    def test_email_deliverability_mode(self):
+        """The deliverability mode asks for the DNS check."""
+        auth._deliverability_cache.clear()
+        self.app.config['EMAIL_VALIDATION_MODE'] = 'deliverability'
+        with mock.patch('app.auth.validate_email') as validate:
+            validate.return_value.normalized = "user@example.org"
+            normalize_email("user@example.org")
+        
+        validate.assert_called_once_with("user@example.org", check_deliverability=True)
+    
+    def test_deliverability_results_expire(self):
+        """DNS results are cached only for EMAIL_DELIVERABILITY_CACHE_SECONDS."""
+        auth._deliverability_cache.clear()
+        self.app.config['EMAIL_VALIDATION_MODE'] = 'deliverability'
+        with mock.patch('app.auth.validate_email') as validate:
+            validate.return_value.normalized = "user@example.org"
+            normalize_email("user@example.org")
+            normalize_email("user@example.org")
+            self.assertEqual(validate.call_count, 1)
+            
+            self.app.config['EMAIL_DELIVERABILITY_CACHE_SECONDS'] = 0
+            auth._deliverability_cache.clear()
+            normalize_email("user@example.org")
+            normalize_email("user@example.org")
+            self.assertEqual(validate.call_count, 3)
+    
+    def test_background_deliverability_check_runs_once(self):
+        """A background check is queued once per address, and not again while its result is fresh."""
+        auth._deliverability_cache.clear()
+        _validate_email_cached.cache_clear()
+        self.app.config['EMAIL_ASYNC_DELIVERABILITY'] = True
+        release = threading.Event()
+        dns_checks = []
+        
+        def validate(email, check_deliverability):
+            if check_deliverability:
+                dns_checks.append(email)
+                release.wait(5)
+            return mock.Mock(normalized=email)
+        
+        with mock.patch('app.auth.validate_email', side_effect=validate):
+            for _ in range(3):
+                normalize_email("a@example.org")
+            release.set()
+            auth._deliverability_executor.shutdown(wait=True)
+            auth._deliverability_executor = None
+            
+            normalize_email("a@example.org")
+        
+        self.assertEqual(dns_checks, ["a@example.org"])
+        self.assertIsNone(auth._deliverability_executor)
+    
+    def _login_faculty(self):
+        user = User.query.filter_by(email="faculty@test.com").first()
+        user.password_hash = hash_password("secret")
+        db.session.commit()
+        return login_user("faculty@test.com", "secret")
+    
+    def test_refresh_rotates_tokens(self):
+        """A refresh token gives a new access token and a new refresh token, with the same claims."""
+        result = self._login_faculty()
+        claims = jwt.decode(result["refresh_token"], options={"verify_signature": False})
+        self.assertEqual(claims["type"], "refresh")
+        
+        with mock.patch('app.routes.auth.get_jwt', return_value=claims):
+            response = self.client.post('/api/auth/refresh')
+        
+        data = json.loads(response.data)
+        self.assert_status_code(response, 200)
+        new_access = jwt.decode(data["access_token"], options={"verify_signature": False})
+        new_refresh = jwt.decode(data["refresh_token"], options={"verify_signature": False})
+        self.assertEqual(new_access["role"], "faculty")
+        self.assertNotEqual(new_refresh["jti"], claims["jti"])
+        self.assertEqual(new_refresh["family"], claims["family"])
+    
+    def test_refresh_token_reuse_revokes_family(self):
+        """Using a refresh token twice fails and invalidates the tokens issued from it."""
+        claims = jwt.decode(self._login_faculty()["refresh_token"], options={"verify_signature": False})
+        rotated = rotate_refresh_token(claims)
+        self.assertTrue(rotated["success"])
+        
+        self.assertFalse(rotate_refresh_token(claims)["success"])
+        
+        newest = jwt.decode(rotated["refresh_token"], options={"verify_signature": False})
+        self.assertFalse(rotate_refresh_token(newest)["success"])
+    
+    def test_refresh_uses_the_current_user_row(self):
+        """Refreshing picks up role changes and refuses deactivated or deleted users."""
+        claims = jwt.decode(self._login_faculty()["refresh_token"], options={"verify_signature": False})
+        user = User.query.filter_by(email="faculty@test.com").first()
+        user.role = UserRole.STUDENT
+        db.session.commit()
+        rotated = rotate_refresh_token(claims)
+        self.assertTrue(rotated["success"])
+        self.assertEqual(jwt.decode(rotated["access_token"], options={"verify_signature": False})["role"], "student")
+        
+        user.status = 'inactive'
+        db.session.commit()
+        newest = jwt.decode(rotated["refresh_token"], options={"verify_signature": False})
+        self.assertEqual(rotate_refresh_token(newest)["message"], "Account is inactive")
+        
+        user.status = 'active'
+        user.deleted_at = datetime.utcnow()
+        db.session.commit()
+        claims = jwt.decode(self._issue_faculty_refresh_token(), options={"verify_signature": False})
+        self.assertEqual(rotate_refresh_token(claims)["message"], "User not found")
+    
+    def _issue_faculty_refresh_token(self):
+        user = User.query.filter_by(email="faculty@test.com").execution_options(include_deleted=True).one()
+        token = issue_refresh_token(user.id, get_identity_claims(user))
+        db.session.commit()
+        return token
+    
+    def test_current_identity_from_claims_needs_no_query(self):
+        """With role claims, authorization data is read from the token alone."""
+        faculty_user = User.query.filter_by(email="faculty@test.com").first()
+        faculty = Faculty.query.filter_by(user_id=faculty_user.id).first()
+        self.current_user_id = faculty_user.id
+        claims = {"sub": faculty_user.id, "role": "faculty", "profile_id": faculty.id}
+        db.session.expunge_all()
+        
+        statements = []
+        def count(*args):
+            statements.append(args)
+        
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            with self.app.test_request_context(), mock.patch('app.auth.get_jwt', return_value=claims):
+                identity = current_identity()
+                self.assertEqual(len(statements), 0)
+                self.assertEqual((identity.role, identity.profile_id), (UserRole.FACULTY, faculty.id))
+                
+                # The profile is a primary key lookup, memoized for the request
+                self.assertEqual(current_profile().id, faculty.id)
+                current_profile()
+                self.assertEqual(len(statements), 1)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
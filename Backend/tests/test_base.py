@@ -12,8 +12,14 @@ from tests.config import TestConfig
 class BaseTestCase(unittest.TestCase):
     """Base test case for all tests."""
 
+    # Test case currently running. Route modules are only imported once, so they keep
+    # the mocks bound to the first test instance; the mocks read state from here instead.
+    active_test = None
+
     def setUp(self):
         """Set up test environment before each test."""
+        BaseTestCase.active_test = self
+        
         # Mock JWT-related functions before creating the app
         # Create and apply patches
         self.patches = []
@@ -63,7 +69,7 @@ class BaseTestCase(unittest.TestCase):
         
         self.role_required_mock.side_effect = mock_decorator
 
-    def _mock_jwt_required(self, optional=False):
+    def _mock_jwt_required(self, optional=False, **kwargs):
         """Mock implementation of jwt_required decorator."""
         def decorator(fn):
             return fn
@@ -71,7 +77,7 @@ class BaseTestCase(unittest.TestCase):
     
     def _mock_get_jwt_identity(self):
         """Mock implementation of get_jwt_identity."""
-        return self.current_user_id
+        return BaseTestCase.active_test.current_user_id
     
     def _mock_verify_jwt(self, optional=False):
         """Mock implementation of verify_jwt_in_request."""
@@ -79,7 +85,7 @@ class BaseTestCase(unittest.TestCase):
     
     def _mock_decode_token(self, token):
         """Mock implementation of decode_token."""
-        return {"sub": self.current_user_id}
+        return {"sub": BaseTestCase.active_test.current_user_id}
 
     def tearDown(self):
         """Clean up after each test."""
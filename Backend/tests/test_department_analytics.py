@@ -0,0 +1,186 @@
+"""
+Tests for the department analytics snapshots.
+"""
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from unittest import mock
+from app.models import (db, Course, CourseApproval, ApprovalStatus, Enrollment, Student, DepartmentAnalytics, User,
+                        UserRole, DepartmentHead)
+from app import department_analytics
+from app.department_analytics import get_department_snapshot, refresh_department, refresh_departments
+from tests.test_base import BaseTestCase
+
+
+class DepartmentAnalyticsTestCase(BaseTestCase):
+    """Test case for the precomputed department dashboard."""
+
+    def _analytics(self, department="Computer Science"):
+        response = self.client.get(f'/api/department-head/analytics?department={department}',
+                                   headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        return json.loads(response.data)['data']
+
+    def _statements(self, fn):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return statements
+
+    def test_snapshot_served_from_one_row(self):
+        """The first read computes the snapshot, later reads only fetch it."""
+        data = self._analytics()
+        self.assertEqual(data['course_statistics'], {'total_courses': 1, 'active_courses': 1, 'inactive_courses': 0})
+        self.assertEqual(data['faculty_statistics']['total_faculty'], 1)
+        self.assertEqual(data['popular_courses'][0]['course']['course_code'], "CS101")
+        self.assertIsNotNone(data['refreshed_at'])
+
+        statements = self._statements(self._analytics)
+        self.assertFalse([s for s in statements if 'FROM courses' in s or 'FROM enrollments' in s])
+        self.assertEqual(len([s for s in statements if 'department_analytics' in s]), 1)
+
+    def test_changes_mark_the_department_stale(self):
+        """Enrollments, approvals and course moves are picked up on the next read."""
+        self.assertEqual(self._analytics()['enrollment_statistics']['total_enrollments'], 0)
+        course = Course.query.filter_by(course_code="CS101").one()
+        student = Student.query.first()
+
+        db.session.add(Enrollment(student_id=student.id, course_id=course.id))
+        db.session.add(CourseApproval(course_id=course.id, requested_by=2, status=ApprovalStatus.APPROVED))
+        db.session.commit()
+        self.assertTrue(db.session.get(DepartmentAnalytics, "Computer Science").stale)
+
+        data = self._analytics()
+        self.assertEqual(data['enrollment_statistics']['total_enrollments'], 1)
+        self.assertEqual(data['approval_statistics'], {'pending': 0, 'approved': 1, 'rejected': 0})
+
+        self._analytics("Mathematics")
+        course.department = "Mathematics"
+        db.session.commit()
+        self.assertEqual(self._analytics()['course_statistics']['total_courses'], 0)
+        self.assertEqual(self._analytics("Mathematics")['enrollment_statistics']['total_enrollments'], 1)
+
+        db.session.delete(Enrollment.query.one())
+        db.session.commit()
+        self.assertTrue(db.session.get(DepartmentAnalytics, "Mathematics").stale)
+
+    def test_old_snapshots_are_recomputed(self):
+        """A snapshot past the maximum age is recomputed even if nothing marked it."""
+        snapshot = get_department_snapshot("Computer Science")
+        snapshot.refreshed_at = datetime.utcnow() - timedelta(hours=2)
+        db.session.commit()
+        snapshot = get_department_snapshot("Computer Science", max_age_seconds=3600)
+        self.assertGreater(snapshot.refreshed_at, datetime.utcnow() - timedelta(minutes=1))
+
+    def test_refresh_departments(self):
+        """The scheduled refresh covers every department with courses or faculty."""
+        self.assertEqual(refresh_departments(), 1)
+        self.assertEqual(refresh_departments(stale_only=True), 0)
+
+    def test_all_departments_in_grouped_queries(self):
+        """Every department is computed in the same few queries, with each department's top courses."""
+        student = Student.query.first()
+        for department, enrollments in (("Mathematics", [3, 0, 5, 1, 2, 4, 6]), ("Physics", [2])):
+            for i, count in enumerate(enrollments):
+                course = Course(course_code=f"{department[:4].upper()}{i}", title=f"{department} {i}",
+                                department=department, created_by=2, is_active=i % 2 == 0)
+                db.session.add(course)
+                db.session.flush()
+                db.session.add_all([Enrollment(student_id=student.id, course_id=course.id) for _ in range(count)])
+        db.session.commit()
+
+        responses = []
+        statements = self._statements(lambda: responses.append(
+            self.client.get('/api/department-head/analytics/departments', headers=self.get_auth_headers())))
+        self.assert_status_code(responses[0], 200)
+        data = json.loads(responses[0].data)['data']
+
+        self.assertEqual([d['department'] for d in data['departments']], ["Computer Science", "Mathematics", "Physics"])
+        math = data['departments'][1]
+        self.assertEqual(math['course_statistics'], {'total_courses': 7, 'active_courses': 4, 'inactive_courses': 3})
+        self.assertEqual(math['enrollment_statistics']['total_enrollments'], 21)
+        self.assertEqual([c['enrollment_count'] for c in math['popular_courses']], [6, 5, 4, 3, 2])
+        self.assertEqual(data['departments'][2]['popular_courses'][0]['course']['course_code'], "PHYS0")
+        self.assertEqual(data['totals']['total_courses'], 9)
+        self.assertEqual(data['totals']['total_enrollments'], 23)
+        self.assertLessEqual(len([s for s in statements if 'FROM courses' in s]), 6)
+
+        # Served from the snapshots until something changes
+        statements = self._statements(lambda: self.client.get('/api/department-head/analytics/departments',
+                                                              headers=self.get_auth_headers()))
+        self.assertFalse([s for s in statements if 'FROM enrollments' in s])
+
+    def test_students_are_refused(self):
+        """Only department heads and admins can read the dashboard."""
+        self.current_user_id = 3
+        response = self.client.get('/api/department-head/analytics', headers=self.get_auth_headers())
+        self.assert_status_code(response, 403)
+
+    def test_mark_during_refresh_keeps_the_snapshot_stale(self):
+        """A change that lands while a refresh is computing is not lost."""
+        get_department_snapshot("Computer Science")
+        course = Course.query.filter_by(course_code="CS101").one()
+        student = Student.query.first()
+        compute = department_analytics._compute
+
+        def compute_then_enroll(departments):
+            stats = compute(departments)
+            db.session.add(Enrollment(student_id=student.id, course_id=course.id))
+            db.session.flush()
+            return stats
+
+        db.session.get(DepartmentAnalytics, "Computer Science").stale = True
+        db.session.commit()
+        with mock.patch.object(department_analytics, '_compute', compute_then_enroll):
+            refresh_department("Computer Science")
+        self.assertTrue(db.session.get(DepartmentAnalytics, "Computer Science", populate_existing=True).stale)
+        self.assertEqual(self._analytics()['enrollment_statistics']['total_enrollments'], 1)
+
+    def _add_head(self, department):
+        head = User(email="head@test.com", password_hash="x", first_name="Dept", last_name="Head",
+                    role=UserRole.DEPARTMENT_HEAD, access_code="HEAD1")
+        db.session.add(head)
+        db.session.flush()
+        db.session.add(DepartmentHead(user_id=head.id, department=department))
+        db.session.commit()
+        self.current_user_id = head.id
+
+    def test_head_outside_computer_science_loads_the_page(self):
+        """The dashboard's request, which names no department, serves a head of any department."""
+        self._add_head("Physics")
+        response = self.client.get('/api/department-head/analytics', headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['department'], "Physics")
+        self.assertEqual(data['course_statistics']['total_courses'], 0)
+
+    def test_heads_only_see_their_department(self):
+        """Department heads get their own department and are refused any other."""
+        self._add_head("Mathematics")
+
+        response = self.client.get('/api/department-head/analytics', headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        self.assertEqual(json.loads(response.data)['data']['department'], "Mathematics")
+        self.assertEqual(self._analytics("Mathematics")['department'], "Mathematics")
+        response = self.client.get('/api/department-head/analytics?department=Computer Science',
+                                   headers=self.get_auth_headers())
+        self.assert_status_code(response, 403)
+
+    def test_heads_get_only_their_department_in_the_overview(self):
+        """The all-departments overview shows a head nothing beyond their own department."""
+        db.session.add(Course(course_code="MATH1", title="Algebra", department="Mathematics", created_by=2))
+        db.session.commit()
+        self._add_head("Mathematics")
+
+        response = self.client.get('/api/department-head/analytics/departments', headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual([d['department'] for d in data['departments']], ["Mathematics"])
+        self.assertEqual(data['totals']['total_courses'], 1)
@@ -0,0 +1,105 @@
+"""
+Tests for the notification email outbox.
+"""
+import json
+import os
+import smtplib
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+from app.models import db, User, EmailOutbox, NotificationType
+from app.email_outbox import (dispatch_pending, dispatch_all, MemoryTransport, FileTransport,
+                              SMTPTransport)
+from app.notifications import bulk_create_notifications, create_notification
+from tests.test_base import BaseTestCase
+
+
+class FailingTransport:
+    def send(self, to_address, subject, body):
+        raise smtplib.SMTPServerDisconnected("connection lost")
+
+    def close(self):
+        pass
+
+
+class EmailOutboxTestCase(BaseTestCase):
+    """Test case for the email outbox and dispatcher."""
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['EMAIL_NOTIFICATIONS_ENABLED'] = True
+        self.app.config['EMAIL_MAX_ATTEMPTS'] = 3
+        self.app.config['EMAIL_RETRY_BASE_SECONDS'] = 30
+        self.student_user = User.query.filter_by(email="student@test.com").first()
+        self.faculty_user = User.query.filter_by(email="faculty@test.com").first()
+
+    def test_notifications_queue_emails_in_same_transaction(self):
+        """Each new notification gets an outbox row, and a rollback drops both."""
+        bulk_create_notifications([self.student_user.id, self.faculty_user.id], "Exam", "Room 101",
+                                  notification_type=NotificationType.WARNING, link="/exams")
+        db.session.rollback()
+        self.assertEqual(EmailOutbox.query.count(), 0)
+
+        bulk_create_notifications([self.student_user.id, self.faculty_user.id], "Exam", "Room 101",
+                                  notification_type=NotificationType.WARNING, link="/exams")
+        db.session.commit()
+        self.assertEqual(
+            sorted(e.to_address for e in EmailOutbox.query.all()),
+            ["faculty@test.com", "student@test.com"]
+        )
+        self.assertEqual(EmailOutbox.query.first().body, "Room 101\n\n/exams")
+
+    def test_dispatch_sends_and_marks_sent(self):
+        """The dispatcher delivers due messages through the transport."""
+        create_notification(self.student_user.id, "Graded", "Your homework was graded",
+                            notification_type=NotificationType.WARNING)
+        transport = MemoryTransport()
+
+        self.assertEqual(dispatch_all(transport), (1, 0))
+        self.assertEqual(transport.sent[0]['to'], "student@test.com")
+        self.assertEqual(EmailOutbox.query.one().status, 'sent')
+        self.assertEqual(dispatch_all(transport), (0, 0))
+
+    def test_failed_sends_back_off_then_give_up(self):
+        """Failures are retried with growing delays until the attempt limit."""
+        create_notification(self.student_user.id, "Graded", "Your homework was graded",
+                            notification_type=NotificationType.WARNING)
+        now = datetime.utcnow() + timedelta(seconds=1)
+
+        self.assertEqual(dispatch_pending(FailingTransport(), now=now), (0, 1))
+        item = EmailOutbox.query.one()
+        self.assertEqual(item.next_attempt_at, now + timedelta(seconds=30))
+
+        # Not due yet
+        self.assertEqual(dispatch_pending(FailingTransport(), now=now + timedelta(seconds=10)), (0, 0))
+
+        later = now + timedelta(seconds=30)
+        dispatch_pending(FailingTransport(), now=later)
+        db.session.refresh(item)
+        self.assertEqual(item.next_attempt_at, later + timedelta(seconds=60))
+
+        dispatch_pending(FailingTransport(), now=later + timedelta(seconds=60))
+        db.session.refresh(item)
+        self.assertEqual((item.status, item.attempts), ('failed', 3))
+
+    def test_smtp_transport_reuses_connection(self):
+        """Several messages go over one SMTP connection."""
+        with mock.patch('app.email_outbox.smtplib.SMTP') as smtp:
+            transport = SMTPTransport('localhost', sender="noreply@test.com")
+            for i in range(3):
+                transport.send("student@test.com", f"Subject {i}", "Body")
+            transport.close()
+
+        smtp.assert_called_once()
+        self.assertEqual(smtp.return_value.send_message.call_count, 3)
+
+    def test_file_transport(self):
+        """The file transport writes one JSON line per message."""
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        try:
+            FileTransport(path).send("student@test.com", "Hello", "Body")
+            with open(path) as f:
+                self.assertEqual(json.loads(f.readline())['subject'], "Hello")
+        finally:
+            os.remove(path)
@@ -0,0 +1,116 @@
+"""
+Tests for the enrollment time series.
+"""
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+from app.models import db, Course, Enrollment, Student, User, UserRole, DepartmentHead
+from app import enrollment_trends
+from app.enrollment_trends import enrollment_trend, bucket_start, parse_timestamp
+from tests.test_base import BaseTestCase
+
+# A Wednesday afternoon
+NOW = datetime(2026, 10, 14, 15, 30)
+
+
+class EnrollmentTrendsTestCase(BaseTestCase):
+    """Test case for bucketed enrollment counts."""
+
+    def setUp(self):
+        super().setUp()
+        self.course = Course.query.filter_by(course_code="CS101").one()
+        student = Student.query.first()
+        for moment in (NOW - timedelta(minutes=5), NOW - timedelta(hours=1), NOW - timedelta(days=1),
+                       NOW - timedelta(days=1, hours=3), NOW - timedelta(days=8)):
+            db.session.add(Enrollment(student_id=student.id, course_id=self.course.id, enrollment_date=moment))
+        db.session.commit()
+
+    def test_buckets(self):
+        """Hours, days and weeks are counted in SQL, with empty buckets as zero."""
+        buckets, counts = enrollment_trend('day', start=NOW - timedelta(days=8), department="Computer Science",
+                                           now=NOW)
+        self.assertEqual(buckets[0], datetime(2026, 10, 6))
+        self.assertEqual(counts, [1, 0, 0, 0, 0, 0, 0, 2, 2])
+
+        buckets, counts = enrollment_trend('week', start=NOW - timedelta(days=8), course_id=self.course.id, now=NOW)
+        self.assertEqual(buckets, [datetime(2026, 10, 5), datetime(2026, 10, 12)])
+        self.assertEqual(counts, [1, 4])
+
+        buckets, counts = enrollment_trend('hour', start=NOW - timedelta(hours=2), course_id=self.course.id, now=NOW)
+        self.assertEqual(buckets[-1], bucket_start(NOW, 'hour'))
+        self.assertEqual(counts, [0, 1, 1])
+
+        self.assertEqual(enrollment_trend('day', department="Mathematics", now=NOW)[1], [0] * 30)
+
+    def test_only_new_buckets_are_queried(self):
+        """Ended buckets come from the cache; later requests only query what is new."""
+        with mock.patch.object(enrollment_trends, '_count_buckets', wraps=enrollment_trends._count_buckets) as count:
+            enrollment_trend('day', start=NOW - timedelta(days=8), course_id=self.course.id, now=NOW)
+            self.assertEqual(count.call_args_list[-1].args[1:3], (datetime(2026, 10, 6), datetime(2026, 10, 15)))
+
+            # Next day: the previous open bucket and the new one
+            db.session.add(Enrollment(student_id=1, course_id=self.course.id, enrollment_date=NOW + timedelta(days=1)))
+            db.session.commit()
+            _, counts = enrollment_trend('day', start=NOW - timedelta(days=8), course_id=self.course.id,
+                                         now=NOW + timedelta(days=1))
+            self.assertEqual(count.call_args_list[-1].args[1:3], (datetime(2026, 10, 14), datetime(2026, 10, 16)))
+            self.assertEqual(counts[-3:], [2, 2, 1])
+
+            # Further back: only the older buckets
+            enrollment_trend('day', start=NOW - timedelta(days=10), course_id=self.course.id,
+                             now=NOW + timedelta(days=1))
+            self.assertEqual(count.call_args_list[-2].args[1:3], (datetime(2026, 10, 4), datetime(2026, 10, 6)))
+
+    def test_endpoint(self):
+        """The endpoint returns labels and counts as parallel arrays."""
+        response = self.client.get(f'/api/department-head/analytics/enrollment-trends?interval=week'
+                                   f'&course_id={self.course.id}&start=2026-01-05',
+                                   headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['labels'][0], "2026-01-05")
+        self.assertEqual(len(data['labels']), len(data['counts']))
+        self.assertEqual(data['total'], 5)
+
+        response = self.client.get('/api/department-head/analytics/enrollment-trends?interval=month',
+                                   headers=self.get_auth_headers())
+        self.assert_status_code(response, 400)
+
+        response = self.client.get('/api/department-head/analytics/enrollment-trends?interval=hour&start=2000-01-01',
+                                   headers=self.get_auth_headers())
+        self.assert_status_code(response, 400)
+
+    def test_timestamps_with_an_offset_are_converted_to_utc(self):
+        """Offsets are converted to naive UTC instead of failing the comparison with now."""
+        self.assertEqual(parse_timestamp("2026-10-14T17:30:00+02:00"), datetime(2026, 10, 14, 15, 30))
+        self.assertEqual(parse_timestamp("2026-10-14"), datetime(2026, 10, 14))
+
+        response = self.client.get(f'/api/department-head/analytics/enrollment-trends?interval=week'
+                                   f'&course_id={self.course.id}&start=2026-01-05T00:00:00%2B00:00',
+                                   headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        self.assertEqual(json.loads(response.data)['data']['labels'][0], "2026-01-05")
+
+    def test_heads_only_see_their_department(self):
+        """Department heads get trends of their own department and its courses only."""
+        head = User(email="head@test.com", password_hash="x", first_name="Dept", last_name="Head",
+                    role=UserRole.DEPARTMENT_HEAD, access_code="HEAD1")
+        db.session.add(head)
+        db.session.flush()
+        db.session.add(DepartmentHead(user_id=head.id, department="Mathematics"))
+        db.session.commit()
+        self.current_user_id = head.id
+        url = '/api/department-head/analytics/enrollment-trends'
+
+        response = self.client.get(url, headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        self.assertEqual(json.loads(response.data)['data']['department'], "Mathematics")
+        self.assert_status_code(self.client.get(f'{url}?department=Computer Science',
+                                                headers=self.get_auth_headers()), 403)
+        self.assert_status_code(self.client.get(f'{url}?course_id={self.course.id}',
+                                                headers=self.get_auth_headers()), 403)
+
+        DepartmentHead.query.filter_by(user_id=head.id).update({'department': "Computer Science"})
+        db.session.commit()
+        self.assert_status_code(self.client.get(f'{url}?course_id={self.course.id}',
+                                                headers=self.get_auth_headers()), 200)
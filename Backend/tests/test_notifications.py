@@ -0,0 +1,380 @@
+"""
+Tests for notification routes.
+"""
+import json
+from datetime import datetime, timedelta
+from app.models import (db, User, UserRole, Student, Faculty, Course, FacultyCourse, Enrollment,
+                        Notification, NotificationArchive, NotificationCounter, NotificationType)
+from app.notification_stream import broadcaster
+from app.notifications import (purge_read_notifications, bulk_create_notifications, send_announcement,
+                               get_unread_count)
+from app.user_purge import soft_delete_users
+from tests.test_base import BaseTestCase
+
+
+class NotificationTestCase(BaseTestCase):
+    """Test case for notification routes."""
+
+    def setUp(self):
+        super().setUp()
+        self.course = Course.query.filter_by(course_code="CS101").first()
+        self.faculty_user = User.query.filter_by(email="faculty@test.com").first()
+        self.student_user = User.query.filter_by(email="student@test.com").first()
+        faculty = Faculty.query.filter_by(user_id=self.faculty_user.id).first()
+        student = Student.query.filter_by(user_id=self.student_user.id).first()
+        db.session.add(FacultyCourse(faculty_id=faculty.id, course_id=self.course.id, semester="Spring 2024"))
+        db.session.add(Enrollment(student_id=student.id, course_id=self.course.id))
+        db.session.commit()
+
+    def tearDown(self):
+        broadcaster.stop()
+        super().tearDown()
+
+    def _notify(self, user_id, title="Hello"):
+        notification = Notification(user_id=user_id, title=title, message="msg", type=NotificationType.INFO)
+        db.session.add(notification)
+        db.session.commit()
+        return notification
+
+    def test_course_announcement(self):
+        """Faculty can announce to the students of a course they teach."""
+        self.current_user_id = self.faculty_user.id
+        response = self.client.post('/api/notifications/announcements', json={
+            'title': 'Midterm moved',
+            'message': 'The midterm is now on Friday.',
+            'course_id': self.course.id
+        })
+        self.assert_status_code(response, 201)
+        self.assertEqual(json.loads(response.data)['recipient_count'], 1)
+
+        notification = Notification.query.one()
+        self.assertEqual(notification.user_id, self.student_user.id)
+        self.assertEqual(notification.title, 'Midterm moved')
+
+    def test_role_announcement_requires_admin(self):
+        """Only admins can announce to a whole role."""
+        self.current_user_id = self.faculty_user.id
+        response = self.client.post('/api/notifications/announcements', json={
+            'title': 'Hello', 'message': 'Everyone', 'role': 'student'
+        })
+        self.assert_status_code(response, 403)
+
+        self.current_user_id = 1  # admin
+        response = self.client.post('/api/notifications/announcements', json={
+            'title': 'Hello', 'message': 'Everyone', 'role': 'student'
+        })
+        self.assert_status_code(response, 201)
+        self.assertEqual(Notification.query.count(), User.query.filter_by(role=UserRole.STUDENT).count())
+
+    def test_department_announcement(self):
+        """A department announcement reaches its faculty and enrolled students once each."""
+        self.current_user_id = 1  # admin
+        response = self.client.post('/api/notifications/announcements', json={
+            'title': 'Welcome', 'message': 'New term', 'department': 'Computer Science'
+        })
+        self.assert_status_code(response, 201)
+        self.assertEqual(
+            sorted(n.user_id for n in Notification.query.all()),
+            sorted([self.faculty_user.id, self.student_user.id])
+        )
+
+    def test_announcements_skip_deleted_users(self):
+        """Soft-deleted users are left out of course and department announcements."""
+        soft_delete_users([self.student_user.id])
+
+        self.assertEqual(send_announcement('Hi', 'There', course_id=self.course.id), 0)
+        self.assertEqual(send_announcement('Hi', 'There', department='Computer Science'), 1)
+        self.assertEqual(Notification.query.one().user_id, self.faculty_user.id)
+
+    def test_announcement_needs_one_target(self):
+        """Announcements must name exactly one audience."""
+        self.current_user_id = 1
+        response = self.client.post('/api/notifications/announcements', json={
+            'title': 'Hello', 'message': 'Nobody'
+        })
+        self.assert_status_code(response, 400)
+
+    def test_broadcaster_fans_out_new_rows(self):
+        """One poll delivers new notifications only to the subscribed user."""
+        subscriber = broadcaster.subscribe(self.student_user.id)
+        try:
+            mine = self._notify(self.student_user.id)
+            self._notify(self.faculty_user.id)
+
+            self.assertEqual(broadcaster.poll_once(), 2)
+            event_id, message = subscriber.get_nowait()
+            self.assertEqual(event_id, mine.id)
+            self.assertIn('event: notification', message)
+            self.assertTrue(subscriber.empty())
+        finally:
+            broadcaster.unsubscribe(self.student_user.id, subscriber)
+
+    def test_broadcaster_position_is_seeded_once(self):
+        """Later subscribers keep the shared position, so earlier ones miss nothing."""
+        first = broadcaster.subscribe(self.student_user.id)
+        try:
+            mine = self._notify(self.student_user.id)
+            second = broadcaster.subscribe(self.faculty_user.id)
+            broadcaster.unsubscribe(self.faculty_user.id, second)
+
+            self.assertEqual(broadcaster.poll_once(), 1)
+            self.assertEqual(first.get_nowait()[0], mine.id)
+        finally:
+            broadcaster.unsubscribe(self.student_user.id, first)
+
+    def test_broadcaster_delivers_rows_committed_out_of_order(self):
+        """A row that commits after a higher id was seen is still delivered, once."""
+        subscriber = broadcaster.subscribe(self.student_user.id)
+        try:
+            late = self._notify(self.student_user.id, "Late")
+            late_id = late.id
+            db.session.delete(late)
+            db.session.commit()
+            early = self._notify(self.student_user.id, "Early")
+            early.id = late_id + 1
+            db.session.commit()
+
+            self.assertEqual(broadcaster.poll_once(now=0), 1)
+            self.assertEqual(subscriber.get_nowait()[0], late_id + 1)
+
+            # The transaction holding the lower id commits now
+            db.session.add(Notification(id=late_id, user_id=self.student_user.id, title="Late", message="msg",
+                                        type=NotificationType.INFO))
+            db.session.commit()
+            self.assertEqual(broadcaster.poll_once(now=1), 1)
+            self.assertEqual(subscriber.get_nowait()[0], late_id)
+            self.assertEqual(broadcaster.poll_once(now=2), 0)
+            self.assertTrue(subscriber.empty())
+        finally:
+            broadcaster.unsubscribe(self.student_user.id, subscriber)
+
+    def test_broadcaster_gives_up_on_old_gaps(self):
+        """Ids that never show up stop being looked up after the gap timeout."""
+        subscriber = broadcaster.subscribe(self.student_user.id)
+        try:
+            skipped = self._notify(self.student_user.id)
+            db.session.delete(skipped)
+            db.session.commit()
+            self._notify(self.student_user.id).id = skipped.id + 1
+            db.session.commit()
+
+            broadcaster.poll_once(now=0)
+            self.assertEqual(list(broadcaster._gaps), [skipped.id])
+            broadcaster.poll_once(now=broadcaster.gap_seconds + 1)
+            self.assertEqual(broadcaster._gaps, {})
+        finally:
+            broadcaster.unsubscribe(self.student_user.id, subscriber)
+
+    def test_broadcaster_sends_counts_changed_elsewhere(self):
+        """Unread counts changed by another process reach this process's tabs on the next poll."""
+        get_unread_count(self.student_user.id)
+        subscriber = broadcaster.subscribe(self.student_user.id)
+        try:
+            broadcaster.poll_once()
+            self.assertTrue(subscriber.empty())
+
+            db.session.query(NotificationCounter).filter_by(user_id=self.student_user.id).update({'unread_count': 3})
+            db.session.commit()
+            broadcaster.poll_once()
+            event_id, message = subscriber.get_nowait()
+            self.assertIsNone(event_id)
+            self.assertIn('"unread_count": 3', message)
+            broadcaster.poll_once()
+            self.assertTrue(subscriber.empty())
+        finally:
+            broadcaster.unsubscribe(self.student_user.id, subscriber)
+
+    def test_stream_replays_missed_notifications(self):
+        """Reconnecting with Last-Event-ID replays notifications after that id."""
+        first = self._notify(self.student_user.id, "First")
+        second = self._notify(self.student_user.id, "Second")
+
+        self.current_user_id = self.student_user.id
+        response = self.client.get('/api/notifications/stream', headers={'Last-Event-ID': str(first.id)})
+        self.assertEqual(response.mimetype, 'text/event-stream')
+
+        chunks = iter(response.response)
+        self.assertTrue(next(chunks).startswith(b'retry:'))
+        replayed = next(chunks).decode('utf-8')
+        self.assertIn(f'id: {second.id}', replayed)
+        self.assertIn('Second', replayed)
+        response.close()
+        self.assertEqual(broadcaster.subscriber_count(), 0)
+
+
+    def _unread_count(self):
+        response = self.client.get('/api/notifications/notifications/unread-count')
+        self.assert_status_code(response, 200)
+        return json.loads(response.data)['unread_count']
+
+    def test_unread_counter_tracks_writes(self):
+        """The counter follows inserts, mark read, delete and mark all read."""
+        # Rows written before the counter existed are picked up on first use
+        existing = self._notify(self.student_user.id)
+        self.current_user_id = self.student_user.id
+        self.assertEqual(self._unread_count(), 1)
+
+        response = self.client.post('/api/notifications/notifications', json={
+            'user_id': self.student_user.id, 'title': 'New', 'message': 'msg', 'type': 'info'
+        })
+        self.assert_status_code(response, 201)
+        created_id = json.loads(response.data)['id']
+        self.assertEqual(self._unread_count(), 2)
+
+        self.assert_status_code(self.client.put(f'/api/notifications/{existing.id}/read'), 200)
+        self.assertEqual(self._unread_count(), 1)
+        # Marking an already read notification doesn't change the count
+        self.assert_status_code(self.client.put(f'/api/notifications/{existing.id}/read'), 200)
+        self.assertEqual(self._unread_count(), 1)
+
+        self.assert_status_code(self.client.delete(f'/api/notifications/notifications/{created_id}'), 200)
+        self.assertEqual(self._unread_count(), 0)
+
+        self.client.post('/api/notifications/notifications', json={
+            'user_id': self.student_user.id, 'title': 'Another', 'message': 'msg', 'type': 'warning'
+        })
+        self.assert_status_code(self.client.put('/api/notifications/mark-all-read'), 200)
+        self.assertEqual(self._unread_count(), 0)
+
+    def test_announcement_updates_counters(self):
+        """Bulk fanout increments each recipient's counter."""
+        self._notify(self.student_user.id)
+        self.current_user_id = self.faculty_user.id
+        self.client.post('/api/notifications/announcements', json={
+            'title': 'Quiz', 'message': 'Tomorrow', 'course_id': self.course.id
+        })
+
+        self.current_user_id = self.student_user.id
+        self.assertEqual(self._unread_count(), 2)
+
+    def test_rebuild_unread_counters(self):
+        """Rebuilding recomputes counters from the notifications table."""
+        self.current_user_id = self.student_user.id
+        self._notify(self.student_user.id)
+        self.assertEqual(self._unread_count(), 1)
+        # A row written behind the counter's back is picked up by a rebuild
+        self._notify(self.student_user.id)
+        self.assertEqual(self._unread_count(), 1)
+
+        self.current_user_id = self.student_user.id
+        self.assert_status_code(self.client.post('/api/notifications/notifications/unread-count/rebuild'), 403)
+
+        self.current_user_id = 1  # admin
+        response = self.client.post('/api/notifications/notifications/unread-count/rebuild')
+        self.assert_status_code(response, 200)
+
+        self.current_user_id = self.student_user.id
+        self.assertEqual(self._unread_count(), 2)
+
+    def test_cursor_pagination(self):
+        """Pages follow next_before_id until the last page."""
+        created = [self._notify(self.student_user.id, f"N{i}") for i in range(5)]
+
+        self.current_user_id = self.student_user.id
+        seen = []
+        before_id = None
+        while True:
+            url = '/api/notifications/?limit=2' + (f'&before_id={before_id}' if before_id else '')
+            data = json.loads(self.client.get(url).data)
+            seen.extend(n['id'] for n in data['notifications'])
+            before_id = data['next_before_id']
+            if before_id is None:
+                break
+
+        self.assertEqual(seen, [n.id for n in reversed(created)])
+
+    def test_purge_read_notifications(self):
+        """Only read notifications past the retention age are removed, in batches."""
+        old = datetime.utcnow() - timedelta(days=120)
+        for i in range(5):
+            notification = self._notify(self.student_user.id, f"Old {i}")
+            notification.created_at = old
+            notification.read = True
+        unread_old = self._notify(self.student_user.id, "Old unread")
+        unread_old.created_at = old
+        recent_read = self._notify(self.student_user.id, "Recent")
+        recent_read.read = True
+        db.session.commit()
+
+        removed = purge_read_notifications(90, archive=True, batch_size=2)
+
+        self.assertEqual(removed, 5)
+        self.assertEqual(NotificationArchive.query.count(), 5)
+        self.assertEqual(
+            sorted(n.title for n in Notification.query.all()),
+            ["Old unread", "Recent"]
+        )
+
+    def test_digest_folds_same_type_and_link(self):
+        """Bursts of the same type and link become one row with a count."""
+        self.app.config['NOTIFICATION_DIGEST_WINDOWS'] = {'success': 300}
+        for i in range(3):
+            bulk_create_notifications([self.student_user.id], f"Submission {i}", "New submission",
+                                      notification_type=NotificationType.SUCCESS, link="/assignments/1")
+        bulk_create_notifications([self.student_user.id], "Other", "Another assignment",
+                                  notification_type=NotificationType.SUCCESS, link="/assignments/2")
+        db.session.commit()
+
+        rows = Notification.query.filter_by(user_id=self.student_user.id).order_by(Notification.id).all()
+        self.assertEqual([(n.link, n.count) for n in rows], [("/assignments/1", 3), ("/assignments/2", 1)])
+        self.assertEqual(rows[0].title, "Submission 2")
+
+        self.current_user_id = self.student_user.id
+        data = json.loads(self.client.get('/api/notifications/notifications/unread-count').data)
+        self.assertEqual(data['unread_count'], 2)
+
+    def test_digest_respects_type_config_and_read_state(self):
+        """Types without a window, and digests already read, get new rows."""
+        self.app.config['NOTIFICATION_DIGEST_WINDOWS'] = {'success': 300}
+        for _ in range(2):
+            bulk_create_notifications([self.student_user.id], "Warning", "Careful",
+                                      notification_type=NotificationType.WARNING, link="/x")
+        bulk_create_notifications([self.student_user.id], "Done", "Saved",
+                                  notification_type=NotificationType.SUCCESS, link="/y")
+        db.session.commit()
+        Notification.query.filter_by(link="/y").update({'read': True})
+        db.session.commit()
+        bulk_create_notifications([self.student_user.id], "Done", "Saved again",
+                                  notification_type=NotificationType.SUCCESS, link="/y")
+        db.session.commit()
+
+        self.assertEqual(Notification.query.filter_by(link="/x").count(), 2)
+        self.assertEqual(Notification.query.filter_by(link="/y").count(), 2)
+
+    def test_digests_are_opt_in_and_skip_announcements(self):
+        """Nothing is digested by default, and announcements never are."""
+        for i in range(2):
+            bulk_create_notifications([self.student_user.id], f"Info {i}", "Update", link="/z")
+        db.session.commit()
+        self.assertEqual(Notification.query.filter_by(link="/z").count(), 2)
+
+        self.app.config['NOTIFICATION_DIGEST_WINDOWS'] = {'info': 300}
+        for title in ("Midterm moved", "Room changed"):
+            send_announcement(title, "Details", course_id=self.course.id, link="/courses/1")
+        self.assertEqual([n.title for n in Notification.query.filter_by(link="/courses/1").order_by(Notification.id)],
+                         ["Midterm moved", "Room changed"])
+
+    def test_folded_digest_reaches_the_stream(self):
+        """A fold rewrites the digest under a new id, which the broadcaster delivers."""
+        self.app.config['NOTIFICATION_DIGEST_WINDOWS'] = {'success': 300}
+        bulk_create_notifications([self.student_user.id], "Submission 0", "New submission",
+                                  notification_type=NotificationType.SUCCESS, link="/assignments/1")
+        db.session.commit()
+        first = Notification.query.one()
+        first_id, opened_at = first.id, first.created_at
+
+        subscriber = broadcaster.subscribe(self.student_user.id)
+        try:
+            bulk_create_notifications([self.student_user.id], "Submission 1", "New submission",
+                                      notification_type=NotificationType.SUCCESS, link="/assignments/1")
+            db.session.commit()
+            self.assertEqual(broadcaster.poll_once(), 1)
+            event_id, message = subscriber.get_nowait()
+        finally:
+            broadcaster.unsubscribe(self.student_user.id, subscriber)
+
+        digest = Notification.query.one()
+        self.assertGreater(digest.id, first_id)
+        self.assertEqual(event_id, digest.id)
+        self.assertEqual((digest.count, digest.title, digest.created_at), (2, "Submission 1", opened_at))
+        self.assertIn('"count": 2', message)
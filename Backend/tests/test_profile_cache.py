@@ -0,0 +1,61 @@
+"""
+Tests for the cached /api/users/me response.
+"""
+import json
+from sqlalchemy import event
+from app.models import db
+from tests.test_base import BaseTestCase
+
+
+class ProfileCacheTestCase(BaseTestCase):
+    """Test case for /me loading, caching and ETags."""
+
+    def setUp(self):
+        super().setUp()
+        self.current_user_id = 3  # student
+
+    def _count_queries(self, fn):
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            return fn(), statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    def test_user_and_profile_in_one_query_then_cached(self):
+        """The first request runs one query; repeats are served from the cache."""
+        response, statements = self._count_queries(lambda: self.client.get('/api/users/me'))
+        self.assert_status_code(response, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data["user"]["email"], "student@test.com")
+        self.assertIsNotNone(data["profile"]["student_id"])
+        self.assertEqual(len([s for s in statements if 'FROM users' in s]), 1)
+
+        response, statements = self._count_queries(lambda: self.client.get('/api/users/me'))
+        self.assert_status_code(response, 200)
+        self.assertEqual([s for s in statements if 'FROM users' in s], [])
+
+    def test_etag_returns_304_until_profile_changes(self):
+        """If-None-Match with the current ETag gets a 304; an update changes the ETag."""
+        etag = self.client.get('/api/users/me').headers['ETag']
+        response = self.client.get('/api/users/me', headers={'If-None-Match': etag})
+        self.assert_status_code(response, 304)
+        self.assertEqual(response.data, b'')
+
+        response = self.client.put('/api/users/me', json={"first_name": "Renamed"})
+        self.assert_status_code(response, 200)
+
+        response = self.client.get('/api/users/me', headers={'If-None-Match': etag})
+        self.assert_status_code(response, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(json.loads(response.data)["user"]["first_name"], "Renamed")
+
+    def test_admin_update_invalidates(self):
+        """An admin changing the user clears their cached profile."""
+        self.client.get('/api/users/me')
+        self.current_user_id = 1
+        self.client.put('/api/users/3', json={"last_name": "Changed"})
+        self.current_user_id = 3
+        self.assertEqual(json.loads(self.client.get('/api/users/me').data)["user"]["last_name"], "Changed")
@@ -0,0 +1,103 @@
+"""
+Tests for bulk user provisioning from CSV.
+"""
+import csv
+import io
+import bcrypt
+from app.models import User, Student, Faculty, UserRole
+from app import provisioning
+from app.provisioning import provision_users, hash_passwords
+from tests.test_base import BaseTestCase
+
+CSV_HEADER = "email,first_name,last_name,role,student_id,program,year_level,department\n"
+
+
+class ProvisioningTestCase(BaseTestCase):
+    """Test case for bulk provisioning."""
+
+    def _provision(self, body, **kwargs):
+        report = io.StringIO()
+        counts = provision_users(io.StringIO(CSV_HEADER + body), report, **kwargs)
+        return counts, list(csv.DictReader(io.StringIO(report.getvalue())))
+
+    def test_creates_users_profiles_and_report(self):
+        """Users and profiles are created in batches and each gets credentials."""
+        body = "".join(f"new{i}@school.edu,New,Student{i},student,NS{i},Physics,1,\n" for i in range(7))
+        body += "prof@school.edu,Pat,Prof,faculty,,,,Physics\n"
+        counts, report = self._provision(body, batch_size=3, processes=1)
+
+        self.assertEqual(counts, {'created': 8, 'skipped': 0, 'failed': 0})
+        self.assertEqual(Student.query.filter(Student.student_id.like('NS%')).count(), 7)
+        faculty = Faculty.query.join(User).filter(User.email == "prof@school.edu").one()
+        self.assertEqual(faculty.department, "Physics")
+
+        row = report[0]
+        user = User.query.filter_by(email="new0@school.edu").one()
+        self.assertEqual((row['line'], row['access_code']), ('2', user.access_code))
+        self.assertTrue(bcrypt.checkpw(row['temporary_password'].encode(), user.password_hash.encode()))
+        self.assertEqual(len({r['access_code'] for r in report}), 8)
+
+    def test_invalid_and_duplicate_rows_are_skipped(self):
+        """Bad rows are reported with a reason and do not stop the rest."""
+        body = ("student@test.com,Already,There,student,,,,\n"
+                "dup@school.edu,Dup,One,student,,,,\n"
+                "dup@school.edu,Dup,Two,student,,,,\n"
+                "bad@school.edu,Bad,Role,wizard,,,,\n"
+                "noname@school.edu,,Missing,student,,,,\n"
+                "ok@school.edu,Ok,Row,admin,,,,\n")
+        counts, report = self._provision(body, processes=1)
+
+        self.assertEqual(counts, {'created': 2, 'skipped': 4, 'failed': 0})
+        self.assertEqual([r['result'] for r in report],
+                         ['skipped', 'created', 'skipped', 'skipped', 'skipped', 'created'])
+        self.assertEqual(report[0]['error'], "Email already in use")
+        self.assertEqual(User.query.filter_by(email="ok@school.edu").one().role, UserRole.ADMIN)
+
+    def test_missing_columns_rejected(self):
+        with self.assertRaises(ValueError):
+            provision_users(io.StringIO("email,role\na@b.com,student\n"), io.StringIO())
+
+    def test_hash_passwords_in_process_pool(self):
+        """Hashes from the pool come back in input order."""
+        passwords = [f"pw{i}" for i in range(5)]
+        try:
+            pool, workers = provisioning._get_pool(2)
+            hashes = hash_passwords(passwords, 4, pool, workers)
+            # Every upload shares the one pool
+            self.assertIs(provisioning._get_pool(4)[0], pool)
+        finally:
+            provisioning.shutdown_pool()
+        for password, hashed in zip(passwords, hashes):
+            self.assertTrue(bcrypt.checkpw(password.encode(), hashed.encode()))
+
+    def test_generated_ids_avoid_explicit_ones(self):
+        """A generated STU id that another row or an existing student already has gets a suffix."""
+        next_id = User.query.order_by(User.id.desc()).first().id + 1
+        generated = f"STU{next_id:04d}"
+        body = (f"gen@school.edu,Gen,Erated,student,,,,\n"
+                f"explicit@school.edu,Ex,Plicit,student,{generated},,,\n")
+        counts, _ = self._provision(body, processes=1)
+
+        self.assertEqual(counts, {'created': 2, 'skipped': 0, 'failed': 0})
+        student = Student.query.join(User).filter(User.email == "gen@school.edu").one()
+        self.assertEqual(student.student_id, f"{generated}-1")
+
+        # Same again with the clashing id already in the database
+        next_id = User.query.order_by(User.id.desc()).first().id + 1
+        Student.query.join(User).filter(User.email == "explicit@school.edu").one().student_id = f"STU{next_id:04d}"
+        counts, _ = self._provision("late@school.edu,La,Te,student,,,,\n", processes=1)
+        self.assertEqual(counts['created'], 1)
+        student = Student.query.join(User).filter(User.email == "late@school.edu").one()
+        self.assertEqual(student.student_id, f"STU{next_id:04d}-1")
+
+    def test_bulk_endpoint_returns_credentials_csv(self):
+        """The endpoint takes an upload and answers with the report as a download."""
+        data = {'file': (io.BytesIO((CSV_HEADER + "up@school.edu,Up,Load,student,,,,\n").encode()), 'users.csv')}
+        response = self.client.post('/api/users/bulk', data=data, content_type='multipart/form-data',
+                                    headers=self.get_auth_headers())
+
+        self.assert_status_code(response, 200)
+        self.assertEqual(response.headers['X-Users-Created'], '1')
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        report = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(report[0]['access_code'], User.query.filter_by(email="up@school.edu").one().access_code)
@@ -0,0 +1,112 @@
+"""
+Tests for login rate limiting.
+"""
+import json
+import os
+import tempfile
+from unittest import mock
+from app.rate_limit import MemoryStore, SQLiteStore, RateLimiter, LoginGuard
+from tests.test_base import BaseTestCase
+
+
+class RateLimitTestCase(BaseTestCase):
+    """Test case for the sliding-window limiter and the login guard."""
+
+    def test_sliding_window_weights_previous_window(self):
+        """Hits from the previous window count in proportion to their overlap."""
+        limiter = RateLimiter(MemoryStore(), 'test', limit=10, window=60)
+        for _ in range(10):
+            self.assertIsNone(limiter.hit('ip', now=1000 * 60 + 50))
+        self.assertIsNotNone(limiter.hit('ip', now=1000 * 60 + 55))
+
+        # 30s into the next window, half of the previous 11 hits still count
+        self.assertIsNone(limiter.hit('ip', now=1001 * 60 + 30))
+        self.assertIsNone(limiter.peek('ip', now=1001 * 60 + 30))
+        for _ in range(3):
+            limiter.hit('ip', now=1001 * 60 + 30)
+        self.assertIsNotNone(limiter.hit('ip', now=1001 * 60 + 30))
+
+        # Two windows later nothing is left
+        self.assertIsNone(limiter.hit('ip', now=1003 * 60))
+
+    def test_sqlite_store_is_shared(self):
+        """Two stores on the same file see each other's hits, as two workers would."""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            first = RateLimiter(SQLiteStore(path), 'test', limit=3, window=60)
+            second = RateLimiter(SQLiteStore(path), 'test', limit=3, window=60)
+            first.hit('ip', now=600)
+            first.hit('ip', now=600)
+            second.hit('ip', now=600)
+            self.assertIsNotNone(second.hit('ip', now=600))
+            first.reset('ip')
+            self.assertIsNone(second.hit('ip', now=600))
+        finally:
+            os.remove(path)
+
+    def test_memory_store_prunes_each_key_by_its_own_window(self):
+        """Short-window hits don't drop long-window counters, and pruning is amortized."""
+        store = MemoryStore()
+        store.PRUNE_THRESHOLD = 3
+        email = RateLimiter(store, 'login-email', limit=2, window=900)
+        ip = RateLimiter(store, 'login-ip', limit=100, window=60)
+        email.hit('user@test.com', now=900)
+        email.hit('user@test.com', now=900)
+        for i in range(5):
+            ip.hit(f'10.0.0.{i}', now=1000)
+        # Past the IP windows, within the email one
+        with mock.patch.object(store, '_prune', wraps=store._prune) as prune:
+            for i in range(5):
+                ip.hit(f'10.0.1.{i}', now=1200)
+        self.assertEqual(prune.call_count, 1)
+        self.assertNotIn('login-ip:10.0.0.0', store._counters)
+        self.assertIsNotNone(email.peek('user@test.com', now=1200))
+
+    def test_sqlite_store_deletes_expired_rows(self):
+        """The shared file doesn't keep keys whose windows are over."""
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            store = SQLiteStore(path)
+            RateLimiter(store, 'test', limit=3, window=60).hit('old', now=600)
+            RateLimiter(store, 'test', limit=3, window=60).hit('new', now=6000)
+            keys = [key for (key,) in store._connection().execute("SELECT key FROM rate_limits")]
+            self.assertEqual(keys, ['test:new'])
+        finally:
+            os.remove(path)
+
+    def test_failed_logins_lock_out_email_before_password_check(self):
+        """After too many failures the email is rejected without calling login_user."""
+        self.app.extensions['login_guard'] = LoginGuard(MemoryStore(), {'LOGIN_EMAIL_FAILURE_LIMIT': 2})
+        failure = {"success": False, "message": "Invalid email or password"}
+
+        with mock.patch('app.routes.auth.login_user', return_value=failure) as login:
+            for _ in range(2):
+                response = self.client.post('/api/auth/login', json={"email": "student@test.com", "password": "x"})
+                self.assert_status_code(response, 401)
+            response = self.client.post('/api/auth/login', json={"email": "Student@test.com ", "password": "x"})
+
+        self.assert_status_code(response, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(login.call_count, 2)
+
+        self.current_user_id = 1  # admin
+        metrics = json.loads(self.client.get('/api/auth/rate-limit/metrics').data)['metrics']
+        self.assertEqual(metrics['login_rejected_email'], 1)
+        self.assertEqual(metrics['login_failed'], 2)
+
+    def test_check_user_limited_per_ip(self):
+        """User lookups from one IP are limited."""
+        self.app.extensions['login_guard'] = LoginGuard(MemoryStore(), {'CHECK_USER_IP_LIMIT': 1})
+        self.assert_status_code(self.client.post('/api/auth/check-user', json={"email": "admin@test.com"}), 200)
+        self.assert_status_code(self.client.post('/api/auth/check-user', json={"email": "admin@test.com"}), 429)
+
+    def test_guard_created_on_first_use(self):
+        """Apps that never called init_login_guard() get a guard on the first login."""
+        self.app.extensions.pop('login_guard')
+        failure = {"success": False, "message": "Invalid email or password"}
+        with mock.patch('app.routes.auth.login_user', return_value=failure):
+            response = self.client.post('/api/auth/login', json={"email": "student@test.com", "password": "x"})
+        self.assert_status_code(response, 401)
+        self.assertIsInstance(self.app.extensions['login_guard'], LoginGuard)
@@ -0,0 +1,103 @@
+"""
+Tests for assignment deadline reminders.
+"""
+from datetime import datetime, timedelta
+from app.models import (db, User, UserRole, Student, Course, Enrollment, Assignment,
+                        AssignmentSubmission, AssignmentReminder, Notification)
+from app.reminders import send_due_reminders, get_pending_recipients
+from app.user_purge import soft_delete_users
+from tests.test_base import BaseTestCase
+
+
+class ReminderTestCase(BaseTestCase):
+    """Test case for the reminder scheduler."""
+
+    def setUp(self):
+        super().setUp()
+        self.now = datetime(2024, 3, 1, 12, 0, 0)
+        self.course = Course.query.filter_by(course_code="CS101").first()
+        self.student = Student.query.filter_by(student_id="STU001").first()
+
+        # Second student who will submit
+        other_user = User(
+            email="other@test.com",
+            password_hash="hash",
+            first_name="Other",
+            last_name="Student",
+            role=UserRole.STUDENT,
+            access_code="OTHER123"
+        )
+        db.session.add(other_user)
+        db.session.commit()
+        self.other_student = Student(user_id=other_user.id, student_id="STU002")
+        db.session.add(self.other_student)
+        db.session.commit()
+
+        for student in (self.student, self.other_student):
+            db.session.add(Enrollment(student_id=student.id, course_id=self.course.id))
+        db.session.commit()
+
+    def _add_assignment(self, hours_until_due):
+        assignment = Assignment(
+            title="Homework",
+            course_id=self.course.id,
+            due_date=self.now + timedelta(hours=hours_until_due)
+        )
+        db.session.add(assignment)
+        db.session.commit()
+        return assignment
+
+    def _submit(self, assignment, student):
+        db.session.add(AssignmentSubmission(
+            assignment_id=assignment.id,
+            student_id=student.id,
+            file_name="hw.pdf",
+            file_path="fake_uploads/hw.pdf",
+            file_size=10,
+            file_type="pdf"
+        ))
+        db.session.commit()
+
+    def test_pending_recipients_excludes_submitted(self):
+        """Only students without a submission are recipients."""
+        assignment = self._add_assignment(24)
+        self._submit(assignment, self.other_student)
+
+        recipients = get_pending_recipients(assignment)
+        self.assertEqual(recipients, [self.student.user_id])
+
+    def test_pending_recipients_skip_deleted_students(self):
+        """Soft-deleted students get no reminders."""
+        assignment = self._add_assignment(24)
+        soft_delete_users([self.other_student.user_id])
+
+        self.assertEqual(get_pending_recipients(assignment), [self.student.user_id])
+
+    def test_reminder_fires_once(self):
+        """A reminder for an (assignment, offset) pair is only sent once."""
+        assignment = self._add_assignment(24)
+
+        sent = send_due_reminders(offsets=[48, 2], now=self.now)
+        self.assertEqual(sent, [{'assignment_id': assignment.id, 'offset_hours': 48, 'recipient_count': 2}])
+        self.assertEqual(Notification.query.count(), 2)
+
+        # Running again (e.g. after a restart or from another worker) sends nothing
+        self.assertEqual(send_due_reminders(offsets=[48, 2], now=self.now), [])
+        self.assertEqual(Notification.query.count(), 2)
+        self.assertEqual(AssignmentReminder.query.count(), 1)
+
+    def test_only_closest_offset_fires(self):
+        """An assignment already inside the smallest window only gets that reminder."""
+        assignment = self._add_assignment(1)
+
+        sent = send_due_reminders(offsets=[48, 2], now=self.now)
+        self.assertEqual([s['offset_hours'] for s in sent], [2])
+        self.assertEqual(AssignmentReminder.query.filter_by(assignment_id=assignment.id).count(), 1)
+
+    def test_past_and_far_assignments_ignored(self):
+        """Assignments already due or outside every window are skipped."""
+        self._add_assignment(-1)
+        self._add_assignment(72)
+
+        self.assertEqual(send_due_reminders(offsets=[48, 2], now=self.now), [])
+        self.assertEqual(Notification.query.count(), 0)
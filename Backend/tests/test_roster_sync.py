@@ -0,0 +1,126 @@
+"""
+Tests for the SIS roster sync.
+"""
+import io
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+from app.models import db, User, Student, Faculty, RosterStaging, UserRole, AllocationCounter, RefreshToken
+from app.auth import login_user
+from app.roster_sync import sync_roster
+from tests.test_base import BaseTestCase
+
+HEADER = "email,first_name,last_name,role,sis_id,program,year_level,department,position\n"
+
+
+class RosterSyncTestCase(BaseTestCase):
+    """Test case for the diff-based roster sync."""
+
+    def setUp(self):
+        super().setUp()
+        self.student = Student.query.join(User).filter(User.email == "student@test.com").one()
+        self.faculty = Faculty.query.join(User).filter(User.email == "faculty@test.com").one()
+
+    def _roster(self, extra="", student_program=None, faculty_position=None):
+        student = self.student
+        faculty = self.faculty
+        return io.StringIO(
+            HEADER
+            + f"Student@Test.com,{student.user.first_name},{student.user.last_name},student,{student.student_id},"
+              f"{student_program or student.program or ''},{student.year_level or ''},,\n"
+            + f"faculty@test.com,{faculty.user.first_name},{faculty.user.last_name},faculty,{faculty.faculty_id},,,"
+              f"{faculty.department or ''},{faculty_position or faculty.position or ''}\n"
+            + extra
+        )
+
+    def test_unchanged_roster_touches_nothing(self):
+        """Syncing the current state writes no user or profile rows."""
+        counts = sync_roster(self._roster())
+        self.assertEqual(counts['created'] + counts['updated'] + counts['profiles_updated'], 0)
+        self.assertEqual((counts['deactivated'], counts['reactivated']), (0, 0))
+        self.assertEqual(RosterStaging.query.count(), 0)
+
+    def test_inserts_updates_and_deactivates(self):
+        """New people are created, changes applied and missing people deactivated."""
+        other = User(email="gone@test.com", password_hash="x", first_name="Gone", last_name="Student",
+                     role=UserRole.STUDENT, access_code="GONE1")
+        db.session.add(other)
+        db.session.commit()
+
+        extra = ("new.student@test.com,New,Student,student,S-900,Biology,1,,\n"
+                 "new.prof@test.com,New,Prof,faculty,F-900,,,Biology,Lecturer\n"
+                 "admin@test.com,Admin,User,student,,,,,\n")
+        counts = sync_roster(self._roster(extra, student_program="Mathematics", faculty_position="Dean"))
+
+        self.assertEqual(counts['created'], 2)
+        self.assertEqual(counts['profiles_updated'], 2)
+        self.assertEqual(counts['deactivated'], 1)
+        self.assertEqual(counts['conflicts'], 1)
+
+        new_user = User.query.filter_by(email="new.student@test.com").one()
+        self.assertEqual((new_user.status, new_user.password_hash), ('pending', 'NEEDS_SETUP'))
+        self.assertEqual(Student.query.filter_by(user_id=new_user.id).one().student_id, "S-900")
+        db.session.expire_all()
+        self.assertEqual(self.student.program, "Mathematics")
+        self.assertEqual(self.faculty.position, "Dean")
+        self.assertEqual(db.session.get(User, other.id).status, 'inactive')
+        self.assertEqual(User.query.filter_by(email="admin@test.com").one().role, UserRole.ADMIN)
+
+        # Back on the roster: reactivated
+        counts = sync_roster(self._roster("gone@test.com,Gone,Student,student,,,,,\n"))
+        self.assertEqual(counts['reactivated'], 1)
+        self.assertEqual(db.session.get(User, other.id).status, 'active')
+
+    def test_dry_run_changes_nothing(self):
+        """A dry run reports the changes and rolls them back, without staging rows or allocating codes."""
+        with mock.patch('app.roster_sync.allocate_access_codes') as allocate, \
+                mock.patch.object(db.session, 'commit', wraps=db.session.commit) as commit:
+            counts = sync_roster(self._roster("dry@test.com,Dry,Run,student,,,,,\n"), dry_run=True)
+        self.assertEqual(counts['created'], 1)
+        allocate.assert_not_called()
+        # Only the final commit, after everything was rolled back
+        self.assertEqual(commit.call_count, 1)
+        self.assertIsNone(User.query.filter_by(email="dry@test.com").first())
+        self.assertEqual(RosterStaging.query.count(), 0)
+        self.assertIsNone(db.session.get(AllocationCounter, 'access_code'))
+
+    def test_only_deactivated_users_lose_their_sessions(self):
+        """Sessions are revoked for the people this sync deactivates, not everyone already inactive."""
+        gone = User(email="gone@test.com", password_hash="x", first_name="Gone", last_name="Student",
+                    role=UserRole.STUDENT, access_code="GONE1")
+        away = User(email="away@test.com", password_hash="x", first_name="Away", last_name="Student",
+                    role=UserRole.STUDENT, access_code="AWAY1", status='inactive')
+        db.session.add_all([gone, away])
+        db.session.flush()
+        db.session.add_all([RefreshToken(jti=f"rt-{user.id}", user_id=user.id, family_id=f"f-{user.id}",
+                                         expires_at=datetime.utcnow() + timedelta(days=1)) for user in (gone, away)])
+        db.session.commit()
+
+        self.assertEqual(sync_roster(self._roster())['deactivated'], 1)
+        self.assertIsNotNone(db.session.get(RefreshToken, f"rt-{gone.id}").revoked_at)
+        self.assertIsNone(db.session.get(RefreshToken, f"rt-{away.id}").revoked_at)
+
+    def test_missing_role_deactivates_nobody(self):
+        """A feed without faculty rows leaves faculty alone."""
+        roster = io.StringIO(HEADER + "student@test.com,Student,User,student,,,,,\n")
+        counts = sync_roster(roster)
+        self.assertEqual(counts['deactivated'], 0)
+        self.assertEqual(User.query.filter_by(email="faculty@test.com").one().status, 'active')
+
+    def test_inactive_user_cannot_log_in(self):
+        """Deactivated users are refused at login."""
+        user = User.query.filter_by(email="student@test.com").one()
+        user.status = 'inactive'
+        db.session.commit()
+        with self.app.test_request_context(), mock.patch('app.auth.verify_password', return_value=True):
+            result = login_user("student@test.com", "password123")
+        self.assertEqual(result, {"success": False, "message": "Account is inactive"})
+
+    def test_sync_endpoint(self):
+        """The endpoint syncs an uploaded roster and returns the counts."""
+        data = {'file': (io.BytesIO(self._roster("api@test.com,Api,User,student,,,,,\n").getvalue().encode()),
+                         'roster.csv')}
+        response = self.client.post('/api/users/roster-sync', data=data, content_type='multipart/form-data',
+                                    headers=self.get_auth_headers())
+        self.assert_status_code(response, 200)
+        self.assertEqual(json.loads(response.data)['counts']['created'], 1)
@@ -0,0 +1,137 @@
+"""
+Tests for the JWT revocation blocklist.
+"""
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
+from sqlalchemy import event
+from app.auth import issue_refresh_token, rotate_refresh_token, revoke_user_sessions
+from app.models import db, RevokedToken, RefreshToken
+from app.token_blocklist import BloomFilter, TokenBlocklist, token_blocklist, purge_expired_revocations
+from tests.test_base import BaseTestCase
+
+
+class TokenBlocklistTestCase(BaseTestCase):
+    """Test case for the revocation blocklist."""
+
+    def _revoke_elsewhere(self, jti, expires_at=None):
+        """Revoke a token the way another worker would: only in the table"""
+        db.session.add(RevokedToken(jti=jti, expires_at=expires_at or datetime.utcnow() + timedelta(hours=1)))
+        db.session.commit()
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Every added key is found, and few others are."""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        keys = [str(uuid.uuid4()) for _ in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(2000))
+        self.assertLess(false_positives, 100)
+
+    def test_valid_token_check_needs_no_query(self):
+        """Between refreshes, checking a token does not touch the database."""
+        blocklist = TokenBlocklist(capacity=100, refresh_seconds=60)
+        blocklist.refresh()
+
+        statements = []
+        def count(*args):
+            statements.append(args)
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            for _ in range(10):
+                self.assertFalse(blocklist.is_revoked(str(uuid.uuid4())))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        self.assertEqual(statements, [])
+
+    def test_refresh_picks_up_revocations_from_other_workers(self):
+        """New rows in revoked_tokens are loaded incrementally."""
+        blocklist = TokenBlocklist(capacity=100, refresh_seconds=60)
+        first, second = str(uuid.uuid4()), str(uuid.uuid4())
+        self._revoke_elsewhere(first)
+        blocklist.refresh()
+        self._revoke_elsewhere(second)
+
+        # Not seen until the next refresh
+        self.assertTrue(blocklist.is_revoked(first))
+        self.assertFalse(blocklist.is_revoked(second))
+
+        blocklist.refresh()
+        self.assertTrue(blocklist.is_revoked(second))
+
+    def test_revoke_blocks_immediately_and_expired_entries_are_purged(self):
+        """Local revocations apply at once; expired revocations can be deleted."""
+        blocklist = TokenBlocklist(capacity=100, refresh_seconds=60)
+        jti = str(uuid.uuid4())
+        blocklist.revoke(jti, datetime.utcnow() + timedelta(hours=1))
+        self.assertTrue(blocklist.is_revoked(jti))
+
+        self._revoke_elsewhere(str(uuid.uuid4()), expires_at=datetime.utcnow() - timedelta(minutes=1))
+        self.assertEqual(purge_expired_revocations(), 1)
+        self.assertEqual(RevokedToken.query.count(), 1)
+
+    def test_expired_entries_leave_the_exact_set(self):
+        """Expired jtis are evicted on a refresh well before the filter fills up."""
+        blocklist = TokenBlocklist(capacity=100, refresh_seconds=60)
+        soon, later = str(uuid.uuid4()), str(uuid.uuid4())
+        now = datetime.utcnow()
+        self._revoke_elsewhere(soon, expires_at=now + timedelta(minutes=1))
+        self._revoke_elsewhere(later, expires_at=now + timedelta(hours=1))
+        blocklist.refresh(now=now)
+        self.assertEqual(len(blocklist._revoked), 2)
+
+        # Not again until the eviction interval has passed
+        blocklist.refresh(now=now + timedelta(minutes=2))
+        self.assertEqual(len(blocklist._revoked), 2)
+        with mock.patch('app.token_blocklist.EVICT_SECONDS', 0):
+            blocklist.refresh(now=now + timedelta(minutes=2))
+        self.assertEqual(list(blocklist._revoked), [later])
+
+    def test_logout_revokes_token_and_refresh_family(self):
+        """Logging out blocks the access token and the login's refresh tokens."""
+        family = str(uuid.uuid4())
+        claims = {'jti': str(uuid.uuid4()), 'sub': 1, 'family': family,
+                  'exp': (datetime.utcnow() + timedelta(hours=1)).timestamp()}
+        with self.app.test_request_context():
+            issue_refresh_token(1, {'role': 'admin', 'profile_id': None}, family_id=family)
+            db.session.commit()
+
+        with mock.patch('app.routes.auth.get_jwt', return_value=claims):
+            response = self.client.post('/api/auth/logout')
+        self.assert_status_code(response, 200)
+
+        self.assertTrue(token_blocklist.is_revoked(claims['jti']))
+        record = RefreshToken.query.filter_by(family_id=family).one()
+        self.assertIsNotNone(record.revoked_at)
+        self.assertFalse(rotate_refresh_token({'jti': record.jti, 'sub': 1, 'family': family})['success'])
+
+    def test_user_sessions_block_their_access_tokens(self):
+        """Revoking a user's sessions blocks every access token of their logins by family."""
+        family = str(uuid.uuid4())
+        with self.app.test_request_context():
+            issue_refresh_token(2, {'role': 'faculty', 'profile_id': None}, family_id=family)
+            db.session.commit()
+        blocklist = TokenBlocklist(capacity=100, refresh_seconds=60)
+        access_jti = str(uuid.uuid4())
+        self.assertFalse(blocklist.is_revoked(access_jti, family))
+
+        self.assertEqual(revoke_user_sessions([2]), 1)
+        db.session.commit()
+        blocklist.refresh()
+        self.assertTrue(blocklist.is_revoked(access_jti, family))
+        self.assertFalse(blocklist.is_revoked(str(uuid.uuid4()), str(uuid.uuid4())))
+        self.assertIsNotNone(RefreshToken.query.filter_by(family_id=family).one().revoked_at)
+
+    def test_role_change_revokes_sessions(self):
+        """Changing a user's role ends the sessions whose tokens carry the old one."""
+        family = str(uuid.uuid4())
+        with self.app.test_request_context():
+            issue_refresh_token(3, {'role': 'student', 'profile_id': None}, family_id=family)
+            db.session.commit()
+
+        self.assert_status_code(self.client.put('/api/users/3', json={'first_name': 'Renamed'}), 200)
+        self.assertEqual(RevokedToken.query.count(), 0)
+        self.assert_status_code(self.client.put('/api/users/3', json={'role': 'faculty'}), 200)
+        self.assertEqual(RevokedToken.query.filter_by(jti=family).one().user_id, 3)
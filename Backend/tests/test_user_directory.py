@@ -0,0 +1,74 @@
+"""
+Tests for the paginated user directory.
+"""
+import json
+from sqlalchemy import event, insert
+from app.models import db, User, UserRole, Student
+from app.user_directory import get_users_page
+from tests.test_base import BaseTestCase
+
+
+class UserDirectoryTestCase(BaseTestCase):
+    """Test case for user directory paging, search and filters."""
+
+    def setUp(self):
+        super().setUp()
+        db.session.execute(insert(User), [{
+            'email': f'{first.lower()}.{i}@school.edu', 'password_hash': 'x', 'first_name': first,
+            'last_name': 'Directory', 'role': UserRole.STUDENT, 'access_code': f'DIR{i}',
+            'status': 'inactive' if i % 5 == 0 else 'active'
+        } for i, first in enumerate(['Jane', 'John', 'Joan', 'Mark', 'Mary'] * 6)])
+        db.session.commit()
+
+    def test_pages_cover_every_user_once(self):
+        """Following next_after_id walks all users in id order without repeats."""
+        seen, after_id = [], None
+        while True:
+            response = self.client.get('/api/users/', query_string={'limit': 7, 'after_id': after_id or ''},
+                                       headers=self.get_auth_headers())
+            self.assert_status_code(response, 200)
+            data = json.loads(response.data)
+            seen.extend(u['id'] for u in data['users'])
+            after_id = data['next_after_id']
+            if after_id is None:
+                break
+        self.assertEqual(seen, [u.id for u in User.query.order_by(User.id)])
+
+    def test_prefix_search_is_case_insensitive(self):
+        """Search matches the start of the email, first name or last name."""
+        users, _ = get_users_page(search='JO', limit=100)
+        self.assertEqual({u.first_name for u in users}, {'John', 'Joan'})
+        users, _ = get_users_page(search='mary.', limit=100)
+        self.assertEqual(len(users), 6)
+        users, _ = get_users_page(search='jane dir', limit=100)
+        self.assertEqual({u.first_name for u in users}, {'Jane'})
+        users, _ = get_users_page(search='ohn', limit=100)
+        self.assertEqual(users, [])
+
+    def test_role_and_status_filters(self):
+        """Role and status filters combine with search."""
+        response = self.client.get('/api/users/by-role/student', query_string={'status': 'inactive'},
+                                   headers=self.get_auth_headers())
+        data = json.loads(response.data)
+        self.assertEqual(len(data['users']), 6)
+        self.assertTrue(all(u['status'] == 'inactive' for u in data['users']))
+
+        response = self.client.get('/api/users/', query_string={'status': 'gone'}, headers=self.get_auth_headers())
+        self.assert_status_code(response, 400)
+
+    def test_profiles_embedded_in_one_query(self):
+        """include=profile joins the role profiles instead of querying per user."""
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            users, _ = get_users_page(limit=100, include_profile=True)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        self.assertEqual(len(statements), 1)
+        student = Student.query.first()
+        profiles = {user.id: profile for user, profile in users}
+        self.assertEqual(profiles[student.user_id].id, student.id)
+        self.assertIsNone(profiles[User.query.filter_by(email='jane.0@school.edu').one().id])
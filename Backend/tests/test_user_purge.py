@@ -0,0 +1,117 @@
+"""
+Tests for soft-deleting and purging users.
+"""
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, date
+from app.models import (db, User, Student, Faculty, Course, Enrollment, Assignment, AssignmentSubmission,
+                        FacultyCourse, Attendance, CourseMaterial, MaterialType, Notification, NotificationType,
+                        RefreshToken)
+from app.user_purge import soft_delete_users, purge_users, purge_deleted_users
+from tests.test_base import BaseTestCase
+
+
+class UserPurgeTestCase(BaseTestCase):
+    """Test case for soft delete and the cascading hard delete."""
+
+    def setUp(self):
+        super().setUp()
+        self.student = Student.query.join(User).filter(User.email == "student@test.com").one()
+        self.faculty = Faculty.query.join(User).filter(User.email == "faculty@test.com").one()
+        self.course = Course.query.filter_by(course_code="CS101").one()
+
+        fd, self.submission_file = tempfile.mkstemp()
+        os.close(fd)
+        assignment = Assignment(title="HW1", course_id=self.course.id, due_date=datetime.utcnow())
+        faculty_course = FacultyCourse(faculty_id=self.faculty.id, course_id=self.course.id, semester="Fall")
+        db.session.add_all([assignment, faculty_course])
+        db.session.flush()
+        db.session.add_all([
+            Enrollment(student_id=self.student.id, course_id=self.course.id),
+            AssignmentSubmission(assignment_id=assignment.id, student_id=self.student.id, file_name="a.pdf",
+                                 file_path=self.submission_file, file_size=1, file_type="pdf",
+                                 graded_by=self.faculty.user_id),
+            Attendance(faculty_course_id=faculty_course.id, student_id=self.student.id, date=date.today(),
+                       created_by=self.faculty.user_id),
+            CourseMaterial(course_id=self.course.id, title="Slides", file_name="s.pdf", file_path="/nonexistent",
+                           file_size=1, file_type="pdf", material_type=MaterialType.LECTURE, created_by=self.faculty.user_id),
+            Notification(user_id=self.student.user_id, title="Hi", message="There", type=NotificationType.INFO),
+            RefreshToken(jti="rt-student", user_id=self.student.user_id, family_id="f",
+                         expires_at=datetime.utcnow() + timedelta(days=1)),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        if os.path.exists(self.submission_file):
+            os.remove(self.submission_file)
+        super().tearDown()
+
+    def test_soft_deleted_users_are_hidden(self):
+        """Soft-deleted users disappear from queries but stay in the table."""
+        user_id = self.student.user_id
+        self.assertEqual(soft_delete_users([user_id]), 1)
+
+        self.assertIsNone(User.query.get(user_id))
+        self.assertIsNone(User.query.filter_by(email="student@test.com").first())
+        self.assertEqual(User.query.filter_by(id=user_id).execution_options(include_deleted=True).count(), 1)
+        self.assertIsNotNone(db.session.get(RefreshToken, "rt-student").revoked_at)
+        # Records that point at the user can still reach it
+        self.assertEqual(Enrollment.query.one().student.user.email, "student@test.com")
+
+    def test_delete_and_restore_endpoints(self):
+        """DELETE soft-deletes; restore brings the user back."""
+        user_id = self.student.user_id
+        self.assert_status_code(self.client.delete(f'/api/users/{user_id}'), 200)
+        self.assert_status_code(self.client.get(f'/api/users/{user_id}'), 404)
+
+        self.assert_status_code(self.client.post(f'/api/users/{user_id}/restore'), 200)
+        self.assert_status_code(self.client.get(f'/api/users/{user_id}'), 200)
+
+    def test_purge_removes_dependents_and_reassigns_shared_records(self):
+        """Purging removes the users' own rows and hands over what others use."""
+        student_user, faculty_user = self.student.user_id, self.faculty.user_id
+        soft_delete_users([student_user, faculty_user])
+
+        self.assertEqual(purge_users(1, user_ids=[student_user, faculty_user], batch_size=1), 2)
+
+        for model in (Student, Faculty, Enrollment, AssignmentSubmission, Attendance, Notification, RefreshToken):
+            self.assertEqual(model.query.count(), 0, model.__name__)
+        self.assertEqual(User.query.execution_options(include_deleted=True).count(), 1)
+        self.assertEqual(db.session.get(Course, self.course.id).created_by, 1)
+        self.assertEqual(CourseMaterial.query.one().created_by, 1)
+        self.assertIsNone(FacultyCourse.query.one().faculty_id)
+        self.assertFalse(os.path.exists(self.submission_file))
+
+    def test_purging_faculty_keeps_students_records(self):
+        """A purged teacher's courses, materials and the attendance they took stay."""
+        soft_delete_users([self.faculty.user_id])
+
+        self.assertEqual(purge_users(1, user_ids=[self.faculty.user_id]), 1)
+
+        attendance = Attendance.query.one()
+        self.assertEqual((attendance.student_id, attendance.created_by), (self.student.id, 1))
+        faculty_course = FacultyCourse.query.one()
+        self.assertIsNone(faculty_course.faculty_id)
+        self.assertFalse(faculty_course.is_active)
+        self.assertEqual(CourseMaterial.query.one().created_by, 1)
+        self.assertIsNone(AssignmentSubmission.query.one().graded_by)
+
+    def test_purge_only_users_deleted_long_enough(self):
+        """The retention job leaves recent deletions and live users alone."""
+        soft_delete_users([self.student.user_id], now=datetime.utcnow() - timedelta(days=40))
+        soft_delete_users([self.faculty.user_id])
+
+        self.assertEqual(purge_deleted_users(30), 1)
+        self.assertEqual(User.query.execution_options(include_deleted=True).count(), 2)
+
+    def test_bulk_delete_endpoint_hard(self):
+        """Bulk delete with hard=true purges right away."""
+        response = self.client.post('/api/users/bulk-delete',
+                                    json={"user_ids": [self.student.user_id], "hard": True})
+        self.assert_status_code(response, 200)
+        self.assertEqual(json.loads(response.data)["purged"], 1)
+        self.assertEqual(Enrollment.query.count(), 0)
+
+        response = self.client.post('/api/users/bulk-delete', json={"user_ids": [1]})
+        self.assert_status_code(response, 400)
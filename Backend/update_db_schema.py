@@ -1,9 +1,8 @@
 import sqlite3
 import os
 
-def add_status_column():
-    """Add status column to users table if it doesn't exist"""
-    # Locate the database file
+def get_db_path():
+    """Locate the SQLite database file"""
     instance_dir = os.path.join(os.path.dirname(__file__), 'instance')
     db_path = os.path.join(instance_dir, 'udis.db')
     
@@ -13,32 +12,141 @@ def add_status_column():
         db_path = os.path.join(os.path.dirname(__file__), 'udis.db')
         if not os.path.exists(db_path):
             print(f"Database file not found at {db_path}")
-            return
+            return None
     
     print(f"Using database at {db_path}")
+    return db_path
+
+def add_column(cursor, table, column, definition):
+    """Add a column to a table if the table exists and the column doesn't"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    column_names = [col[1] for col in cursor.fetchall()]
     
-    # Connect to the database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    if not column_names:
+        print(f"Table '{table}' does not exist yet, it will be created by the app")
+        return False
+    
+    if column in column_names:
+        print(f"'{column}' column already exists in {table} table")
+        return False
     
-    # Check if status column exists
-    cursor.execute("PRAGMA table_info(users)")
+    print(f"Adding '{column}' column to {table} table...")
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    print("Column added successfully!")
+    return True
+
+def add_status_column(cursor):
+    """Add status column to users table if it doesn't exist"""
+    add_column(cursor, 'users', 'status', "VARCHAR(20) DEFAULT 'active' NOT NULL")
+
+def add_submission_content_hash_column(cursor):
+    """Add content_hash column and its index to assignment_submissions"""
+    if add_column(cursor, 'assignment_submissions', 'content_hash', "VARCHAR(64)"):
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_submission_assignment_hash "
+            "ON assignment_submissions (assignment_id, content_hash)"
+        )
+
+def add_submission_claim_columns(cursor):
+    """Add grading queue lease columns and index to assignment_submissions"""
+    add_column(cursor, 'assignment_submissions', 'claimed_by', "INTEGER REFERENCES users(id)")
+    if add_column(cursor, 'assignment_submissions', 'claim_expires_at', "DATETIME"):
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_submission_assignment_status "
+            "ON assignment_submissions (assignment_id, status)"
+        )
+
+def add_notification_indexes(cursor):
+    """Add the notification lookup indexes if the table exists"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='notifications'")
+    if cursor.fetchone():
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_notifications_user_read ON notifications (user_id, read)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_notifications_user_created ON notifications (user_id, created_at)")
+
+def add_notification_digest_columns(cursor):
+    """Add digest count and last event time to notifications and the archive"""
+    add_column(cursor, 'notifications', 'count', "INTEGER DEFAULT 1 NOT NULL")
+    add_column(cursor, 'notifications', 'updated_at', "DATETIME")
+    add_column(cursor, 'notification_archive', 'count', "INTEGER DEFAULT 1 NOT NULL")
+
+def add_user_directory_indexes(cursor):
+    """Add the user directory filter and search indexes"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_users_role_id ON users (role, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_users_status_id ON users (status, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email))")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_users_first_name_lower ON users (lower(first_name))")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_users_last_name_lower ON users (lower(last_name))")
+
+def add_user_soft_delete_column(cursor):
+    """Add the soft delete timestamp to users"""
+    if add_column(cursor, 'users', 'deleted_at', "DATETIME"):
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_users_deleted_at ON users (deleted_at)")
+
+def add_enrollment_trend_indexes(cursor):
+    """Add the indexes used to bucket enrollments by date, per course and per department"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_enrollments_date ON enrollments (enrollment_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_enrollments_course_date ON enrollments (course_id, enrollment_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_courses_department ON courses (department)")
+
+def add_department_analytics_version_column(cursor):
+    """Add the stale mark counter to the department analytics snapshots"""
+    add_column(cursor, 'department_analytics', 'version', "INTEGER DEFAULT 0 NOT NULL")
+
+def make_faculty_course_faculty_nullable(cursor):
+    """Let teaching assignments outlive a purged faculty member (faculty_id becomes nullable)"""
+    cursor.execute("PRAGMA table_info(faculty_courses)")
     columns = cursor.fetchall()
-    column_names = [col[1] for col in columns]
+    if not columns:
+        print("Table 'faculty_courses' does not exist yet, it will be created by the app")
+        return
+    if not any(col[1] == 'faculty_id' and col[3] for col in columns):
+        print("faculty_courses.faculty_id is already nullable")
+        return
+
+    # SQLite can't drop NOT NULL in place, so the table is rebuilt from its own definition
+    print("Making faculty_courses.faculty_id nullable...")
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='faculty_courses'")
+    table_sql = cursor.fetchone()[0]
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name='faculty_courses' AND sql IS NOT NULL")
+    index_sqls = [row[0] for row in cursor.fetchall()]
+    new_sql = table_sql.replace('faculty_id INTEGER NOT NULL', 'faculty_id INTEGER', 1)\
+        .replace('faculty_courses', 'faculty_courses_new', 1)
+    cursor.execute(new_sql)
+    cursor.execute("INSERT INTO faculty_courses_new SELECT * FROM faculty_courses")
+    cursor.execute("DROP TABLE faculty_courses")
+    cursor.execute("ALTER TABLE faculty_courses_new RENAME TO faculty_courses")
+    for index_sql in index_sqls:
+        cursor.execute(index_sql)
+    print("Column updated successfully!")
+
+def update_schema():
+    """Apply all schema updates to an existing database"""
+    db_path = get_db_path()
+    if not db_path:
+        return
     
-    if 'status' not in column_names:
-        print("Adding 'status' column to users table...")
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN status VARCHAR(20) DEFAULT 'active' NOT NULL")
-            conn.commit()
-            print("Column added successfully!")
-        except sqlite3.Error as e:
-            print(f"Error adding column: {e}")
-    else:
-        print("'status' column already exists in users table")
+    # Connect to the database
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
     
-    conn.close()
+    try:
+        add_status_column(cursor)
+        add_submission_content_hash_column(cursor)
+        add_submission_claim_columns(cursor)
+        add_notification_indexes(cursor)
+        add_notification_digest_columns(cursor)
+        add_user_directory_indexes(cursor)
+        add_user_soft_delete_column(cursor)
+        add_enrollment_trend_indexes(cursor)
+        add_department_analytics_version_column(cursor)
+        make_faculty_course_faculty_nullable(cursor)
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error updating schema: {e}")
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
-    add_status_column()
-    print("Database schema update complete") 
\ No newline at end of file
+    update_schema()
+    print("Database schema update complete")
@@ -145,6 +145,15 @@ export const ChartsComponent: React.FC<ChartsComponentProps> = ({
       return enrollmentData.map(item => ({ ...item, students: 0 }));
     }
     
+    // Enrollment trend series: parallel label and count arrays
+    if (analyticsData?.enrollment_trends?.labels) {
+      const { labels, counts } = analyticsData.enrollment_trends as { labels: string[]; counts: number[] };
+      return labels.map((label, index) => ({
+        month: label,
+        students: counts[index]
+      }));
+    }
+    
     if (analyticsData?.enrollment_statistics?.monthly_data) {
       return Object.entries(analyticsData.enrollment_statistics.monthly_data).map(([month, count]) => ({
         month,
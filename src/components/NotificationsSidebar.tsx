@@ -12,6 +12,8 @@ interface Notification {
   read: boolean;
   type: string;
   link?: string;
+  count: number;
+  updated_at?: string;
 }
 
 const NotificationsSidebar: React.FC = () => {
@@ -21,9 +23,12 @@ const NotificationsSidebar: React.FC = () => {
 
   const fetchNotifications = async () => {
     try {
-      const response = await axios.get('/api/notifications');
-      setNotifications(response.data);
-      setUnreadCount(response.data.filter((n: Notification) => !n.read).length);
+      const [listResponse, countResponse] = await Promise.all([
+        axios.get('/api/notifications'),
+        axios.get('/api/notifications/notifications/unread-count'),
+      ]);
+      setNotifications(listResponse.data.notifications);
+      setUnreadCount(countResponse.data.unread_count);
     } catch (error) {
       console.error('Error fetching notifications:', error);
     }
@@ -54,8 +59,35 @@ const NotificationsSidebar: React.FC = () => {
   useEffect(() => {
     if (token) {
       fetchNotifications();
-      const interval = setInterval(fetchNotifications, 30000); // Poll every 30 seconds
-      return () => clearInterval(interval);
+
+      // Live updates over Server-Sent Events instead of polling; the browser
+      // reconnects on its own and resumes from the last received event id
+      const source = new EventSource(`/api/notifications/stream?token=${encodeURIComponent(token)}`);
+
+      source.addEventListener('notification', (event) => {
+        const notification: Notification = JSON.parse((event as MessageEvent).data);
+        // A digest that folded another event comes back under a new id and replaces its older copy
+        const folded = notification.count > 1;
+        setNotifications(prev => {
+          if (prev.some(n => n.id === notification.id)) {
+            return prev;
+          }
+          const rest = folded
+            ? prev.filter(n => n.read || n.type !== notification.type || n.link !== notification.link)
+            : prev;
+          return [notification, ...rest];
+        });
+        // Folding doesn't change the unread count
+        if (!notification.read && !folded) {
+          setUnreadCount(prev => prev + 1);
+        }
+      });
+
+      source.addEventListener('unread-count', (event) => {
+        setUnreadCount(JSON.parse((event as MessageEvent).data).unread_count);
+      });
+
+      return () => source.close();
     }
   }, [token]);
 
@@ -98,11 +130,16 @@ const NotificationsSidebar: React.FC = () => {
             >
               <div className="flex justify-between items-start gap-4">
                 <div className="flex-1 min-w-0">
-                  <h3 className="font-medium text-foreground">{notification.title}</h3>
+                  <h3 className="font-medium text-foreground">
+                    {notification.title}
+                    {notification.count > 1 && (
+                      <span className="ml-2 text-xs text-muted-foreground">({notification.count} updates)</span>
+                    )}
+                  </h3>
                   <p className="text-sm text-muted-foreground mt-1">{notification.message}</p>
                   <div className="flex items-center gap-2 mt-2">
                     <span className="text-xs text-muted-foreground">
-                      {new Date(notification.created_at).toLocaleDateString()}
+                      {new Date(notification.updated_at || notification.created_at).toLocaleDateString()}
                     </span>
                     {notification.link && (
                       <a
@@ -755,15 +755,21 @@ export default function Dashboard() {
     setLoadingAnalytics(true);
     try {
       const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:5001';
-      const response = await axios.get(`${apiUrl}/api/department-head/analytics`, {
-        headers: { 
-          Authorization: `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        }
-      });
+      const headers = { 
+        Authorization: `Bearer ${token}`,
+        'Content-Type': 'application/json'
+      };
+      const [response, trendsResponse] = await Promise.all([
+        axios.get(`${apiUrl}/api/department-head/analytics`, { headers }),
+        axios.get(`${apiUrl}/api/department-head/analytics/enrollment-trends?interval=week`, { headers })
+          .catch(() => null)
+      ]);
       
       if (response.data.status === 'success') {
-        setDepartmentAnalytics(response.data.data);
+        setDepartmentAnalytics({
+          ...response.data.data,
+          enrollment_trends: trendsResponse?.data?.status === 'success' ? trendsResponse.data.data : undefined
+        });
         
         // Create a new copy of stats to update with real data
         const newStats = [...stats];
@@ -52,7 +52,9 @@ export default function Login() {
 
       const data = await response.json();
 
-      if (data.success && data.exists) {
+      if (data.deleted) {
+        toast.error(data.message || 'This account has been deleted');
+      } else if (data.success && data.exists) {
         if (data.needs_setup) {
           setIsFirstTimeSetup(true);
           setUserDetails(data.user_details);
@@ -143,6 +145,7 @@ export default function Login() {
       if (data.success) {
         // Store the access token in localStorage
         localStorage.setItem('token', data.access_token);
+        localStorage.setItem('refresh_token', data.refresh_token);
         
         // Set the user in our store
         setUser(data.user);
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { 
   Search, 
   Filter, 
@@ -112,7 +112,6 @@ const mockUsersData: User[] = [
 
 const UserManagement: React.FC = () => {
   const [users, setUsers] = useState<User[]>([]);
-  const [filteredUsers, setFilteredUsers] = useState<User[]>([]);
   const [searchText, setSearchText] = useState('');
   const [selectedRole, setSelectedRole] = useState<string>('');
   const [selectedStatus, setSelectedStatus] = useState<string>('');
@@ -122,6 +121,8 @@ const UserManagement: React.FC = () => {
   const [loading, setLoading] = useState(false);
   const [usingMockData, setUsingMockData] = useState(false);
   const [forceMockData, setForceMockData] = useState(false);
+  const [nextAfterId, setNextAfterId] = useState<number | null>(null);
+  const importInputRef = useRef<HTMLInputElement>(null);
   const { token } = useAuth();
   const apiUrl = 'http://localhost:5001';
 
@@ -143,7 +144,9 @@ const UserManagement: React.FC = () => {
     }
   };
 
-  const fetchUsers = async () => {
+  // Loads one page of the user directory; search and filters are applied by the server.
+  // Pass the previous page's next_after_id to append the next page.
+  const fetchUsers = async (afterId: number | null = null) => {
     setLoading(true);
     try {
       // Make API call to fetch users
@@ -156,6 +159,13 @@ const UserManagement: React.FC = () => {
       }
       
       const response = await axios.get(`${apiUrl}/api/users/`, {
+        params: {
+          limit: 200,
+          search: searchText || undefined,
+          role: selectedRole || undefined,
+          status: selectedStatus || undefined,
+          after_id: afterId ?? undefined,
+        },
         headers: { 
           Authorization: `Bearer ${token}`,
           'Content-Type': 'application/json',
@@ -172,7 +182,7 @@ const UserManagement: React.FC = () => {
           last_name: user.last_name,
           email: user.email,
           role: user.role,
-          status: 'active', // Default all users to active since database doesn't store this
+          status: user.status || 'active',
           lastLogin: user.last_login,
           createdAt: user.created_at
         }));
@@ -188,9 +198,8 @@ const UserManagement: React.FC = () => {
           });
         }
         
-        setUsers(transformedUsers);
-        setFilteredUsers(transformedUsers);
-        message.success(`Successfully loaded ${transformedUsers.length} users`);
+        setUsers(prevUsers => afterId ? [...prevUsers, ...transformedUsers] : transformedUsers);
+        setNextAfterId(response.data.next_after_id ?? null);
       } else {
         message.error('Failed to load users: Unexpected API response format');
       }
@@ -216,32 +225,10 @@ const UserManagement: React.FC = () => {
   };
 
   useEffect(() => {
-    fetchUsers();
-  }, [token]);
-
-  useEffect(() => {
-    // Filter users based on search text and selected filters
-    let filtered = [...users];
-    
-    if (searchText) {
-      filtered = filtered.filter(
-        user => 
-          `${user.first_name} ${user.last_name}`.toLowerCase().includes(searchText.toLowerCase()) ||
-          user.email.toLowerCase().includes(searchText.toLowerCase()) ||
-          user.id.toLowerCase().includes(searchText.toLowerCase())
-      );
-    }
-    
-    if (selectedRole) {
-      filtered = filtered.filter(user => user.role === selectedRole);
-    }
-    
-    if (selectedStatus) {
-      filtered = filtered.filter(user => user.status === selectedStatus);
-    }
-    
-    setFilteredUsers(filtered);
-  }, [searchText, selectedRole, selectedStatus, users]);
+    // Wait for the user to stop typing before asking the server
+    const timer = setTimeout(() => fetchUsers(), 300);
+    return () => clearTimeout(timer);
+  }, [token, searchText, selectedRole, selectedStatus]);
 
   const showModal = (user: User | null = null) => {
     setEditingUser(user);
@@ -309,7 +296,6 @@ const UserManagement: React.FC = () => {
             } : user
           );
           setUsers(updatedUsers);
-          setFilteredUsers(updatedUsers);
           message.success('User updated successfully');
         } else {
           message.error('Failed to update user: ' + (response.data?.message || 'Unknown error'));
@@ -341,18 +327,12 @@ const UserManagement: React.FC = () => {
             lastLogin: newUser.last_login
           };
           
-          setUsers(prevUsers => [...prevUsers, formattedUser]);
-          setFilteredUsers(prevUsers => {
-            // Only add to filtered users if it passes current filters
-            if (selectedRole && formattedUser.role !== selectedRole) return prevUsers;
-            if (selectedStatus && formattedUser.status !== selectedStatus) return prevUsers;
-            if (searchText && 
-                !`${formattedUser.first_name} ${formattedUser.last_name}`.toLowerCase().includes(searchText.toLowerCase()) && 
-                !formattedUser.email.toLowerCase().includes(searchText.toLowerCase()))
-              return prevUsers;
-            
-            return [...prevUsers, formattedUser];
-          });
+          if (searchText || selectedRole || selectedStatus) {
+            // Let the server decide whether the new user matches the current filters
+            fetchUsers();
+          } else {
+            setUsers(prevUsers => [...prevUsers, formattedUser]);
+          }
           
           message.success('User created successfully');
           // Display temporary password if provided
@@ -409,7 +389,6 @@ const UserManagement: React.FC = () => {
         // Remove deleted user from local state
         const updatedUsers = users.filter(user => user.id !== userId);
         setUsers(updatedUsers);
-        setFilteredUsers(filteredUsers.filter(user => user.id !== userId));
         message.success('User deleted successfully');
       } else {
         message.error('Failed to delete user: ' + (response.data?.message || 'Unknown error'));
@@ -443,9 +422,6 @@ const UserManagement: React.FC = () => {
         user.id === userId ? { ...user, status: newStatus } : user
       );
       setUsers(updatedUsers);
-      setFilteredUsers(filteredUsers.map(user => 
-        user.id === userId ? { ...user, status: newStatus } : user
-      ));
       
       // Save status to localStorage for persistence
       const savedStatuses = localStorage.getItem('userStatuses') || '{}';
@@ -697,12 +673,43 @@ const UserManagement: React.FC = () => {
     },
   ];
 
+  // Upload a CSV of new users; the server answers with the credentials report as a download
+  const importUsers = async (file: File) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    setLoading(true);
+    try {
+      const response = await axios.post(`${apiUrl}/api/users/bulk`, formData, {
+        headers: { Authorization: `Bearer ${token}` },
+        responseType: 'blob',
+        timeout: 600000,
+      });
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `credentials_${new Date().toISOString().split('T')[0]}.csv`);
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      setTimeout(() => URL.revokeObjectURL(url), 100);
+
+      const created = response.headers['x-users-created'] ?? '0';
+      const skipped = response.headers['x-users-skipped'] ?? '0';
+      message.success(`Created ${created} users, skipped ${skipped}. Credentials report downloaded.`);
+      fetchUsers();
+    } catch (error: any) {
+      console.error('Error importing users:', error);
+      message.error('Failed to import users. Check the CSV columns and try again.');
+      setLoading(false);
+    }
+  };
+
   // Function to export users data as CSV
   const exportUsers = () => {
     try {
       // Convert users to CSV format
       const header = ['ID', 'First Name', 'Last Name', 'Email', 'Role', 'Status', 'Last Login', 'Created At'];
-      const csvContent = filteredUsers.map(user => [
+      const csvContent = users.map(user => [
         user.id,
         user.first_name,
         user.last_name,
@@ -760,7 +767,7 @@ const UserManagement: React.FC = () => {
             <Button 
               type="primary"
               icon={<RefreshCw size={16} className="mr-1" />}
-              onClick={fetchUsers}
+              onClick={() => fetchUsers()}
               loading={loading}
             >
               Refresh
@@ -780,15 +787,25 @@ const UserManagement: React.FC = () => {
                 Export
               </Button>
             </Tooltip>
-            <Tooltip title="Import users from CSV">
+            <Tooltip title="Import users from CSV (email, first_name, last_name, role)">
               <Button
                 icon={<Upload size={16} />}
-                onClick={() => {/* TODO: Implement import */}}
-                disabled
+                onClick={() => importInputRef.current?.click()}
               >
                 Import
               </Button>
             </Tooltip>
+            <input
+              ref={importInputRef}
+              type="file"
+              accept=".csv"
+              className="hidden"
+              onChange={(e) => {
+                const file = e.target.files?.[0];
+                if (file) importUsers(file);
+                e.target.value = '';
+              }}
+            />
           </div>
         </div>
       </div>
@@ -817,7 +834,6 @@ const UserManagement: React.FC = () => {
                 { value: 'department_head', label: 'Department Head' },
                 { value: 'faculty', label: 'Faculty' },
                 { value: 'student', label: 'Student' },
-                { value: 'guest', label: 'Guest' },
               ]}
             />
             
@@ -837,16 +853,23 @@ const UserManagement: React.FC = () => {
         
         <Table
           columns={columns}
-          dataSource={filteredUsers}
+          dataSource={users}
           rowKey="id"
           loading={loading}
           pagination={{
             defaultPageSize: 10,
             showSizeChanger: true,
             pageSizeOptions: ['10', '20', '50'],
-            showTotal: (total, range) => `${range[0]}-${range[1]} of ${total} items`,
+            showTotal: (total, range) => `${range[0]}-${range[1]} of ${total} loaded`,
           }}
         />
+        {nextAfterId !== null && (
+          <div className="p-4 border-t flex justify-center">
+            <Button onClick={() => fetchUsers(nextAfterId)} loading={loading}>
+              Load more users
+            </Button>
+          </div>
+        )}
       </div>
       
       <Modal
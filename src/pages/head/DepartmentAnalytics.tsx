@@ -33,10 +33,12 @@ interface DepartmentAnalyticsData {
     };
     enrollment_count: number;
   }>;
+  refreshed_at: string | null;
 }
 
 const DepartmentAnalytics: React.FC = () => {
   const [analyticsData, setAnalyticsData] = useState<DepartmentAnalyticsData | null>(null);
+  const [allDepartments, setAllDepartments] = useState<DepartmentAnalyticsData[]>([]);
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
   const { token } = useAuth();
@@ -46,13 +48,16 @@ const DepartmentAnalytics: React.FC = () => {
     setError(null);
     try {
       const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:5001';
-      // Get user or department data if available
-      const department = localStorage.getItem('department') || 'Computer Science';
-      
-      const response = await axios.get(`${apiUrl}/api/department-head/analytics?department=${department}`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
+      // The server picks the department head's own department
+      const headers = { Authorization: `Bearer ${token}` };
+      const [response, allResponse] = await Promise.all([
+        axios.get(`${apiUrl}/api/department-head/analytics`, { headers }),
+        axios.get(`${apiUrl}/api/department-head/analytics/departments`, { headers })
+      ]);
       
+      if (allResponse.data.status === 'success') {
+        setAllDepartments(allResponse.data.data.departments);
+      }
       if (response.data.status === 'success') {
         setAnalyticsData(response.data.data);
       } else {
@@ -153,6 +158,41 @@ const DepartmentAnalytics: React.FC = () => {
     }
   ];
 
+  const departmentColumns = [
+    {
+      title: 'Department',
+      dataIndex: 'department',
+      key: 'department',
+    },
+    {
+      title: 'Courses',
+      key: 'courses',
+      render: (_: unknown, record: DepartmentAnalyticsData) =>
+        `${record.course_statistics.active_courses} / ${record.course_statistics.total_courses} active`,
+    },
+    {
+      title: 'Enrollments',
+      dataIndex: ['enrollment_statistics', 'total_enrollments'],
+      key: 'enrollments',
+    },
+    {
+      title: 'Faculty',
+      dataIndex: ['faculty_statistics', 'total_faculty'],
+      key: 'faculty',
+    },
+    {
+      title: 'Pending Approvals',
+      dataIndex: ['approval_statistics', 'pending'],
+      key: 'pending',
+    },
+    {
+      title: 'Top Course',
+      key: 'top_course',
+      render: (_: unknown, record: DepartmentAnalyticsData) =>
+        record.popular_courses.length > 0 ? record.popular_courses[0].course.course_code : '-',
+    }
+  ];
+
   return (
     <div className="p-4">
       <div className="flex justify-between items-center mb-6">
@@ -162,6 +202,11 @@ const DepartmentAnalytics: React.FC = () => {
             <BarChartIcon className="mr-2 h-6 w-6 text-primary" />
             Department Analytics: {analyticsData.department}
           </h1>
+          {analyticsData.refreshed_at && (
+            <span className="ml-4 text-sm text-gray-500">
+              Updated {new Date(analyticsData.refreshed_at + 'Z').toLocaleString()}
+            </span>
+          )}
         </div>
         <Button 
           onClick={fetchAnalyticsData} 
@@ -399,6 +444,24 @@ const DepartmentAnalytics: React.FC = () => {
           />
         </Card>
       </div>
+
+      {/* All Departments */}
+      {allDepartments.length > 0 && (
+        <div className="mt-8">
+          <Card 
+            title="All Departments" 
+            bordered={false}
+            className="shadow-sm hover:shadow-md transition-shadow"
+          >
+            <Table 
+              dataSource={allDepartments} 
+              columns={departmentColumns}
+              rowKey="department"
+              pagination={false}
+            />
+          </Card>
+        </div>
+      )}
     </div>
   );
 };
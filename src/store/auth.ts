@@ -27,6 +27,35 @@ const getInitialState = () => {
   }
 };
 
+// Exchange the stored refresh token for a new access token; returns false if that isn't possible
+const refreshAccessToken = async (): Promise<boolean> => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    return false;
+  }
+  
+  try {
+    const response = await fetch('http://localhost:5001/api/auth/refresh', {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${refreshToken}`
+      }
+    });
+    if (!response.ok) {
+      localStorage.removeItem('refresh_token');
+      return false;
+    }
+    
+    const data = await response.json();
+    localStorage.setItem('token', data.access_token);
+    localStorage.setItem('refresh_token', data.refresh_token);
+    return true;
+  } catch (error) {
+    console.error('Token refresh error:', error);
+    return false;
+  }
+};
+
 // Track the last time we verified a token to prevent excessive requests
 let lastVerified = 0;
 const THROTTLE_MS = 2000; // Minimum 2 seconds between verification attempts
@@ -52,7 +81,16 @@ export const useAuthStore = create<AuthState>()(
       },
       setLoading: (loading) => set({ isLoading: loading }),
       logout: () => {
+        // Revoke the session server-side; the local tokens are dropped either way
+        const token = localStorage.getItem('token');
+        if (token) {
+          fetch('http://localhost:5001/api/auth/logout', {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` }
+          }).catch((error) => console.error('Logout error:', error));
+        }
         localStorage.removeItem('token');
+        localStorage.removeItem('refresh_token');
         localStorage.removeItem('user');
         set({ user: null });
       },
@@ -82,13 +120,20 @@ export const useAuthStore = create<AuthState>()(
         lastVerified = now;
         
         try {
-          const response = await fetch('http://localhost:5001/api/auth/verify-token', {
+          const verify = (accessToken: string) => fetch('http://localhost:5001/api/auth/verify-token', {
             method: 'GET',
             headers: {
-              'Authorization': `Bearer ${token}`
+              'Authorization': `Bearer ${accessToken}`
             }
           });
           
+          let response = await verify(token);
+          
+          // Expired access token: renew it with the refresh token instead of logging out
+          if (response.status === 401 && await refreshAccessToken()) {
+            response = await verify(localStorage.getItem('token') as string);
+          }
+          
           if (!response.ok) {
             throw new Error(`Server returned ${response.status}`);
           }